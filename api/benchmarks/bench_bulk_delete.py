@@ -0,0 +1,79 @@
+"""
+Bulk delete benchmark for DELETE /queue/completed/all.
+
+Fills a temporary database with completed queue rows and clears them three
+ways: the old select-then-session.delete loop, one set-based DELETE, and
+batched DELETEs.
+    
+    cd api && python benchmarks/bench_bulk_delete.py [rows]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+from models import build_engine, QueueItem
+from constants import QueueStatus
+from utils.bulk_ops import bulk_delete
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+BATCH_SIZE = 5_000
+
+COMPLETED = QueueItem.status == QueueStatus.COMPLETED.value
+
+
+def populate(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO queue (book_title, book_url, created_at, retry_count, status, bytes_downloaded, version) "
+            "VALUES (?, ?, ?, 0, ?, 0, 0)",
+            [
+                (f"Book {n}", f"https://example.com/download/{n}", f"2026-01-01T00:00:{n:09d}", "completed")
+                for n in range(ROWS)
+            ]
+        )
+
+
+def row_by_row(session):
+    items = session.exec(select(QueueItem).where(COMPLETED)).all()
+    for item in items:
+        session.delete(item)
+    session.commit()
+    return len(items)
+
+
+def measure(engine, name, fn):
+    populate(engine)
+    with Session(engine) as session:
+        tracemalloc.start()
+        start = time.perf_counter()
+        deleted = fn(session)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:28} {deleted:8} rows {elapsed * 1000:10.1f} ms   peak {peak / 1024 / 1024:7.2f} MiB")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        
+        print(f"Deleting {ROWS} completed queue rows")
+        measure(engine, "select + session.delete", row_by_row)
+        measure(engine, "single DELETE", lambda session: bulk_delete(session, QueueItem, COMPLETED))
+        measure(
+            engine,
+            f"batched DELETE ({BATCH_SIZE})",
+            lambda session: bulk_delete(session, QueueItem, COMPLETED, batch_size=BATCH_SIZE)
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
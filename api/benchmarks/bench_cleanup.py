@@ -0,0 +1,104 @@
+"""
+Benchmark for DELETE /authors/cleanup.
+
+Fills a temporary database with links for many authors, about a third of them
+fully downloaded, and compares the old load-everything-and-group-in-Python
+cleanup with the GROUP BY/HAVING lookup and set-based delete.
+    
+    cd api && python benchmarks/bench_cleanup.py [rows]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+from models import build_engine, Link
+from migrations import run_migrations
+from utils.bulk_ops import bulk_delete, fully_downloaded_authors
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+AUTHORS = 5_000
+
+
+def populate(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM links")
+        connection.exec_driver_sql(
+            "INSERT INTO links (url, author, book_author, title, downloaded, has_epub, has_pdf) "
+            "VALUES (?, ?, ?, ?, ?, 1, 0)",
+            [
+                (
+                    f"https://example.com/book/{n}",
+                    f"author-{n % AUTHORS}",
+                    f"Author {n % AUTHORS}",
+                    f"Book {n}",
+                    # Every third author is fully downloaded, the rest have one book left
+                    0 if (n % AUTHORS) % 3 and n < AUTHORS else 1
+                )
+                for n in range(ROWS)
+            ]
+        )
+    # Flush the inserts out of the WAL so they are not charged to the cleanup being measured
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def python_grouping(session):
+    author_books = defaultdict(list)
+    for link in session.exec(select(Link)).all():
+        if link.author:
+            author_books[link.author].append(link)
+    
+    deleted = 0
+    for books in author_books.values():
+        if all(book.downloaded == 1 for book in books):
+            for book in books:
+                session.delete(book)
+                deleted += 1
+    session.commit()
+    return deleted
+
+
+def sql_grouping(session):
+    session.exec(fully_downloaded_authors()).all()
+    candidate_slugs = fully_downloaded_authors().with_only_columns(Link.author)
+    return bulk_delete(session, Link, Link.author.in_(candidate_slugs))
+
+
+def dry_run(session):
+    return sum(book_count for _, _, book_count in session.exec(fully_downloaded_authors()).all())
+
+
+def measure(engine, name, fn):
+    populate(engine)
+    with Session(engine) as session:
+        tracemalloc.start()
+        start = time.perf_counter()
+        books = fn(session)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:28} {books:8} books {elapsed * 1000:10.1f} ms   peak {peak / 1024 / 1024:7.2f} MiB")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        run_migrations(engine)
+        
+        print(f"Cleaning up {ROWS} links across {AUTHORS} authors")
+        measure(engine, "GROUP BY dry run", dry_run)
+        measure(engine, "GROUP BY + set-based DELETE", sql_grouping)
+        measure(engine, "Python grouping (old)", python_grouping)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Enqueue benchmark for POST /download.
+
+Enqueues a 2,000-book author into a temporary database that already holds
+queue history, comparing the old per-book SELECT + flush + refresh loop with
+the bulk POST /download path (IN lookups and multi-row INSERT ... RETURNING)
+and POST /authors/{slug}/enqueue (one INSERT ... SELECT from links).
+    
+    cd api && python benchmarks/bench_enqueue.py [books]
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+from models import build_engine, Link, QueueItem
+from migrations import run_migrations
+from constants import QueueStatus
+from utils.bulk_ops import enqueue_books, enqueue_links, ACTIVE_QUEUE_STATUSES
+
+BOOKS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+HISTORY = 100_000
+
+
+def populate(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM queue")
+        connection.exec_driver_sql("DELETE FROM links")
+        connection.exec_driver_sql(
+            "INSERT INTO links (url, author, book_author, title, book_url, downloaded, has_epub, has_pdf) "
+            "VALUES (?, 'bench-author', 'Bench Author', ?, ?, 0, 1, 0)",
+            [(f"https://example.com/book/{n}", f"Book {n}", f"https://example.com/download/{n}") for n in range(BOOKS)]
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO queue (book_title, book_url, created_at, retry_count, status, bytes_downloaded, version) "
+            "VALUES (?, ?, ?, 0, ?, 0, 0)",
+            [
+                (f"Old {n}", f"https://example.com/old/{n}", f"2026-01-01T00:00:{n:09d}", "completed")
+                for n in range(HISTORY)
+            ]
+        )
+
+
+def per_book(session, books):
+    for book in books:
+        existing = session.exec(
+            select(QueueItem).where(
+                QueueItem.book_url == book["bookUrl"],
+                QueueItem.status.in_(ACTIVE_QUEUE_STATUSES)
+            )
+        ).first()
+        if existing:
+            continue
+        queue_item = QueueItem(
+            book_title=book["bookTitle"],
+            book_url=book["bookUrl"],
+            book_author=book["bookAuthor"],
+            status=QueueStatus.PENDING.value
+        )
+        session.add(queue_item)
+        session.flush()
+        session.refresh(queue_item)
+    session.commit()
+
+
+def measure(engine, name, fn, books):
+    populate(engine)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        fn(session, books)
+        first = time.perf_counter() - start
+        # Enqueue the same author again: everything is a duplicate now
+        start = time.perf_counter()
+        fn(session, books)
+        again = time.perf_counter() - start
+    print(f"{name:26} {first * 1000:9.1f} ms new   {again * 1000:9.1f} ms all duplicates")
+
+
+def main():
+    books = [
+        {"bookUrl": f"https://example.com/download/{n}", "bookTitle": f"Book {n}", "bookAuthor": "Bench Author"}
+        for n in range(BOOKS)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        run_migrations(engine)
+        
+        print(f"Enqueueing {BOOKS} books on top of {HISTORY} queue rows")
+        measure(engine, "per-book SELECT + flush", per_book, books)
+        measure(engine, "bulk IN + INSERT RETURNING", enqueue_books, books)
+        measure(
+            engine,
+            "author INSERT ... SELECT",
+            lambda session, _: enqueue_links(session, Link.author == "bench-author", Link.downloaded == 0),
+            books
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
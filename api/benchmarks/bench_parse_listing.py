@@ -0,0 +1,95 @@
+"""
+Listing page parse benchmark.
+
+Compares the old extraction path (parse the page, re-serialize every article and
+parse it again) with the single-pass path used by scrape_author, for each
+installed parser backend, and checks both produce identical output.
+
+    cd api && python benchmarks/bench_parse_listing.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from utils import html_parser
+from utils.scraper_utils import parse_article_html
+
+ARTICLES_PER_PAGE = 20
+ROUNDS = 50
+
+ARTICLE = """
+<article class="post-{n} post type-post status-publish">
+    <header class="entry-header">
+        <a class="entry-image-link" href="https://oceanofpdf.com/authors/test-author/book-{n}/">
+            <img data-src="https://oceanofpdf.com/images/book-{n}.jpg" src="data:image/gif;base64,R0lGOD" />
+        </a>
+        <h2 class="entry-title">
+            <a href="https://oceanofpdf.com/authors/test-author/book-{n}/">[EPUB] Book Number {n} by Test Author</a>
+        </h2>
+        <p class="entry-meta"><time class="entry-time">January {day}, 2026</time></p>
+    </header>
+    <div class="postmetainfo">
+        <strong>Author:</strong> Test Author<br>
+        <strong>Language:</strong> English<br>
+        <strong>Genre:</strong> Fiction, Fantasy<br>
+    </div>
+    <div class="entry-content">
+        <p>A long description of book {n}. [PDF] [EPUB] Lorem ipsum dolor sit amet, consectetur
+        adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>
+    </div>
+</article>
+"""
+
+
+def listing_page():
+    articles = "".join(ARTICLE.format(n=n, day=n % 28 + 1) for n in range(ARTICLES_PER_PAGE))
+    return f"<html><head><title>Listing</title></head><body><main>{articles}</main></body></html>"
+
+
+def old_path(page_html, parser):
+    html = BeautifulSoup(page_html, parser)
+    results = []
+    for article in html.find_all("article"):
+        article_soup = BeautifulSoup(str(article), parser)
+        results.append(parse_article_html(article_soup))
+    return results
+
+
+def single_pass(page_html, parser):
+    html = BeautifulSoup(page_html, parser)
+    return [parse_article_html(article) for article in html.find_all("article")]
+
+
+def timed(fn, page_html, parser):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn(page_html, parser)
+    return (time.perf_counter() - start) / ROUNDS, result
+
+
+def main():
+    page_html = listing_page()
+    backends = [name for name in ("html.parser", "lxml", "html5lib") if builder_registry.lookup(name)]
+    baseline = None
+    
+    print(f"{ARTICLES_PER_PAGE} articles per page, {ROUNDS} rounds")
+    for parser in backends:
+        html_parser.parser_backend = parser
+        old_time, old_result = timed(old_path, page_html, parser)
+        new_time, new_result = timed(single_pass, page_html, parser)
+        baseline = baseline or old_time
+        
+        assert old_result == new_result, f"{parser}: single-pass output differs"
+        print(
+            f"{parser:12} re-parse {old_time * 1000:7.2f} ms/page   "
+            f"single pass {new_time * 1000:7.2f} ms/page   "
+            f"({old_time / new_time:.1f}x, {baseline / new_time:.1f}x vs html.parser re-parse)"
+        )
+
+
+if __name__ == "__main__":
+    main()
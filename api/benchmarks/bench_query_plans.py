@@ -0,0 +1,107 @@
+"""
+Query plan benchmark for the hot links/queue lookups.
+
+Builds a 200k-row links table and a 200k-row queue table in a temporary
+database without the migration indexes, prints each query's plan and timing,
+then applies the migrations and prints them again.
+
+    cd api && python benchmarks/bench_query_plans.py [rows]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, create_engine
+from models import Link, QueueItem  # registers the tables on SQLModel.metadata
+from migrations import run_migrations
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+AUTHORS = 2_000
+ROUNDS = 20
+
+QUERIES = [
+    ("GET /links?author=", "SELECT url, title FROM links WHERE author = 'author-1234'"),
+    ("DELETE /authors/{slug} probe", "SELECT COUNT(*) FROM links WHERE author = 'author-1234'"),
+    ("worker Link.book_url lookup", "SELECT url FROM links WHERE book_url = 'https://example.com/download/123456'"),
+    (
+        "/download dedupe probe",
+        "SELECT id FROM queue WHERE book_url = 'https://example.com/download/123456' "
+        "AND status IN ('pending', 'in_progress')"
+    ),
+    (
+        "worker next pending",
+        "SELECT id FROM queue WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+    ),
+]
+
+INDEXES = ["ix_links_author", "ix_links_author_downloaded", "ix_links_book_url", "ix_queue_book_url", "ix_queue_status_created_at"]
+
+
+def populate(engine):
+    random.seed(1)
+    statuses = ["completed"] * 97 + ["failed"] * 2 + ["pending"]
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO links (url, author, title, downloaded, book_url, has_epub, has_pdf) "
+            "VALUES (?, ?, ?, 0, ?, 1, 0)",
+            [
+                (
+                    f"https://example.com/book/{n}",
+                    f"author-{n % AUTHORS}",
+                    f"Book {n}",
+                    f"https://example.com/download/{n}"
+                )
+                for n in range(ROWS)
+            ]
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO queue (book_title, book_url, created_at, retry_count, status, bytes_downloaded, version) "
+            "VALUES (?, ?, ?, 0, ?, 0, 0)",
+            [
+                (
+                    f"Book {n}",
+                    f"https://example.com/download/{n}",
+                    f"2026-01-01T00:00:{n:09d}",
+                    random.choice(statuses)
+                )
+                for n in range(ROWS)
+            ]
+        )
+
+
+def report(engine, label):
+    print(f"\n== {label} ==")
+    with engine.connect() as connection:
+        for name, query in QUERIES:
+            plan = "; ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}"))
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                connection.exec_driver_sql(query).fetchall()
+            elapsed = (time.perf_counter() - start) / ROUNDS
+            print(f"{name:30} {elapsed * 1000:9.3f} ms   {plan}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as connection:
+            for index in INDEXES:
+                connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index}")
+        
+        print(f"Populating {ROWS} links and {ROWS} queue rows...")
+        populate(engine)
+        
+        report(engine, "Before migrations (no indexes)")
+        version = run_migrations(engine)
+        report(engine, f"After migrations (schema version {version})")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
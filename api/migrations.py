@@ -0,0 +1,186 @@
+"""
+Versioned schema migrations.
+
+`SQLModel.metadata.create_all` creates missing tables for a new database, but it
+never changes tables that already exist. Every change to an existing table (new
+columns, indexes, data backfills) is a numbered migration here instead. Applied
+versions are recorded in the `schema_migrations` table, and `run_migrations`
+applies any that are missing, in order, each in its own transaction.
+
+To add a migration, append a function decorated with the next version number.
+Migrations must be safe to run against a database created by the current models
+(e.g. use IF NOT EXISTS and check columns before adding them).
+"""
+from datetime import datetime
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return fn
+    return register
+
+
+def _columns(connection, table: str):
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _add_missing_columns(connection, table: str, columns):
+    existing = _columns(connection, table)
+    for column_name, column_type in columns:
+        if column_name not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
+            print(f"  Added column: {table}.{column_name}")
+
+
+@migration(1, "Add parsed book metadata columns to links and backfill them from article HTML")
+def _links_metadata_columns(connection):
+    _add_missing_columns(connection, "links", [
+        ("title", "VARCHAR"),
+        ("book_author", "VARCHAR"),
+        ("date", "VARCHAR"),
+        ("language", "VARCHAR"),
+        ("genre", "VARCHAR"),
+        ("image_url", "VARCHAR"),
+        ("book_url", "VARCHAR"),
+        ("description", "VARCHAR"),
+        ("has_epub", "INTEGER NOT NULL DEFAULT 0"),
+        ("has_pdf", "INTEGER NOT NULL DEFAULT 0"),
+    ])
+    
+    rows = connection.exec_driver_sql(
+        "SELECT rowid, article FROM links WHERE title IS NULL AND article IS NOT NULL AND article != ''"
+    ).fetchall()
+    if not rows:
+        return
+    
+    from utils.scraper_utils import parse_article_html
+    
+    print(f"  Backfilling metadata for {len(rows)} link(s)")
+    for rowid, article_html in rows:
+        parsed = parse_article_html(article_html)
+        connection.exec_driver_sql(
+            """
+            UPDATE links
+            SET title = ?, book_author = ?, date = ?, language = ?, genre = ?,
+                image_url = ?, book_url = ?, description = ?, has_epub = ?, has_pdf = ?
+            WHERE rowid = ?
+            """,
+            (
+                parsed['title'],
+                parsed['book_author'],
+                parsed['date'],
+                parsed['language'],
+                parsed['genre'],
+                parsed['image_url'],
+                parsed['book_url'],
+                parsed['description'],
+                1 if parsed['has_epub'] else 0,
+                1 if parsed['has_pdf'] else 0,
+                rowid
+            )
+        )
+
+
+@migration(2, "Index links.author, links.book_url, queue.book_url and queue(status, created_at)")
+def _hot_query_indexes(connection):
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_links_author ON links (author)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_links_book_url ON links (book_url)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_queue_book_url ON queue (book_url)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_queue_status_created_at ON queue (status, created_at)")
+    connection.exec_driver_sql("ANALYZE")
+
+
+@migration(3, "Replace ix_links_author with covering index links(author, downloaded, book_author)")
+def _cleanup_covering_index(connection):
+    # Serves the /authors/cleanup GROUP BY without table lookups, and every
+    # author lookup ix_links_author served, so that index is dropped
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_links_author_downloaded ON links (author, downloaded, book_author)"
+    )
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_links_author")
+    connection.exec_driver_sql("ANALYZE")
+
+
+@migration(4, "Add download progress columns to queue")
+def _queue_progress_columns(connection):
+    _add_missing_columns(connection, "queue", [
+        ("bytes_downloaded", "INTEGER NOT NULL DEFAULT 0"),
+        ("total_bytes", "INTEGER"),
+    ])
+
+
+@migration(5, "Add queue change versions, tombstones and the triggers that maintain them")
+def _queue_change_versions(connection):
+    from models import QUEUE_VERSION_TRIGGERS
+    
+    _add_missing_columns(connection, "queue", [("version", "INTEGER NOT NULL DEFAULT 0")])
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_queue_version ON queue (version)")
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS change_counters (name VARCHAR NOT NULL PRIMARY KEY, version INTEGER NOT NULL)"
+    )
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS queue_tombstones (version INTEGER NOT NULL PRIMARY KEY, queue_id INTEGER NOT NULL)"
+    )
+    for trigger in QUEUE_VERSION_TRIGGERS:
+        connection.exec_driver_sql(trigger)
+    
+    # Give existing rows distinct versions so the first delta sync sees all of them
+    connection.exec_driver_sql("UPDATE queue SET version = id WHERE version = 0")
+    connection.exec_driver_sql(
+        "INSERT INTO change_counters (name, version) VALUES ('queue', (SELECT COALESCE(MAX(id), 0) FROM queue)) "
+        "ON CONFLICT (name) DO UPDATE SET version = MAX(version, excluded.version)"
+    )
+
+
+@migration(6, "Add queue.next_attempt_at for scheduled retries")
+def _queue_next_attempt_at(connection):
+    _add_missing_columns(connection, "queue", [("next_attempt_at", "VARCHAR")])
+
+
+def get_schema_version(connection) -> int:
+    """Highest applied migration version, or 0 for an unversioned database"""
+    _ensure_migrations_table(connection)
+    version = connection.exec_driver_sql("SELECT MAX(version) FROM schema_migrations").scalar()
+    return version or 0
+
+
+def _ensure_migrations_table(connection):
+    connection.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def run_migrations(engine) -> int:
+    """Apply every pending migration in order. Returns the resulting schema version."""
+    with engine.begin() as connection:
+        current = get_schema_version(connection)
+    
+    for version, description, fn in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        with engine.begin() as connection:
+            # Claim the version before applying it. The INSERT is the transaction's
+            # first statement, so it takes the write lock and waits for any other
+            # process (API server or worker) migrating at the same time; if that
+            # process applied this version meanwhile, the row already exists.
+            claimed = connection.exec_driver_sql(
+                "INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat())
+            ).rowcount
+            if claimed:
+                print(f"Applying migration {version}: {description}")
+                fn(connection)
+        current = version
+    
+    return current
@@ -1,11 +1,17 @@
-from sqlmodel import SQLModel, Field, create_engine, Session
+from sqlmodel import SQLModel, Field, create_engine, Session, select, delete
+from sqlalchemy import DDL, Index, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 from typing import Optional
 from constants import QueueStatus
+from migrations import run_migrations
 import os
 
 class Link(SQLModel, table=True):
     __tablename__ = "links"
+    __table_args__ = (
+        Index("ix_links_author_downloaded", "author", "downloaded", "book_author"),
+    )
     
     url: str = Field(primary_key=True)
     author: Optional[str] = None
@@ -17,7 +23,7 @@ class Link(SQLModel, table=True):
     language: Optional[str] = None
     genre: Optional[str] = None
     image_url: Optional[str] = None
-    book_url: Optional[str] = None
+    book_url: Optional[str] = Field(default=None, index=True)
     description: Optional[str] = None
     has_epub: int = 0
     has_pdf: int = 0
@@ -25,10 +31,13 @@ class Link(SQLModel, table=True):
 
 class QueueItem(SQLModel, table=True):
     __tablename__ = "queue"
+    __table_args__ = (
+        Index("ix_queue_status_created_at", "status", "created_at"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     book_title: str
-    book_url: str
+    book_url: str = Field(index=True)
     book_author: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
     started_at: Optional[str] = None
@@ -36,6 +45,158 @@ class QueueItem(SQLModel, table=True):
     retry_count: int = 0
     status: str = Field(default=QueueStatus.PENDING.value)
     error_message: Optional[str] = None
+    # A pending retry is not claimed before this time
+    next_attempt_at: Optional[str] = None
+    bytes_downloaded: int = 0
+    total_bytes: Optional[int] = None
+    # Set by the queue_version_* triggers on every insert and update
+    version: int = Field(default=0, index=True)
+
+
+class ChangeCounter(SQLModel, table=True):
+    """Monotonic change counters, e.g. the queue's current version"""
+    __tablename__ = "change_counters"
+    
+    name: str = Field(primary_key=True)
+    version: int = 0
+
+
+def bump_change_counter(session: Session, name: str) -> int:
+    """Add one to a change counter in the session's transaction and return the new version"""
+    statement = sqlite_insert(ChangeCounter).values(name=name, version=1)
+    return session.exec(statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': ChangeCounter.version + 1}
+    ).returning(ChangeCounter.version)).scalar()
+
+
+class QueueTombstone(SQLModel, table=True):
+    """Deleted queue item ids, kept for the last QUEUE_CHANGE_RETENTION changes"""
+    __tablename__ = "queue_tombstones"
+    
+    version: int = Field(primary_key=True)
+    queue_id: int
+
+
+# Every write to the queue - API server, worker, bulk statements - bumps the
+# "queue" counter and stamps the row (or a tombstone) with the new version, so
+# GET /queue?since=<version> can return just what changed.
+QUEUE_CHANGE_RETENTION = 10000
+
+
+def _bump_counter(name: str) -> str:
+    return (
+        f"INSERT INTO change_counters (name, version) VALUES ('{name}', 1) "
+        "ON CONFLICT (name) DO UPDATE SET version = version + 1;"
+    )
+
+
+_BUMP_QUEUE_VERSION = _bump_counter("queue")
+_QUEUE_VERSION = "(SELECT version FROM change_counters WHERE name = 'queue')"
+
+QUEUE_VERSION_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS queue_version_insert AFTER INSERT ON queue
+    BEGIN
+        {_BUMP_QUEUE_VERSION}
+        UPDATE queue SET version = {_QUEUE_VERSION} WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS queue_version_update AFTER UPDATE ON queue
+    WHEN NEW.version IS OLD.version
+    BEGIN
+        {_BUMP_QUEUE_VERSION}
+        UPDATE queue SET version = {_QUEUE_VERSION} WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS queue_version_delete AFTER DELETE ON queue
+    BEGIN
+        {_BUMP_QUEUE_VERSION}
+        INSERT INTO queue_tombstones (version, queue_id) VALUES ({_QUEUE_VERSION}, OLD.id);
+    END
+    """,
+]
+
+for _trigger in QUEUE_VERSION_TRIGGERS:
+    event.listen(QueueItem.__table__, "after_create", DDL(_trigger))
+
+
+def prune_queue_tombstones(session: Session):
+    """
+    Drop tombstones older than the last QUEUE_CHANGE_RETENTION queue changes.
+    Called once per delete statement; a trigger would run it for every row.
+    """
+    queue_version = select(ChangeCounter.version).where(ChangeCounter.name == "queue").scalar_subquery()
+    statement = delete(QueueTombstone).where(QueueTombstone.version <= queue_version - QUEUE_CHANGE_RETENTION)
+    session.exec(statement.execution_options(synchronize_session=False))
+
+
+class WorkerEndpoint(SQLModel, table=True):
+    """Loopback UDP port of a running worker process, nudged when books are queued"""
+    __tablename__ = "worker_endpoints"
+    
+    port: int = Field(primary_key=True)
+    pid: int
+    started_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+
+class HostRateLimit(SQLModel, table=True):
+    """
+    Shared request pacing for one remote host (see utils/rate_limiter.py). Times
+    are Unix timestamps so every process reads them the same way.
+    """
+    __tablename__ = "host_rate_limits"
+    
+    host: str = Field(primary_key=True)
+    rate: float
+    next_slot: float = 0.0
+    last_slot: float = 0.0
+    blocked_until: float = 0.0
+
+
+class HttpCookie(SQLModel, table=True):
+    """Persistent HTTP cookie (e.g. Cloudflare clearance) shared by every process's HTTP client"""
+    __tablename__ = "http_cookies"
+    
+    domain: str = Field(primary_key=True)
+    path: str = Field(primary_key=True)
+    name: str = Field(primary_key=True)
+    value: str
+    expires: int
+    secure: int = 0
+
+
+class AuthorScrapeState(SQLModel, table=True):
+    __tablename__ = "author_scrape_state"
+    
+    author: str = Field(primary_key=True)
+    newest_url: Optional[str] = None
+    last_scraped_at: Optional[str] = None
+
+
+class ScrapeJob(SQLModel, table=True):
+    __tablename__ = "scrape_jobs"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    completed_at: Optional[str] = None
+
+
+class ScrapeJobAuthor(SQLModel, table=True):
+    __tablename__ = "scrape_job_authors"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="scrape_jobs.id", index=True)
+    author: str
+    full_scrape: int = 0
+    status: str = Field(default=QueueStatus.PENDING.value)
+    current_page: int = 0
+    books_added: int = 0
+    error_message: Optional[str] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -46,12 +207,55 @@ os.makedirs(DB_DIR, exist_ok=True)
 
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# SQLite tuning, shared by the API server, worker and scraper processes
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 30000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative values are KiB, positive values are pages
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64000))
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", 10))
+SQLITE_MAX_OVERFLOW = int(os.environ.get("SQLITE_MAX_OVERFLOW", 10))
+
+
+def build_engine(database_url: str = DATABASE_URL):
+    """
+    Create an engine for a SQLite file that several processes write to at once.
+    WAL lets readers proceed while a writer commits, and the busy timeout makes
+    writers queue for the lock instead of failing with "database is locked".
+    """
+    engine = create_engine(
+        database_url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    
+    @event.listens_for(engine, "connect")
+    def configure_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.close()
+    
+    return engine
+
+
+engine = build_engine()
 
 
 def create_db_and_tables():
-    """Initialize database and create all tables"""
-    SQLModel.metadata.create_all(engine)
+    """Initialize database, create all tables and apply pending schema migrations"""
+    with engine.connect() as connection:
+        # The API server and worker start together; holding the write lock while
+        # create_all checks for and creates tables stops both creating them
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        SQLModel.metadata.create_all(connection)
+        connection.commit()
+    run_migrations(engine)
 
 
 def get_session():
@@ -1,3 +1,4 @@
+import argparse
 from sqlmodel import Session
 from api.utils.scraper_utils import scrape_author, format_author_name
 from models import create_db_and_tables, engine
@@ -5,6 +6,10 @@ from models import create_db_and_tables, engine
 create_db_and_tables()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape author listings into the links table")
+    parser.add_argument("--full", action="store_true", help="re-walk every listing page instead of stopping at already stored books")
+    args = parser.parse_args()
+    
     print ("Starting author scraper. Provide empty author name to exit")
     while True: 
         author = format_author_name(input("\nEnter author name (as in URL, e.g. 'j-k-rowling'): "))
@@ -13,7 +18,7 @@ if __name__ == "__main__":
             break
         print("Author: ", author)
         with Session(engine) as session:
-            result = scrape_author(author, session)
+            result = scrape_author(author, session, full=args.full)
         if result['success']:
             print(f"Successfully added {result['books_added']} books!")
         else:
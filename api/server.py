@@ -1,33 +1,79 @@
 import os
+import json
+import signal
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import cloudscraper
 from urllib.parse import urljoin
-from sqlmodel import Session, select
-from utils.scraper_utils import scrape_author, format_author_name
+from sqlmodel import Session, select, func, or_
+from sqlalchemy import literal_column
+from utils.scraper_utils import format_author_name
 from utils.download_utils import download_book
-from models import create_db_and_tables, engine, Link, QueueItem
+from utils.bulk_ops import bulk_delete, fully_downloaded_authors, enqueue_books, enqueue_links
+from utils import queue_events
+from utils.queue_events import (
+    QueueBroadcaster, queue_item_json, format_sse, queue_changes_since, current_queue_version
+)
+from utils.result_cache import result_cache, current_links_version, links_etag, etag_matches
+from utils.worker_wakeup import notify_workers
+from utils.scrape_jobs import submit_scrape_job, get_scrape_job, resume_unfinished_jobs, executor as scrape_executor
+from models import create_db_and_tables, engine, prune_queue_tombstones, Link, QueueItem
 from constants import QueueStatus
 
-headers = {'Accept-Encoding': 'identity', 'User-Agent': 'Defined'}
-scraper = cloudscraper.create_scraper()
-
 # uvicorn server:app --host 0.0.0.0 --port 8000
 
 FRONTEND_ORIGIN = "http://localhost:5173"
 
 create_db_and_tables()
 
+queue_broadcaster = QueueBroadcaster(engine)
+
+
+def close_streams_on_exit():
+    """
+    uvicorn waits for open connections to finish before it runs the lifespan
+    shutdown, and a queue stream never finishes on its own, so Ctrl+C and
+    --reload would hang while a tab has the queue open. Chain onto uvicorn's
+    SIGINT/SIGTERM handlers to end the streams as soon as shutdown begins.
+    """
+    # Signal handlers can only be installed from the main thread (not under TestClient)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+        
+        def handle_exit(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(queue_broadcaster.close)
+            previous(signum, frame)
+        
+        signal.signal(sig, handle_exit)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    resume_unfinished_jobs()
+    close_streams_on_exit()
+    yield
+    queue_broadcaster.close()
+    scrape_executor.shutdown(wait=False, cancel_futures=True)
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[FRONTEND_ORIGIN],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Queue-Version", "ETag"],
 )
 
 def get_filename(url):
@@ -42,147 +88,224 @@ async def downloadFile(body: dict):
     
     try:
         with Session(engine) as session:
-            results = []
-            added = 0
-            skipped = 0
-            
-            for book in books:
-                book_url = book.get("bookUrl")
-                book_title = book.get("bookTitle", "Unknown Book")
-                book_author = book.get("bookAuthor")
-                
-                if not book_url:
-                    results.append({
-                        "bookUrl": book_url,
-                        "bookTitle": book_title,
-                        "success": False,
-                        "error": "bookUrl is required"
-                    })
-                    continue
-                
-                # Check if already in queue
-                existing = session.exec(
-                    select(QueueItem).where(
-                        QueueItem.book_url == book_url,
-                        QueueItem.status.in_([QueueStatus.PENDING.value, QueueStatus.IN_PROGRESS.value])
-                    )
-                ).first()
-                
-                if existing:
-                    results.append({
-                        "bookUrl": book_url,
-                        "bookTitle": book_title,
-                        "success": True,
-                        "skipped": True,
-                        "queue_id": existing.id,
-                        "message": "Book already in queue"
-                    })
-                    skipped += 1
-                    continue
-                
-                queue_item = QueueItem(
-                    book_title=book_title,
-                    book_url=book_url,
-                    book_author=book_author,
-                    status=QueueStatus.PENDING.value
-                )
-                session.add(queue_item)
-                session.flush()
-                session.refresh(queue_item)
-                
-                results.append({
-                    "bookUrl": book_url,
-                    "bookTitle": book_title,
-                    "success": True,
-                    "queue_id": queue_item.id,
-                    "message": "Book added to download queue"
-                })
-                added += 1
-            
-            session.commit()
-            
-            return {
-                "success": True,
-                "total": len(books),
-                "added": added,
-                "skipped": skipped,
-                "results": results
-            }
+            results = enqueue_books(session, books)
+            if any(result["success"] and not result.get("skipped") for result in results):
+                notify_workers(session)
         
+        return {
+            "success": True,
+            "total": len(books),
+            "added": sum(1 for result in results if result["success"] and not result.get("skipped")),
+            "skipped": sum(1 for result in results if result.get("skipped")),
+            "results": results
+        }
+    
     except Exception as e:
         print(f"Error adding to queue: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/authors")
-async def get_all_authors():
+def cached_links_response(request: Request, key, build) -> Response:
+    """
+    Serve a JSON response built only from the links table. The links change
+    version is the ETag: a matching If-None-Match gets 304, and otherwise the
+    encoded body is reused from result_cache until a write moves the version.
+    `build(session)` returns (content, extra headers).
+    """
     with Session(engine) as session:
+        # Read the version before building, so a body is never cached under a
+        # newer version than the data it was built from
+        version = current_links_version(session)
+        cache_headers = {"ETag": links_etag(version), "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), cache_headers["ETag"]):
+            return Response(status_code=304, headers=cache_headers)
+        
+        cached = result_cache.get(key, version)
+        if cached:
+            body, headers = cached
+        else:
+            content, headers = build(session)
+            body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            result_cache.put(key, version, body, headers)
+    
+    return Response(content=body, media_type="application/json", headers={**headers, **cache_headers})
+
+
+@app.get("/authors")
+async def get_all_authors(request: Request):
+    def build(session):
         statement = select(Link.author, Link.book_author).where(
             Link.author.is_not(None),
             Link.author != ''
         ).distinct().order_by(Link.book_author)
         results = session.exec(statement).all()
-    return {row[0]: row[1] or row[0] for row in results}
+        return {row[0]: row[1] or row[0] for row in results}, {}
+    
+    return cached_links_response(request, ("authors",), build)
+
+
+# Response field name -> (column, serializer). "article" holds the raw listing
+# HTML and is only returned when explicitly requested with ?fields=.
+LINK_FIELDS = {
+    "url": (Link.url, lambda value: value),
+    "author": (Link.author, lambda value: value),
+    "article": (Link.article, lambda value: value),
+    "downloaded": (Link.downloaded, bool),
+    "title": (Link.title, lambda value: value or ""),
+    "bookAuthor": (Link.book_author, lambda value: value or ""),
+    "date": (Link.date, lambda value: value or ""),
+    "language": (Link.language, lambda value: value or ""),
+    "genre": (Link.genre, lambda value: value or ""),
+    "imageUrl": (Link.image_url, lambda value: value or ""),
+    "bookUrl": (Link.book_url, lambda value: value or ""),
+    "description": (Link.description, lambda value: value or ""),
+    "hasEpub": (Link.has_epub, bool),
+    "hasPdf": (Link.has_pdf, bool),
+}
+DEFAULT_LINK_FIELDS = [name for name in LINK_FIELDS if name != "article"]
+MAX_LINKS_PAGE_SIZE = 1000
+
+
+def link_filters(
+    author: Optional[str] = None,
+    downloaded: Optional[bool] = None,
+    has_epub: Optional[bool] = None,
+    language: Optional[str] = None,
+    genre: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """WHERE criteria for the link filters shared by GET /links and author enqueue"""
+    criteria = []
+    if author:
+        criteria.append(Link.author == author)
+    if downloaded is not None:
+        criteria.append(Link.downloaded == (1 if downloaded else 0))
+    if has_epub is not None:
+        criteria.append(Link.has_epub == (1 if has_epub else 0))
+    if language:
+        criteria.append(func.lower(Link.language) == language.lower())
+    if genre:
+        criteria.append(Link.genre.contains(genre))
+    if search and search.strip():
+        term = search.strip()
+        criteria.append(or_(*[
+            column.icontains(term, autoescape=True)
+            for column in (Link.title, Link.book_author, Link.author, Link.genre, Link.description)
+        ]))
+    return criteria
 
 
 @app.get("/links")
-async def get_links(author: Optional[str] = Query(default=None)):
-    with Session(engine) as session:
-        statement = select(Link)
-        if author:
-            statement = statement.where(Link.author == author)
-        links = session.exec(statement).all()
+async def get_links(
+    request: Request,
+    author: Optional[str] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_LINKS_PAGE_SIZE),
+    after: Optional[int] = Query(default=None, description="cursor from the previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(default=None, description="comma-separated response fields"),
+    downloaded: Optional[bool] = Query(default=None),
+    has_epub: Optional[bool] = Query(default=None, alias="hasEpub"),
+    language: Optional[str] = Query(default=None),
+    genre: Optional[str] = Query(default=None),
+    search: Optional[str] = Query(default=None, description="case-insensitive match on title, author, genre or description"),
+):
+    """
+    List links in scrape order. With `limit`, results are paged by keyset: pass the
+    X-Next-Cursor response header back as `after` to get the next page. The first
+    page also carries the number of matching links in X-Total-Count.
+    """
+    field_names = DEFAULT_LINK_FIELDS
+    if fields:
+        field_names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in field_names if name not in LINK_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+        if "url" not in field_names:
+            field_names = ["url"] + field_names
     
-    return [
-        {
-            "url": link.url,
-            "author": link.author,
-            "article": link.article,
-            "downloaded": bool(link.downloaded),
-            "title": link.title or "",
-            "bookAuthor": link.book_author or "",
-            "date": link.date or "",
-            "language": link.language or "",
-            "genre": link.genre or "",
-            "imageUrl": link.image_url or "",
-            "bookUrl": link.book_url or "",
-            "description": link.description or "",
-            "hasEpub": bool(link.has_epub),
-            "hasPdf": bool(link.has_pdf),
-        }
-        for link in links
-    ]
+    rowid = literal_column("links.rowid")
+    criteria = link_filters(author, downloaded, has_epub, language, genre, search)
+    statement = select(rowid, *[LINK_FIELDS[name][0] for name in field_names]).where(*criteria)
+    if after is not None:
+        statement = statement.where(rowid > after)
+    statement = statement.order_by(rowid)
+    if limit:
+        statement = statement.limit(limit + 1)
+    
+    def build(session):
+        rows = session.exec(statement).all()
+        headers = {}
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1][0])
+        if limit and after is None:
+            headers["X-Total-Count"] = str(session.exec(select(func.count()).select_from(Link).where(*criteria)).one())
+        
+        serializers = [LINK_FIELDS[name][1] for name in field_names]
+        content = [
+            {
+                name: serialize(value)
+                for name, serialize, value in zip(field_names, serializers, row[1:])
+            }
+            for row in rows
+        ]
+        return content, headers
+    
+    key = ("links", author, limit, after, tuple(field_names), downloaded, has_epub, language, genre, search)
+    return cached_links_response(request, key, build)
+
+
+@app.get("/links/languages")
+async def get_link_languages(request: Request, author: Optional[str] = Query(default=None)):
+    """Distinct book languages, optionally for one author, for the language filter"""
+    statement = select(Link.language).where(
+        *link_filters(author), Link.language.is_not(None), Link.language != ''
+    ).distinct().order_by(Link.language)
+    
+    def build(session):
+        return session.exec(statement).all(), {}
+    
+    return cached_links_response(request, ("languages", author), build)
 
 
 @app.delete("/authors/cleanup")
-async def cleanup_downloaded_authors():
+async def cleanup_downloaded_authors(
+    dry_run: bool = Query(default=False, alias="dryRun"),
+    batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")
+):
+    """
+    Delete every author whose books have all been downloaded. With dryRun, only
+    report the authors and book counts that would be deleted.
+    """
     try:
         with Session(engine) as session:
-            all_links = session.exec(select(Link)).all()
-            
-            from collections import defaultdict
-            author_books = defaultdict(list)
-            for link in all_links:
-                if link.author:
-                    author_books[link.author].append(link)
+            candidates = session.exec(fully_downloaded_authors()).all()
+            authors = [
+                {"author": author_slug, "name": author_name or author_slug, "books": book_count}
+                for author_slug, author_name, book_count in candidates
+            ]
             
-            deleted_authors = []
-            total_books_deleted = 0
-            
-            for author_slug, books in author_books.items():
-                if all(book.downloaded == 1 for book in books):
-                    author_name = books[0].book_author or author_slug
-                    for book in books:
-                        session.delete(book)
-                        total_books_deleted += 1
-                    deleted_authors.append(author_name)
+            if dry_run:
+                return {
+                    "success": True,
+                    "dry_run": True,
+                    "authors_to_delete": len(authors),
+                    "books_to_delete": sum(author["books"] for author in authors),
+                    "authors": authors
+                }
             
-            session.commit()
+            # The grouping is re-evaluated inside the DELETE, so an author who gained
+            # undownloaded books since the lookup above is kept
+            candidate_slugs = fully_downloaded_authors().with_only_columns(Link.author)
+            total_books_deleted = bulk_delete(
+                session, Link, Link.author.in_(candidate_slugs), batch_size=batch_size
+            ) if authors else 0
         
+        deleted_authors = [author["name"] for author in authors]
         print(f"Cleanup: Deleted {len(deleted_authors)} author(s) with {total_books_deleted} book(s)")
         return {
             "success": True,
+            "dry_run": False,
             "authors_deleted": len(deleted_authors),
             "books_deleted": total_books_deleted,
             "deleted_author_names": deleted_authors
@@ -195,17 +318,12 @@ async def cleanup_downloaded_authors():
 
 
 @app.delete("/authors/all")
-async def delete_all_authors():
+async def delete_all_authors(batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")):
     """Delete all authors and books from the database."""
     try:
         with Session(engine) as session:
-            all_links = session.exec(select(Link)).all()
-            author_count = len(set(link.author for link in all_links if link.author))
-            book_count = len(all_links)
-            
-            for link in all_links:
-                session.delete(link)
-            session.commit()
+            author_count = session.exec(select(func.count(func.distinct(Link.author)))).one()
+            book_count = bulk_delete(session, Link, batch_size=batch_size)
         
         print(f"Deleted all {author_count} author(s) and {book_count} book(s)")
         return {
@@ -221,16 +339,10 @@ async def delete_all_authors():
 
 
 @app.delete("/authors/{author_slug}")
-async def delete_author(author_slug: str):
+async def delete_author(author_slug: str, batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")):
     try:
         with Session(engine) as session:
-            statement = select(Link).where(Link.author == author_slug)
-            links_to_delete = session.exec(statement).all()
-            deleted_count = len(links_to_delete)
-            
-            for link in links_to_delete:
-                session.delete(link)
-            session.commit()
+            deleted_count = bulk_delete(session, Link, Link.author == author_slug, batch_size=batch_size)
         
         print(f"Deleted author '{author_slug}' and {deleted_count} book(s)")
         return {"success": True, "deleted_count": deleted_count}
@@ -241,8 +353,43 @@ async def delete_author(author_slug: str):
         return {"error": str(e)}, 500
 
 
+@app.post("/authors/{author_slug}/enqueue")
+async def enqueue_author(author_slug: str, body: Optional[dict] = None):
+    """
+    Queue an author's books server-side. Optional body filters, with the same
+    meaning as on GET /links: downloaded (default false, i.e. only books not yet
+    downloaded; null for all), hasEpub, language and search.
+    """
+    body = body or {}
+    downloaded = body.get("downloaded", False)
+    
+    with Session(engine) as session:
+        if session.exec(select(Link.url).where(Link.author == author_slug).limit(1)).first() is None:
+            raise HTTPException(status_code=404, detail="Author not found")
+        
+        matched, added = enqueue_links(
+            session,
+            *link_filters(author_slug, downloaded, body.get("hasEpub"), body.get("language"), search=body.get("search"))
+        )
+        if added:
+            notify_workers(session)
+    
+    print(f"Queued {added} book(s) for author '{author_slug}' ({matched - added} already queued)")
+    return {
+        "success": True,
+        "author": author_slug,
+        "matched": matched,
+        "added": added,
+        "skipped": matched - added
+    }
+
+
 @app.post("/scrape-author")
 async def scrape_author_endpoint(body: dict):
+    """
+    Start a background scrape for one author. Poll /scrape-jobs/{job_id} for progress.
+    Scrapes are incremental; pass "full": true to re-walk every listing page.
+    """
     author_input = body.get("author")
     if not author_input:
         raise HTTPException(status_code=400, detail="author is required")
@@ -250,22 +397,14 @@ async def scrape_author_endpoint(body: dict):
     author = format_author_name(author_input)
     
     try:
-        with Session(engine) as session:
-            result = scrape_author(author, session)
-        
-        if result['success']:
-            return {
-                "success": True,
-                "books_added": result['books_added'],
-                "author": result['author']
-            }
-        else:
-            raise HTTPException(status_code=500, detail=result.get('error', 'Unknown error'))
-            
-    except HTTPException:
-        raise
+        job_id = submit_scrape_job([author], full=bool(body.get("full")))
+        return {
+            "success": True,
+            "job_id": job_id,
+            "author": author
+        }
     except Exception as e:
-        print(f"Error scraping author: {e}")
+        print(f"Error submitting scrape job: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -273,6 +412,7 @@ async def scrape_author_endpoint(body: dict):
 
 @app.post("/scrape-authors")
 async def scrape_authors_endpoint(body: dict):
+    """Start a background scrape for a comma-separated list of authors"""
     authors_input = body.get("authors")
     if not authors_input:
         raise HTTPException(status_code=400, detail="authors is required")
@@ -282,91 +422,118 @@ async def scrape_authors_endpoint(body: dict):
     if not author_names:
         raise HTTPException(status_code=400, detail="No valid author names provided")
     
-    results = []
-    total_books = 0
-    errors = []
+    authors = list(dict.fromkeys(format_author_name(name) for name in author_names))
     
     try:
-        with Session(engine) as session:
-            for author_input in author_names:
-                author = format_author_name(author_input)
-                print(f"Scraping author: {author}")
-                
-                try:
-                    result = scrape_author(author, session)
-                    
-                    if result['success']:
-                        total_books += result['books_added']
-                        results.append({
-                            "author": result['author'],
-                            "books_added": result['books_added'],
-                            "success": True
-                        })
-                    else:
-                        errors.append({
-                            "author": author,
-                            "error": result.get('error', 'Unknown error')
-                        })
-                        results.append({
-                            "author": author,
-                            "books_added": 0,
-                            "success": False,
-                            "error": result.get('error', 'Unknown error')
-                        })
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"Error scraping {author}: {error_msg}")
-                    errors.append({"author": author, "error": error_msg})
-                    results.append({
-                        "author": author,
-                        "books_added": 0,
-                        "success": False,
-                        "error": error_msg
-                    })
-        
+        job_id = submit_scrape_job(authors, full=bool(body.get("full")))
         return {
             "success": True,
-            "total_books_added": total_books,
-            "authors_processed": len(author_names),
-            "results": results,
-            "errors": errors if errors else None
+            "job_id": job_id,
+            "authors_processed": len(authors),
+            "authors": authors
         }
-            
     except Exception as e:
-        print(f"Error scraping authors: {e}")
+        print(f"Error submitting scrape job: {e}")
         import traceback
         traceback.print_exc()
-        return {"error": str(e)}, 500
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/authors/refresh")
+async def refresh_all_authors(body: Optional[dict] = None):
+    """Start a background scrape of every tracked author to pick up newly posted books"""
+    with Session(engine) as session:
+        authors = session.exec(
+            select(Link.author).where(
+                Link.author.is_not(None),
+                Link.author != ''
+            ).distinct().order_by(Link.author)
+        ).all()
+    
+    if not authors:
+        return {"success": True, "job_id": None, "authors_processed": 0}
+    
+    job_id = submit_scrape_job(list(authors), full=bool((body or {}).get("full")))
+    return {"success": True, "job_id": job_id, "authors_processed": len(authors)}
+
+
+@app.get("/scrape-jobs/{job_id}")
+async def get_scrape_job_status(job_id: int):
+    """Get a scrape job's status with per-author progress"""
+    job = get_scrape_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job
 
 
 @app.get("/queue")
-async def get_queue(status: Optional[str] = Query(default=None)):
-    """Get all queue items, optionally filtered by status"""
+async def get_queue(
+    response: Response,
+    status: Optional[str] = Query(default=None),
+    since: Optional[int] = Query(default=None, ge=0, description="X-Queue-Version or version from an earlier call")
+):
+    """
+    Get all queue items, optionally filtered by status. The X-Queue-Version header
+    holds the queue's change version. Pass it back as `since` to get only
+    {version, full, items, deleted}: the items changed and ids deleted after it.
+    `full` is true when the version is too old to diff and every item is returned.
+    """
+    if since is not None:
+        if status:
+            raise HTTPException(status_code=400, detail="since cannot be combined with status")
+        
+        with Session(engine) as session:
+            version, items, deleted = queue_changes_since(session, since)
+            full = items is None
+            if full:
+                items = session.exec(select(QueueItem).order_by(QueueItem.created_at.desc())).all()
+                deleted = []
+        
+        return {
+            "version": version,
+            "full": full,
+            "items": [queue_item_json(item) for item in items],
+            "deleted": deleted
+        }
+    
     with Session(engine) as session:
+        response.headers["X-Queue-Version"] = str(current_queue_version(session))
         statement = select(QueueItem)
         if status:
             statement = statement.where(QueueItem.status == status)
         statement = statement.order_by(QueueItem.created_at.desc())
         items = session.exec(statement).all()
     
-    return [
-        {
-            "id": item.id,
-            "bookTitle": item.book_title,
-            "bookUrl": item.book_url,
-            "bookAuthor": item.book_author,
-            "status": item.status,
-            "retryCount": item.retry_count,
-            "errorMessage": item.error_message,
-            "createdAt": item.created_at,
-            "startedAt": item.started_at,
-            "completedAt": item.completed_at,
-        }
-        for item in items
-    ]
+    return [queue_item_json(item) for item in items]
+
+
+@app.get("/queue/stream")
+async def stream_queue(request: Request):
+    """
+    Server-Sent Events stream of the queue: a `snapshot` event with every item,
+    then `changes` events ({items, deleted}) as the server or worker write.
+    """
+    subscription = queue_broadcaster.subscribe()
+    
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=queue_events.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ("keepalive", None)
+                
+                if message is None or await request.is_disconnected():
+                    break
+                event, data = message
+                yield ": keepalive\n\n" if event == "keepalive" else format_sse(event, data)
+        finally:
+            queue_broadcaster.unsubscribe(subscription)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
-@app.get("/queue/{queue_id}")
+@app.get("/queue/{queue_id:int}")
 async def get_queue_item(queue_id: int):
     """Get a specific queue item by ID"""
     with Session(engine) as session:
@@ -374,21 +541,10 @@ async def get_queue_item(queue_id: int):
         if not item:
             raise HTTPException(status_code=404, detail="Queue item not found")
         
-        return {
-            "id": item.id,
-            "bookTitle": item.book_title,
-            "bookUrl": item.book_url,
-            "bookAuthor": item.book_author,
-            "status": item.status,
-            "retryCount": item.retry_count,
-            "errorMessage": item.error_message,
-            "createdAt": item.created_at,
-            "startedAt": item.started_at,
-            "completedAt": item.completed_at,
-        }
+        return queue_item_json(item)
 
 
-@app.delete("/queue/{queue_id}")
+@app.delete("/queue/{queue_id:int}")
 async def cancel_queue_item(queue_id: int):
     """Cancel a queued download (only if still pending)"""
     with Session(engine) as session:
@@ -403,51 +559,36 @@ async def cancel_queue_item(queue_id: int):
             )
         
         session.delete(item)
+        session.flush()
+        prune_queue_tombstones(session)
         session.commit()
         
         return {"success": True, "message": "Queue item cancelled"}
 
 
 @app.delete("/queue/completed/all")
-async def delete_completed_queue():
+async def delete_completed_queue(batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")):
     """Delete all completed queue items"""
     with Session(engine) as session:
-        statement = select(QueueItem).where(QueueItem.status == QueueStatus.COMPLETED.value)
-        items = session.exec(statement).all()
-        count = len(items)
-        
-        for item in items:
-            session.delete(item)
-        session.commit()
+        count = bulk_delete(session, QueueItem, QueueItem.status == QueueStatus.COMPLETED.value, batch_size=batch_size)
         
         return {"success": True, "deleted_count": count, "message": f"Deleted {count} completed item(s)"}
 
 
 @app.delete("/queue/all")
-async def delete_all_queue():
+async def delete_all_queue(batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")):
     """Delete all queue items"""
     with Session(engine) as session:
-        items = session.exec(select(QueueItem)).all()
-        count = len(items)
-        
-        for item in items:
-            session.delete(item)
-        session.commit()
+        count = bulk_delete(session, QueueItem, batch_size=batch_size)
         
         return {"success": True, "deleted_count": count, "message": f"Deleted {count} queue item(s)"}
 
 
 @app.delete("/queue/pending/all")
-async def delete_pending_queue():
+async def delete_pending_queue(batch_size: Optional[int] = Query(default=None, ge=1, alias="batchSize")):
     """Delete all pending queue items"""
     with Session(engine) as session:
-        statement = select(QueueItem).where(QueueItem.status == QueueStatus.PENDING.value)
-        items = session.exec(statement).all()
-        count = len(items)
-        
-        for item in items:
-            session.delete(item)
-        session.commit()
+        count = bulk_delete(session, QueueItem, QueueItem.status == QueueStatus.PENDING.value, batch_size=batch_size)
         
         return {"success": True, "deleted_count": count, "message": f"Deleted {count} pending item(s)"}
-    
+
@@ -25,10 +25,30 @@ def session_fixture():
     
     with Session(test_engine) as session:
         yield session
-        
+    
     SQLModel.metadata.drop_all(test_engine)
 
 
+@pytest.fixture(autouse=True)
+def host_limiter_fixture(session: Session, monkeypatch):
+    """Keep the shared per-host rate limiter in the test database, unthrottled"""
+    from utils.rate_limiter import host_limiter
+    
+    monkeypatch.setattr(host_limiter, "engine", test_engine)
+    monkeypatch.setattr(host_limiter, "initial_rate", 1000.0)
+    monkeypatch.setattr(host_limiter, "max_rate", 1000.0)
+    return host_limiter
+
+
+@pytest.fixture(autouse=True)
+def cookie_store_fixture(session: Session, monkeypatch):
+    """Keep cookies saved by the shared HTTP client in the test database"""
+    from utils.http_client import http_client
+    
+    monkeypatch.setattr(http_client.cookie_store, "engine", test_engine)
+    return http_client.cookie_store
+
+
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
     """Create a test client with test database"""
@@ -38,7 +58,10 @@ def client_fixture(session: Session):
     models.engine = test_engine
     
     from server import app
+    from utils.result_cache import result_cache
     
+    # Each test starts a fresh database whose change versions restart at zero
+    result_cache.clear()
     client = TestClient(app)
     yield client
     
@@ -1,5 +1,7 @@
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
+from sqlalchemy import event
 
 from models import Link, QueueItem
 from constants import QueueStatus
@@ -46,6 +48,70 @@ def test_get_links_with_data(client: TestClient, session: Session, sample_link:
     assert data[0]["hasPdf"] is False
 
 
+def test_authors_and_links_answer_matching_etag_with_304(client: TestClient, session: Session, sample_link: Link):
+    """Test that /authors and /links send an ETag, honour If-None-Match and change ETag on writes"""
+    session.add(sample_link)
+    session.commit()
+    
+    for path in ("/authors", "/links?author=test-author"):
+        response = client.get(path)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "no-cache"
+        
+        not_modified = client.get(path, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+        assert not_modified.content == b""
+    
+    from worker import process_queue_item
+    
+    queue_item = QueueItem(book_title="Test Book", book_url=sample_link.book_url)
+    session.add(queue_item)
+    session.commit()
+    with patch('worker.download_book', return_value={'filename': 'book.epub', 'destination': '/tmp'}):
+        assert process_queue_item(queue_item, session)
+    
+    response = client.get("/links?author=test-author", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["downloaded"] is True
+
+
+def test_links_cache_is_invalidated_by_writes(client: TestClient, session: Session, sample_link: Link):
+    """Test that cached /links and /authors bodies are rebuilt after a scrape insert or delete"""
+    session.add(sample_link)
+    session.commit()
+    
+    first = client.get("/links?author=test-author&limit=1")
+    assert [link["url"] for link in first.json()] == [sample_link.url]
+    assert "X-Next-Cursor" not in first.headers
+    
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        cached = client.get("/links?author=test-author&limit=1")
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+    assert cached.content == first.content
+    # Only the change version was read
+    assert len(statements) == 1 and "change_counters" in statements[0]
+    
+    from utils.scraper_utils import store_links
+    from utils.bulk_ops import bulk_delete
+    
+    store_links(session, [{'url': "https://example.com/book-2", 'author': "test-author", 'title': "Second"}])
+    
+    second = client.get("/links?author=test-author&limit=1")
+    assert [link["url"] for link in second.json()] == [sample_link.url]
+    assert second.headers["X-Next-Cursor"]
+    assert client.get("/authors").json() == {"test-author": "Test Author"}
+    
+    bulk_delete(session, Link, Link.url == sample_link.url)
+    assert [link["url"] for link in client.get("/links?author=test-author").json()] == ["https://example.com/book-2"]
+
+
 def test_get_links_filter_by_author(client: TestClient, session: Session):
     """Test filtering links by author"""
     link1 = Link(
@@ -73,6 +139,84 @@ def test_get_links_filter_by_author(client: TestClient, session: Session):
     assert data[0]["title"] == "Book 1"
 
 
+def test_get_links_omits_article_by_default(client: TestClient, session: Session, sample_link: Link):
+    """Test that the raw article HTML is only returned when requested"""
+    sample_link.article = "<article>raw</article>"
+    session.add(sample_link)
+    session.commit()
+    
+    default = client.get("/links").json()[0]
+    assert "article" not in default
+    assert default["title"] == "Test Book"
+    
+    projected = client.get("/links?fields=title,article").json()[0]
+    assert projected == {"url": sample_link.url, "title": "Test Book", "article": "<article>raw</article>"}
+
+
+def test_get_links_unknown_field(client: TestClient):
+    """Test that an unknown projection field is rejected"""
+    response = client.get("/links?fields=title,nope")
+    assert response.status_code == 400
+
+
+def test_get_links_keyset_pagination(client: TestClient, session: Session):
+    """Test paging through links with limit and the X-Next-Cursor header"""
+    for n in range(5):
+        session.add(Link(url=f"https://example.com/book-{n}", author="author-1", title=f"Book {n}"))
+    session.commit()
+    
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        url = "/links?limit=2" + (f"&after={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        titles += [link["title"] for link in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    
+    assert titles == [f"Book {n}" for n in range(5)]
+    assert pages == 3
+
+
+def test_get_links_filters(client: TestClient, session: Session):
+    """Test server-side filters for downloaded, hasEpub, language and genre"""
+    session.add(Link(url="https://example.com/1", title="A", downloaded=1, has_epub=1, language="English", genre="Fiction, Fantasy"))
+    session.add(Link(url="https://example.com/2", title="B", downloaded=0, has_epub=1, language="French", genre="Fiction"))
+    session.add(Link(url="https://example.com/3", title="C", downloaded=0, has_epub=0, language="english", genre="History"))
+    session.commit()
+    
+    def titles(query):
+        return [link["title"] for link in client.get(f"/links?{query}").json()]
+    
+    assert titles("downloaded=false") == ["B", "C"]
+    assert titles("hasEpub=true") == ["A", "B"]
+    assert titles("language=English") == ["A", "C"]
+    assert titles("genre=Fantasy") == ["A"]
+    assert titles("downloaded=false&hasEpub=true&language=french") == ["B"]
+    assert titles("search=fantasy") == ["A"]
+    assert titles("search=%25") == []
+    
+    first_page = client.get("/links?limit=1&downloaded=false")
+    assert first_page.headers["X-Total-Count"] == "2"
+    assert "X-Total-Count" not in client.get(f"/links?limit=1&after={first_page.headers['X-Next-Cursor']}").headers
+
+
+def test_get_link_languages(client: TestClient, session: Session):
+    """Test that the language list covers every stored book, not just one page"""
+    session.add(Link(url="https://example.com/1", author="a", language="French"))
+    session.add(Link(url="https://example.com/2", author="a", language="English"))
+    session.add(Link(url="https://example.com/3", author="b", language="German"))
+    session.add(Link(url="https://example.com/4", author="a", language=""))
+    session.commit()
+    
+    assert client.get("/links/languages").json() == ["English", "French", "German"]
+    assert client.get("/links/languages?author=a").json() == ["English", "French"]
+
+
 def test_delete_author(client: TestClient, session: Session, sample_link: Link):
     """Test deleting an author"""
     session.add(sample_link)
@@ -99,6 +243,7 @@ def test_delete_all_authors(client: TestClient, session: Session):
     assert response.status_code == 200
     data = response.json()
     assert data["success"] is True
+    assert data["authors_deleted"] == 2
     assert data["books_deleted"] == 2
     
     links = session.exec(select(Link)).all()
@@ -149,6 +294,36 @@ def test_cleanup_downloaded_authors(client: TestClient, session: Session):
     assert links[0].author == "author-2"
 
 
+def test_cleanup_downloaded_authors_dry_run(client: TestClient, session: Session):
+    """Test that a cleanup dry run reports candidates without deleting them"""
+    session.add_all([
+        Link(url="https://example.com/1", author="author-1", book_author="Author One", downloaded=1),
+        Link(url="https://example.com/2", author="author-1", book_author="Author One", downloaded=1),
+        Link(url="https://example.com/3", author="author-2", downloaded=1),
+        Link(url="https://example.com/4", author="author-3", downloaded=0),
+    ])
+    session.commit()
+    
+    response = client.delete("/authors/cleanup?dryRun=true")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dry_run"] is True
+    assert data["authors_to_delete"] == 2
+    assert data["books_to_delete"] == 3
+    assert data["authors"] == [
+        {"author": "author-1", "name": "Author One", "books": 2},
+        {"author": "author-2", "name": "author-2", "books": 1},
+    ]
+    assert len(session.exec(select(Link)).all()) == 4
+    
+    response = client.delete("/authors/cleanup?batchSize=1")
+    data = response.json()
+    assert data["dry_run"] is False
+    assert data["books_deleted"] == 3
+    assert data["deleted_author_names"] == ["Author One", "author-2"]
+    assert session.exec(select(Link.author)).all() == ["author-3"]
+
+
 def test_scrape_author_missing_param(client: TestClient):
     """Test scraping author without required parameter"""
     response = client.post("/scrape-author", json={})
@@ -166,22 +341,28 @@ def test_download_adds_to_queue(client: TestClient, session: Session, sample_lin
     session.add(sample_link)
     session.commit()
     
-    response = client.post("/download", json={
+    response = client.post("/download", json={"books": [{
         "bookUrl": sample_link.book_url,
         "bookTitle": sample_link.title,
         "bookAuthor": sample_link.book_author
-    })
+    }]})
     
     assert response.status_code == 200
     data = response.json()
     assert data["success"] is True
-    assert data["queued"] is True
-    assert "queue_id" in data
+    assert data["added"] == 1
+    result = data["results"][0]
+    assert result["success"] is True
+    assert result["message"] == "Book added to download queue"
+    assert "queue_id" in result
     
     # Verify queue item was created
     queue_items = session.exec(select(QueueItem)).all()
     assert len(queue_items) == 1
+    assert queue_items[0].id == result["queue_id"]
     assert queue_items[0].book_url == sample_link.book_url
+    assert queue_items[0].book_author == sample_link.book_author
+    assert queue_items[0].created_at is not None
     assert queue_items[0].status == QueueStatus.PENDING.value
 
 
@@ -190,23 +371,92 @@ def test_download_duplicate_in_queue(client: TestClient, session: Session, sampl
     session.add(sample_queue_item)
     session.commit()
     
-    response = client.post("/download", json={
+    response = client.post("/download", json={"books": [{
         "bookUrl": sample_queue_item.book_url,
         "bookTitle": sample_queue_item.book_title,
         "bookAuthor": sample_queue_item.book_author
-    })
+    }]})
     
     assert response.status_code == 200
     data = response.json()
     assert data["success"] is True
-    assert data["queued"] is True
-    assert data["message"] == "Book already in queue"
+    assert data["skipped"] == 1
+    result = data["results"][0]
+    assert result["skipped"] is True
+    assert result["queue_id"] == sample_queue_item.id
+    assert result["message"] == "Book already in queue"
     
     # Verify only one queue item exists
     queue_items = session.exec(select(QueueItem)).all()
     assert len(queue_items) == 1
 
 
+def test_download_bulk_results_in_request_order(client: TestClient, session: Session):
+    """Test a mixed batch: new, already queued, repeated and invalid books keep request order"""
+    queued = QueueItem(book_title="Queued", book_url="url-queued", status=QueueStatus.IN_PROGRESS.value)
+    finished = QueueItem(book_title="Done", book_url="url-done", status=QueueStatus.COMPLETED.value)
+    session.add_all([queued, finished])
+    session.commit()
+    
+    response = client.post("/download", json={"books": [
+        {"bookUrl": "url-new-1", "bookTitle": "New 1"},
+        {"bookUrl": "url-queued", "bookTitle": "Queued"},
+        {"bookTitle": "No URL"},
+        {"bookUrl": "url-new-2", "bookTitle": "New 2"},
+        {"bookUrl": "url-new-1", "bookTitle": "New 1 again"},
+        {"bookUrl": "url-done", "bookTitle": "Done"},
+    ]})
+    
+    data = response.json()
+    assert (data["total"], data["added"], data["skipped"]) == (6, 3, 2)
+    results = data["results"]
+    assert [result["bookUrl"] for result in results] == [
+        "url-new-1", "url-queued", None, "url-new-2", "url-new-1", "url-done"
+    ]
+    assert [result.get("skipped", False) for result in results] == [False, True, False, False, True, False]
+    assert results[2] == {"bookUrl": None, "bookTitle": "No URL", "success": False, "error": "bookUrl is required"}
+    assert results[1]["queue_id"] == queued.id
+    assert results[4]["queue_id"] == results[0]["queue_id"]
+    
+    ids = {item.book_url: item.id for item in session.exec(
+        select(QueueItem).where(QueueItem.status == QueueStatus.PENDING.value)
+    ).all()}
+    assert ids == {
+        "url-new-1": results[0]["queue_id"],
+        "url-new-2": results[3]["queue_id"],
+        "url-done": results[5]["queue_id"],
+    }
+
+
+def test_enqueue_author(client: TestClient, session: Session):
+    """Test queueing an author's books server-side with filters"""
+    session.add_all([
+        Link(url="https://example.com/1", author="author-1", title="A", book_url="url1", has_epub=1, language="English"),
+        Link(url="https://example.com/2", author="author-1", title="B", book_url="url2", has_epub=0, language="English"),
+        Link(url="https://example.com/3", author="author-1", title="C", book_url="url3", has_epub=1, language="French"),
+        Link(url="https://example.com/4", author="author-1", title="D", book_url="url4", has_epub=1, downloaded=1),
+        Link(url="https://example.com/5", author="author-2", title="E", book_url="url5", has_epub=1),
+        QueueItem(book_title="C", book_url="url3", status=QueueStatus.PENDING.value),
+    ])
+    session.commit()
+    
+    response = client.post("/authors/author-1/enqueue", json={"hasEpub": True})
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "author": "author-1", "matched": 2, "added": 1, "skipped": 1}
+    
+    response = client.post("/authors/author-1/enqueue", json={"language": "english"})
+    assert response.json()["added"] == 1
+    
+    pending = session.exec(
+        select(QueueItem.book_url, QueueItem.book_title).where(QueueItem.status == QueueStatus.PENDING.value)
+    ).all()
+    assert sorted(pending) == [("url1", "A"), ("url2", "B"), ("url3", "C")]
+    
+    response = client.post("/authors/author-1/enqueue", json={"downloaded": None})
+    assert response.json()["added"] == 1
+    assert client.post("/authors/missing-author/enqueue").status_code == 404
+
+
 def test_download_missing_book_url(client: TestClient):
     """Test download endpoint without bookUrl"""
     response = client.post("/download", json={
@@ -258,6 +508,42 @@ def test_get_queue_filter_by_status(client: TestClient, session: Session):
     assert data[0]["bookTitle"] == "Book 1"
 
 
+def test_get_queue_since_returns_only_changes(client: TestClient, session: Session):
+    """Test delta sync: X-Queue-Version, then only changed items and deleted ids"""
+    session.add_all([
+        QueueItem(book_title="Keep", book_url="url1"),
+        QueueItem(book_title="Start", book_url="url2"),
+        QueueItem(book_title="Delete", book_url="url3"),
+    ])
+    session.commit()
+    
+    response = client.get("/queue")
+    version = int(response.headers["X-Queue-Version"])
+    ids = {item["bookTitle"]: item["id"] for item in response.json()}
+    
+    response = client.get(f"/queue?since={version}")
+    assert response.json() == {"version": version, "full": False, "items": [], "deleted": []}
+    
+    started = session.get(QueueItem, ids["Start"])
+    started.status = QueueStatus.IN_PROGRESS.value
+    session.add(started)
+    session.delete(session.get(QueueItem, ids["Delete"]))
+    session.commit()
+    
+    data = client.get(f"/queue?since={version}").json()
+    assert data["version"] == version + 2
+    assert data["full"] is False
+    assert [(item["id"], item["status"]) for item in data["items"]] == [(ids["Start"], "in_progress")]
+    assert data["deleted"] == [ids["Delete"]]
+    
+    # A version the server has never handed out forces a full reload
+    data = client.get(f"/queue?since={version + 100}").json()
+    assert data["full"] is True
+    assert {item["bookTitle"] for item in data["items"]} == {"Keep", "Start"}
+    
+    assert client.get("/queue?since=0&status=pending").status_code == 400
+
+
 def test_get_queue_item(client: TestClient, session: Session, sample_queue_item: QueueItem):
     """Test getting a specific queue item"""
     session.add(sample_queue_item)
@@ -314,3 +600,133 @@ def test_cancel_in_progress_item(client: TestClient, session: Session):
     response = client.delete(f"/queue/{item.id}")
     assert response.status_code == 400
     assert "Cannot cancel" in response.json()["detail"]
+
+
+def test_delete_queue_by_status(client: TestClient, session: Session):
+    """Test bulk deleting completed and pending queue items, in one statement and in batches"""
+    statuses = [QueueStatus.COMPLETED.value] * 5 + [QueueStatus.PENDING.value] * 3 + [QueueStatus.FAILED.value]
+    session.add_all([
+        QueueItem(book_title=f"Book {n}", book_url=f"url{n}", status=status)
+        for n, status in enumerate(statuses)
+    ])
+    session.commit()
+    
+    response = client.delete("/queue/completed/all?batchSize=2")
+    assert response.status_code == 200
+    assert response.json()["deleted_count"] == 5
+    
+    response = client.delete("/queue/pending/all")
+    assert response.json()["deleted_count"] == 3
+    
+    remaining = session.exec(select(QueueItem.status)).all()
+    assert remaining == [QueueStatus.FAILED.value]
+    
+    response = client.delete("/queue/all?batchSize=10")
+    assert response.json()["deleted_count"] == 1
+    assert client.delete("/queue/all?batchSize=0").status_code == 422
+
+
+class InlineExecutor:
+    """Runs submitted scrape tasks immediately so job results can be asserted"""
+    
+    def __init__(self, run=True):
+        self.run = run
+        self.submitted = []
+    
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        if self.run:
+            fn(*args)
+
+
+def fake_scrape_author(author, session, on_progress=None, full=False, deadline=None):
+    if author == "missing-author":
+        return {'success': False, 'error': 'Not found', 'books_added': 0, 'author': author}
+    if on_progress:
+        on_progress(1, 2)
+        on_progress(2, 3)
+    return {'success': True, 'books_added': 3, 'author': author}
+
+
+def test_scrape_authors_returns_job(client: TestClient):
+    """Test that scraping is submitted as a background job without running it inline"""
+    executor = InlineExecutor(run=False)
+    
+    with patch('utils.scrape_jobs.executor', executor):
+        response = client.post("/scrape-authors", json={"authors": "Author One, Author Two"})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is True
+    assert data["authors"] == ["author-one", "author-two"]
+    assert len(executor.submitted) == 2
+    
+    job = client.get(f"/scrape-jobs/{data['job_id']}").json()
+    assert job["status"] == "pending"
+    assert [author["author"] for author in job["authors"]] == ["author-one", "author-two"]
+
+
+def test_scrape_job_reports_per_author_progress(client: TestClient):
+    """Test that the job status endpoint reports pages, books added and errors per author"""
+    with patch('utils.scrape_jobs.executor', InlineExecutor()), \
+         patch('utils.scrape_jobs.scrape_author', side_effect=fake_scrape_author):
+        response = client.post("/scrape-authors", json={"authors": "Author One, Missing Author"})
+    
+    job = client.get(f"/scrape-jobs/{response.json()['job_id']}").json()
+    
+    assert job["status"] == "completed"
+    assert job["completedAt"] is not None
+    assert job["totalBooksAdded"] == 3
+    first, second = job["authors"]
+    assert first["status"] == "completed"
+    assert first["currentPage"] == 2
+    assert first["booksAdded"] == 3
+    assert second["status"] == "failed"
+    assert second["error"] == "Not found"
+
+
+def test_scrape_author_returns_job(client: TestClient):
+    """Test that the single author endpoint also returns a job id"""
+    with patch('utils.scrape_jobs.executor', InlineExecutor()), \
+         patch('utils.scrape_jobs.scrape_author', side_effect=fake_scrape_author):
+        response = client.post("/scrape-author", json={"author": "Author One"})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["author"] == "author-one"
+    assert client.get(f"/scrape-jobs/{data['job_id']}").json()["status"] == "completed"
+
+
+def test_get_scrape_job_not_found(client: TestClient):
+    """Test getting a non-existent scrape job"""
+    response = client.get("/scrape-jobs/999")
+    assert response.status_code == 404
+
+
+def test_refresh_all_authors_submits_incremental_job(client: TestClient, session: Session):
+    """Test that refreshing submits one job covering every tracked author"""
+    session.add(Link(url="https://example.com/1", author="author-1"))
+    session.add(Link(url="https://example.com/2", author="author-1"))
+    session.add(Link(url="https://example.com/3", author="author-2"))
+    session.commit()
+    
+    with patch('utils.scrape_jobs.executor', InlineExecutor(run=False)):
+        response = client.post("/authors/refresh")
+    
+    data = response.json()
+    assert data["authors_processed"] == 2
+    job = client.get(f"/scrape-jobs/{data['job_id']}").json()
+    assert [author["author"] for author in job["authors"]] == ["author-1", "author-2"]
+    assert all(author["full"] is False for author in job["authors"])
+
+
+def test_enqueue_wakes_workers_only_when_books_are_added(client: TestClient):
+    """Test that /download nudges idle workers after queueing, but not for pure duplicates"""
+    books = {"books": [{"bookUrl": "https://example.com/download-1", "bookTitle": "Test Book"}]}
+    
+    with patch("server.notify_workers") as notify:
+        assert client.post("/download", json=books).json()["added"] == 1
+        assert notify.call_count == 1
+        
+        assert client.post("/download", json=books).json()["skipped"] == 1
+        assert notify.call_count == 1
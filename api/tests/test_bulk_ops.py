@@ -0,0 +1,92 @@
+from sqlmodel import Session, select
+
+from models import Link, QueueItem
+from constants import QueueStatus
+from utils.bulk_ops import bulk_delete, fully_downloaded_authors, enqueue_books, enqueue_links
+
+
+def add_queue_items(session: Session, statuses):
+    session.add_all([
+        QueueItem(book_title=f"Book {n}", book_url=f"url{n}", status=status)
+        for n, status in enumerate(statuses)
+    ])
+    session.commit()
+
+
+def test_bulk_delete_matching_rows(session: Session):
+    """Test a single DELETE removes only matching rows and returns the count"""
+    add_queue_items(session, [QueueStatus.COMPLETED.value] * 4 + [QueueStatus.PENDING.value] * 2)
+    
+    deleted = bulk_delete(session, QueueItem, QueueItem.status == QueueStatus.COMPLETED.value)
+    
+    assert deleted == 4
+    assert session.exec(select(QueueItem.status)).all() == [QueueStatus.PENDING.value] * 2
+
+
+def test_bulk_delete_in_batches(session: Session):
+    """Test batched deletes remove everything, including a final partial batch"""
+    add_queue_items(session, [QueueStatus.COMPLETED.value] * 7 + [QueueStatus.FAILED.value])
+    
+    deleted = bulk_delete(session, QueueItem, QueueItem.status == QueueStatus.COMPLETED.value, batch_size=3)
+    
+    assert deleted == 7
+    assert session.exec(select(QueueItem.status)).all() == [QueueStatus.FAILED.value]
+
+
+def test_bulk_delete_batches_on_table_without_integer_key(session: Session):
+    """Test batching on links, whose primary key is the url"""
+    session.add_all([Link(url=f"https://example.com/{n}", author="a" if n < 5 else "b") for n in range(8)])
+    session.commit()
+    
+    assert bulk_delete(session, Link, Link.author == "a", batch_size=5) == 5
+    assert bulk_delete(session, Link, Link.author == "a", batch_size=5) == 0
+    assert bulk_delete(session, Link, batch_size=2) == 3
+
+
+def test_fully_downloaded_authors(session: Session):
+    """Test only authors with every book downloaded are grouped, with their book counts"""
+    session.add_all([
+        Link(url="https://example.com/1", author="done", book_author="Done Author", downloaded=1),
+        Link(url="https://example.com/2", author="done", downloaded=1),
+        Link(url="https://example.com/3", author="partial", downloaded=1),
+        Link(url="https://example.com/4", author="partial", downloaded=0),
+        Link(url="https://example.com/5", author=None, downloaded=1),
+    ])
+    session.commit()
+    
+    assert session.exec(fully_downloaded_authors()).all() == [("done", "Done Author", 2)]
+
+
+def test_enqueue_books_across_batches(session: Session, monkeypatch):
+    """Test lookups and inserts split into batches still return every id in request order"""
+    monkeypatch.setattr("utils.bulk_ops.ENQUEUE_BATCH_SIZE", 2)
+    add_queue_items(session, [QueueStatus.PENDING.value] * 3)
+    books = [{"bookUrl": f"url{n}", "bookTitle": f"Book {n}"} for n in range(7)]
+    
+    results = enqueue_books(session, books)
+    
+    assert [result["bookUrl"] for result in results] == [f"url{n}" for n in range(7)]
+    assert [result.get("skipped", False) for result in results] == [True] * 3 + [False] * 4
+    ids = {item.book_url: item.id for item in session.exec(select(QueueItem)).all()}
+    assert len(ids) == 7
+    assert [result["queue_id"] for result in results] == [ids[f"url{n}"] for n in range(7)]
+
+
+def test_enqueue_links_in_scrape_order_once_per_book(session: Session):
+    """Test INSERT ... SELECT keeps scrape order and queues books shared by several links once"""
+    session.add_all([
+        Link(url="https://example.com/c", author="a", title="Third", book_url="url-c"),
+        Link(url="https://example.com/a", author="a", title="First", book_url="url-a"),
+        Link(url="https://example.com/a2", author="a", title="First again", book_url="url-a"),
+        Link(url="https://example.com/none", author="a", title="No download"),
+        Link(url="https://example.com/b", author="a", book_url="url-b"),
+    ])
+    session.commit()
+    
+    assert enqueue_links(session, Link.author == "a") == (3, 3)
+    assert enqueue_links(session, Link.author == "a") == (3, 0)
+    
+    items = session.exec(select(QueueItem).order_by(QueueItem.id)).all()
+    assert [item.book_url for item in items] == ["url-c", "url-a", "url-b"]
+    assert items[2].book_title == "Unknown Book"
+    assert all(item.status == QueueStatus.PENDING.value and item.created_at for item in items)
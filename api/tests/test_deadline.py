@@ -0,0 +1,38 @@
+import time
+import pytest
+
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+def test_unlimited_deadline_never_expires():
+    """Test that Deadline(None) leaves timeouts alone and never raises"""
+    deadline = Deadline()
+    
+    assert deadline.remaining() is None
+    assert deadline.timeout((10, 60)) == (10, 60)
+    deadline.check("anything")
+
+
+def test_deadline_caps_timeouts_and_expires():
+    """Test that request timeouts shrink to the time left and check() raises once it is gone"""
+    deadline = Deadline(0.2, "Download")
+    
+    connect, read = deadline.timeout((10, 60))
+    assert 0 < connect <= 0.2 and 0 < read <= 0.2
+    assert deadline.timeout(0.05) == 0.05
+    deadline.check("book page")
+    
+    time.sleep(0.25)
+    with pytest.raises(DeadlineExceeded, match="during form submit"):
+        deadline.check("form submit")
+    assert deadline.timeout((10, 60)) == (0.001, 0.001)
+
+
+def test_deadline_refuses_retry_waits_past_the_budget():
+    """Test that a retry wait longer than the time left fails immediately instead of sleeping"""
+    deadline = Deadline(1, "Scrape")
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="waiting to retry"):
+        deadline.sleep(5, "listing page fetch")
+    assert time.monotonic() - started < 0.1
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch, ANY
+
+from utils import download_utils
+from utils.download_utils import _stream_to_file, CHUNK_SIZE
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+BOOK_BYTES = bytes(range(256)) * 2048  # 512 KiB
+
+
+class FlakyFileHandler(BaseHTTPRequestHandler):
+    """
+    Serves BOOK_BYTES with Range support, dropping the connection mid-body while
+    `drops` > 0, or stalling mid-body for `stall` seconds. A non-zero `status`
+    is returned instead of the book.
+    """
+    
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('Range'))
+        
+        if server.status:
+            self.send_response(server.status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and server.honour_range:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(BOOK_BYTES) - 1}/{len(BOOK_BYTES)}")
+        else:
+            self.send_response(200)
+        
+        body = BOOK_BYTES[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"book-v1"')
+        self.end_headers()
+        
+        if server.drops > 0:
+            server.drops -= 1
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            self.close_connection = True
+            return
+        
+        if server.stall:
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            time.sleep(server.stall)
+            return
+        
+        server.bytes_served += len(body)
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server(monkeypatch):
+    """Local HTTP stand-in for the file host"""
+    monkeypatch.setattr(download_utils, 'RETRY_DELAY', 0)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyFileHandler)
+    server.requests = []
+    server.drops = 0
+    server.bytes_served = 0
+    server.honour_range = True
+    server.stall = 0
+    server.status = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    yield server
+    
+    server.shutdown()
+    server.server_close()
+
+
+def file_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/book.epub"
+
+
+def make_streaming_response(chunks):
+    """Create a fake streaming response that yields the given chunks"""
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    response.raise_for_status = Mock()
+    response.iter_content = Mock(return_value=iter(chunks))
+    return response
+
+
+def test_stream_to_file_writes_all_chunks(tmp_path):
+    """Test that streamed chunks are written to the destination file"""
+    chunks = [b"a" * CHUNK_SIZE, b"b" * CHUNK_SIZE, b"c" * 10]
+    filepath = str(tmp_path / "book.epub")
+    
+    with patch('utils.download_utils._fetch_with_retry') as mock_fetch:
+        mock_fetch.return_value = make_streaming_response(chunks)
+        
+        bytes_written, elapsed = _stream_to_file("https://example.com/book.epub", filepath)
+        
+        mock_fetch.assert_called_once_with(
+            "https://example.com/book.epub", "file", stream=True, extra_headers={}, deadline=ANY, attempts=1
+        )
+    
+    assert bytes_written == 2 * CHUNK_SIZE + 10
+    assert elapsed >= 0
+    with open(filepath, 'rb') as file:
+        assert file.read() == b"".join(chunks)
+    assert os.listdir(tmp_path) == ["book.epub"]
+
+
+def test_stream_to_file_failure_keeps_only_part_file(tmp_path, monkeypatch):
+    """Test that an interrupted transfer leaves a resumable .part file, not a truncated book"""
+    monkeypatch.setattr(download_utils, 'RETRY_DELAY', 0)
+    
+    def broken_stream():
+        yield b"a" * CHUNK_SIZE
+        raise ConnectionError("connection dropped")
+    
+    filepath = str(tmp_path / "book.epub")
+    
+    with patch('utils.download_utils._fetch_with_retry') as mock_fetch:
+        response = make_streaming_response([])
+        response.iter_content = Mock(side_effect=lambda **kwargs: broken_stream())
+        mock_fetch.side_effect = lambda *args, **kwargs: response
+        
+        with pytest.raises(ConnectionError):
+            _stream_to_file("https://example.com/book.epub", filepath)
+        
+        response.close.assert_called()
+    
+    assert sorted(os.listdir(tmp_path)) == ["book.epub.part", "book.epub.part.json"]
+
+
+def test_download_book_reports_transfer_stats(tmp_path):
+    """Test that download_book returns bytes transferred and throughput"""
+    with patch.object(download_utils, '_fetch_with_retry') as mock_fetch, \
+         patch.object(download_utils, '_submit_form_with_retry') as mock_submit:
+        book_page = Mock(text="""
+            <form action="https://example.com/Fetching_Resource.php">
+                <input name="id" value="42" />
+                <input name="filename" value="book.epub" />
+            </form>
+        """)
+        mock_submit.return_value = Mock(
+            text='<meta http-equiv="Refresh" content="0; url=https://example.com/file.epub">'
+        )
+        mock_fetch.side_effect = [book_page, make_streaming_response([b"x" * 100])]
+        
+        result = download_utils.download_book("https://example.com/book", "Book", str(tmp_path))
+    
+    assert result["filename"] == "book.epub"
+    assert result["bytes"] == 100
+    assert result["throughput_bps"] >= 0
+    assert os.path.exists(result["filepath"])
+
+
+def test_stream_to_file_resumes_after_dropped_connection(tmp_path, flaky_server):
+    """Test that a retry after a mid-body drop resumes with a Range request"""
+    flaky_server.drops = 1
+    filepath = str(tmp_path / "book.epub")
+    
+    bytes_transferred, _ = _stream_to_file(file_url(flaky_server), filepath)
+    
+    with open(filepath, 'rb') as file:
+        assert file.read() == BOOK_BYTES
+    assert flaky_server.requests[0] is None
+    assert flaky_server.requests[1].startswith("bytes=")
+    assert flaky_server.requests[1] != "bytes=0-"
+    # Only the missing tail was sent again
+    assert flaky_server.bytes_served < len(BOOK_BYTES)
+    # Nothing was transferred twice
+    assert bytes_transferred == len(BOOK_BYTES)
+    assert os.listdir(tmp_path) == ["book.epub"]
+
+
+def test_stream_to_file_reports_progress_across_resume(tmp_path, flaky_server):
+    """Test that progress counts bytes on disk, so it keeps climbing after a resume"""
+    flaky_server.drops = 1
+    progress = []
+    
+    def on_progress(done, total):
+        progress.append((done, total))
+    
+    _stream_to_file(file_url(flaky_server), str(tmp_path / "book.epub"), on_progress)
+    
+    assert progress[-1] == (len(BOOK_BYTES), len(BOOK_BYTES))
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+
+def test_stream_to_file_resumes_requeued_download(tmp_path, flaky_server):
+    """Test that a later attempt (e.g. a requeued item) resumes from the persisted .part file"""
+    flaky_server.drops = download_utils.MAX_RETRIES
+    filepath = str(tmp_path / "book.epub")
+    
+    with pytest.raises(OSError):
+        _stream_to_file(file_url(flaky_server), filepath)
+    
+    with open(filepath + ".part.json") as file:
+        state = json.load(file)
+    assert state['url'] == file_url(flaky_server)
+    assert state['expected_length'] == len(BOOK_BYTES)
+    assert state['validator'] == '"book-v1"'
+    partial_size = os.path.getsize(filepath + ".part")
+    assert partial_size > 0
+    
+    flaky_server.requests.clear()
+    _stream_to_file(file_url(flaky_server), filepath)
+    
+    with open(filepath, 'rb') as file:
+        assert file.read() == BOOK_BYTES
+    assert flaky_server.requests == [f"bytes={partial_size}-"]
+    assert not os.path.exists(filepath + ".part.json")
+
+
+def test_stream_to_file_falls_back_when_range_ignored(tmp_path, flaky_server):
+    """Test that a server ignoring Range gets a full refetch instead of a corrupt file"""
+    flaky_server.drops = 1
+    flaky_server.honour_range = False
+    filepath = str(tmp_path / "book.epub")
+    
+    _stream_to_file(file_url(flaky_server), filepath)
+    
+    with open(filepath, 'rb') as file:
+        assert file.read() == BOOK_BYTES
+    assert flaky_server.bytes_served == len(BOOK_BYTES)
+
+
+def test_stream_to_file_stops_at_deadline_and_keeps_part_file(tmp_path, flaky_server):
+    """Test that a stalled transfer fails once the item's deadline passes, keeping the part for resume"""
+    flaky_server.stall = 3
+    filepath = str(tmp_path / "book.epub")
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        _stream_to_file(file_url(flaky_server), filepath, deadline=Deadline(0.5, "Download"))
+    
+    assert time.monotonic() - started < 2
+    assert os.path.getsize(filepath + ".part") > 0
+    assert not os.path.exists(filepath)
+
+
+def test_fetch_with_retry_does_not_wait_past_deadline_for_throttled_host(host_limiter_fixture):
+    """Test that a paused host fails the fetch at once when its pause outlasts the deadline"""
+    host_limiter_fixture.acquire("https://example.com/")
+    host_limiter_fixture.record_throttled("https://example.com/", 60)
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        download_utils._fetch_with_retry("https://example.com/book", "book page", deadline=Deadline(0.5, "Download"))
+    
+    assert time.monotonic() - started < 0.2
+
+
+def test_stream_to_file_does_not_retry_missing_file(tmp_path, flaky_server):
+    """Test that a 404 for the file fails on the first request"""
+    import requests
+    
+    flaky_server.status = 404
+    
+    with pytest.raises(requests.HTTPError):
+        _stream_to_file(file_url(flaky_server), str(tmp_path / "book.epub"))
+    
+    assert len(flaky_server.requests) == 1
+
+
+def test_stream_to_file_client_error_discards_part_file(tmp_path, flaky_server):
+    """Test that a 4xx while resuming deletes the .part file and sidecar, since no retry can use them"""
+    import requests
+    
+    flaky_server.drops = download_utils.MAX_RETRIES
+    filepath = str(tmp_path / "book.epub")
+    with pytest.raises(OSError):
+        _stream_to_file(file_url(flaky_server), filepath)
+    assert sorted(os.listdir(tmp_path)) == ["book.epub.part", "book.epub.part.json"]
+    
+    flaky_server.status = 403
+    with pytest.raises(requests.HTTPError):
+        _stream_to_file(file_url(flaky_server), filepath)
+    
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_to_file_retries_connection_errors_in_one_loop(tmp_path, monkeypatch):
+    """Test that a failing connection costs MAX_RETRIES requests, not retries of retries"""
+    monkeypatch.setattr(download_utils, 'RETRY_DELAY', 0)
+    
+    with patch.object(download_utils, 'cached_fetch', side_effect=ConnectionError("connection refused")) as mock_fetch:
+        with pytest.raises(ConnectionError):
+            _stream_to_file("https://example.com/book.epub", str(tmp_path / "book.epub"))
+    
+    assert mock_fetch.call_count == download_utils.MAX_RETRIES
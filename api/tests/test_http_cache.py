@@ -0,0 +1,172 @@
+import os
+import time
+import pytest
+from unittest.mock import Mock
+
+from utils.http_cache import ResponseCache, CacheMiss, cached_fetch
+
+
+def make_response(body=b"<html>page</html>", status_code=200, url="https://example.com/page"):
+    response = Mock()
+    response.url = url
+    response.status_code = status_code
+    response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    response.content = body
+    response.text = body.decode()
+    return response
+
+
+def make_session(*responses):
+    session = Mock()
+    session.request = Mock(side_effect=list(responses))
+    return session
+
+
+def test_cached_fetch_serves_repeat_requests_from_disk(tmp_path):
+    """Test that a second identical request is answered without the network"""
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=1024 * 1024)
+    session = make_session(make_response())
+    
+    first = cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    second = cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    
+    assert session.request.call_count == 1
+    assert second.text == first.text == "<html>page</html>"
+    assert second.headers['content-type'] == 'text/html; charset=utf-8'
+
+
+def test_cache_key_includes_method_and_form_body():
+    """Test that POSTs with different form bodies are cached separately"""
+    url = "https://example.com/Fetching_Resource.php"
+    
+    assert ResponseCache.key("POST", url, {'id': 1, 'filename': 'a.epub'}) == \
+        ResponseCache.key("post", url, {'filename': 'a.epub', 'id': 1})
+    assert ResponseCache.key("POST", url, {'id': 1}) != ResponseCache.key("POST", url, {'id': 2})
+    assert ResponseCache.key("GET", url) != ResponseCache.key("POST", url)
+
+
+def test_cached_fetch_refetches_after_ttl(tmp_path):
+    """Test that expired entries are fetched again"""
+    cache = ResponseCache(str(tmp_path), ttl=0, max_bytes=1024 * 1024)
+    session = make_session(make_response(b"old"), make_response(b"new"))
+    
+    cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    time.sleep(0.01)
+    response = cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    
+    assert session.request.call_count == 2
+    assert response.content == b"new"
+
+
+def test_cached_fetch_does_not_store_errors(tmp_path):
+    """Test that non-200 responses are not cached"""
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=1024 * 1024)
+    session = make_session(make_response(status_code=404), make_response())
+    
+    cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    
+    assert session.request.call_count == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the size cap evicts the entry that was used longest ago"""
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=250)
+    for name in ("a", "b"):
+        cache.put(ResponseCache.key("GET", name), name, 200, {}, b"x" * 100)
+    
+    old = time.time() - 100
+    os.utime(os.path.join(str(tmp_path), ResponseCache.key("GET", "a") + ".body"), (old, old))
+    os.utime(os.path.join(str(tmp_path), ResponseCache.key("GET", "b") + ".body"), (old - 10, old - 10))
+    # Reading "b" makes it the most recently used entry
+    assert cache.get(ResponseCache.key("GET", "b")) is not None
+    
+    cache.put(ResponseCache.key("GET", "c"), "c", 200, {}, b"x" * 100)
+    
+    assert cache.get(ResponseCache.key("GET", "a")) is None
+    assert cache.get(ResponseCache.key("GET", "b")) is not None
+    assert cache.get(ResponseCache.key("GET", "c")) is not None
+
+
+def test_replay_mode_serves_only_from_cache(tmp_path):
+    """Test that replay mode ignores TTL and never touches the network"""
+    recorder = ResponseCache(str(tmp_path), ttl=60, max_bytes=1024 * 1024)
+    cached_fetch(make_session(make_response()), "GET", "https://example.com/page", cache=recorder)
+    
+    replay = ResponseCache(str(tmp_path), ttl=0, max_bytes=1024 * 1024, mode="replay")
+    session = make_session()
+    time.sleep(0.01)
+    
+    response = cached_fetch(session, "GET", "https://example.com/page", cache=replay)
+    assert response.text == "<html>page</html>"
+    
+    with pytest.raises(CacheMiss):
+        cached_fetch(session, "GET", "https://example.com/other", cache=replay)
+    assert session.request.call_count == 0
+
+
+def test_streamed_downloads_only_cached_in_record_mode(tmp_path):
+    """Test that file downloads bypass the cache unless recording"""
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=1024 * 1024)
+    session = make_session(make_response(b"file"), make_response(b"file"))
+    
+    cached_fetch(session, "GET", "https://example.com/book.epub", cache=cache, stream=True)
+    cached_fetch(session, "GET", "https://example.com/book.epub", cache=cache, stream=True)
+    assert session.request.call_count == 2
+    
+    cache.mode = "record"
+    session = make_session(make_response(b"file"))
+    cached_fetch(session, "GET", "https://example.com/book.epub", cache=cache, stream=True)
+    replayed = cached_fetch(session, "GET", "https://example.com/book.epub", cache=cache, stream=True)
+    
+    assert session.request.call_count == 1
+    assert b"".join(replayed.iter_content(chunk_size=2)) == b"file"
+
+
+def test_unknown_cache_mode_rejected(tmp_path):
+    """Test that a typo in HTTP_CACHE_MODE fails loudly"""
+    with pytest.raises(ValueError):
+        ResponseCache(str(tmp_path), ttl=60, max_bytes=1024, mode="replya")
+
+
+def test_throttling_response_raises_and_slows_the_host(tmp_path, host_limiter_fixture):
+    """Test that a 429 backs the host off for its Retry-After period and is not cached"""
+    from utils.rate_limiter import HostThrottled
+    
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=1024 * 1024)
+    throttled = make_response(status_code=429)
+    throttled.headers['Retry-After'] = "120"
+    session = make_session(make_response(url="https://example.com/first"), throttled)
+    
+    cached_fetch(session, "GET", "https://example.com/first", cache=cache)
+    rate = host_limiter_fixture.current_rate("https://example.com/")
+    with pytest.raises(HostThrottled):
+        cached_fetch(session, "GET", "https://example.com/page", cache=cache)
+    
+    assert host_limiter_fixture.current_rate("https://example.com/") == rate / 2
+    assert cache.get(cache.key("GET", "https://example.com/page")) is None
+
+
+def test_paced_request_respects_deadline(host_limiter_fixture):
+    """Test that a host pause longer than the deadline fails at once and a shorter one shrinks the timeout"""
+    from utils.deadline import Deadline, DeadlineExceeded
+    from utils.http_cache import paced_request
+    
+    session = make_session(make_response())
+    session.timeout = (10, 60)
+    
+    host_limiter_fixture.acquire("https://example.com/")
+    host_limiter_fixture.record_throttled("https://example.com/", 60)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        paced_request(session, "GET", "https://example.com/page", deadline=Deadline(0.5, "Download"))
+    assert time.monotonic() - started < 0.2
+    session.request.assert_not_called()
+    
+    with host_limiter_fixture.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE host_rate_limits SET blocked_until = :until, next_slot = :until", {"until": time.time() + 0.3}
+        )
+    paced_request(session, "GET", "https://example.com/page", deadline=Deadline(1.0, "Download"))
+    connect_timeout, read_timeout = session.request.call_args.kwargs['timeout']
+    assert read_timeout <= 0.75
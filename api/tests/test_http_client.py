@@ -0,0 +1,102 @@
+import time
+import threading
+from sqlmodel import select
+from unittest.mock import Mock, patch
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from utils.http_client import HttpClient, DEFAULT_HEADERS
+from utils.cookie_store import CookieStore
+from models import HttpCookie
+
+
+def make_scraper():
+    session = Mock()
+    session.headers = {}
+    session.cookies = RequestsCookieJar()
+    return session
+
+
+def test_requests_reuse_one_session_with_default_headers_and_timeout():
+    """Test that sequential requests share a pooled session instead of creating new ones"""
+    client = HttpClient(pool_size=2, timeout=(1, 2))
+    with patch('utils.http_client.cloudscraper.create_scraper', side_effect=make_scraper) as create:
+        client.request("GET", "https://example.com/a")
+        client.request("GET", "https://example.com/b", timeout=5)
+    
+    assert create.call_count == 1
+    assert client.sessions_created == 1
+    assert client.requests_sent == 2
+    session = client.idle.get_nowait()
+    assert session.headers == DEFAULT_HEADERS
+    assert session.request.call_args_list[0].kwargs == {'timeout': (1, 2)}
+    assert session.request.call_args_list[1].kwargs == {'timeout': 5}
+
+
+def test_concurrent_requests_never_share_a_session():
+    """Test that a busy session is not lent out, and only pool_size idle sessions are kept"""
+    client = HttpClient(pool_size=1)
+    in_flight = threading.Barrier(3)
+    sessions = []
+    
+    def make_blocking_scraper():
+        session = make_scraper()
+        session.request.side_effect = lambda *args, **kwargs: in_flight.wait(timeout=5)
+        sessions.append(session)
+        return session
+    
+    with patch('utils.http_client.cloudscraper.create_scraper', side_effect=make_blocking_scraper):
+        threads = [threading.Thread(target=client.request, args=("GET", "https://example.com/")) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    assert len(sessions) == 3
+    assert client.idle.qsize() == 1
+    assert sum(session.close.called for session in sessions) == 2
+
+
+def test_clearance_cookie_is_reused_by_a_new_process(session):
+    """Test that a cookie set on one client's session is loaded by a fresh client, e.g. after a restart"""
+    store = CookieStore(session.get_bind())
+    first = HttpClient(cookie_store=store)
+    expires = int(time.time()) + 3600
+    
+    def make_challenged_scraper():
+        scraper = make_scraper()
+        
+        def solve_challenge(*args, **kwargs):
+            scraper.cookies.set_cookie(create_cookie("cf_clearance", "token", domain="example.com", expires=expires))
+            scraper.cookies.set_cookie(create_cookie("session_only", "x", domain="example.com"))
+        
+        scraper.request.side_effect = solve_challenge
+        return scraper
+    
+    with patch('utils.http_client.cloudscraper.create_scraper', side_effect=make_challenged_scraper):
+        first.request("GET", "https://example.com/")
+    
+    restarted = HttpClient(cookie_store=store)
+    with patch('utils.http_client.cloudscraper.create_scraper', side_effect=make_scraper):
+        restarted.request("GET", "https://example.com/")
+    
+    cookies = restarted.idle.get_nowait().cookies
+    assert cookies.get("cf_clearance", domain="example.com") == "token"
+    assert cookies.get("session_only", domain="example.com") is None
+
+
+def test_expired_cookies_are_not_loaded(session):
+    """Test that stored cookies past their expiry are dropped"""
+    store = CookieStore(session.get_bind())
+    now = int(time.time())
+    store.save(frozenset({
+        ("example.com", "/", "fresh", "1", now + 60, False),
+        ("example.com", "/", "stale", "2", now + 1, False),
+    }))
+    
+    with patch('utils.cookie_store.time.time', return_value=now + 30):
+        jar = RequestsCookieJar()
+        store.load(jar)
+        store.save(frozenset())
+    
+    assert [cookie.name for cookie in jar] == ["fresh"]
+    assert session.exec(select(HttpCookie.name)).all() == ["fresh"]
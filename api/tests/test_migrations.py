@@ -0,0 +1,165 @@
+import multiprocessing
+from sqlmodel import create_engine, SQLModel
+from sqlalchemy.pool import StaticPool
+
+import models
+from models import build_engine
+from migrations import run_migrations, get_schema_version, MIGRATIONS
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE links (url TEXT UNIQUE, author TEXT, article TEXT, downloaded INTEGER)",
+    """CREATE TABLE queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_title TEXT,
+        book_url TEXT NOT NULL,
+        book_author TEXT,
+        created_at TEXT,
+        started_at TEXT,
+        completed_at TEXT,
+        retry_count INTEGER,
+        status TEXT,
+        error_message TEXT
+    )""",
+]
+
+ARTICLE = """
+<article>
+    <h2 class="entry-title"><a href="https://example.com/book">Legacy Book [EPUB]</a></h2>
+    <div class="postmetainfo"><strong>Language:</strong> English<br></div>
+</article>
+"""
+
+
+def make_engine():
+    return create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+def index_names(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA index_list({table})")}
+
+
+def test_migrations_upgrade_legacy_database():
+    """Test that an unversioned legacy database gets columns, backfilled data and indexes"""
+    engine = make_engine()
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(
+            "INSERT INTO links (url, author, article, downloaded) VALUES (?, ?, ?, 0)",
+            ("https://example.com/book", "legacy-author", ARTICLE)
+        )
+    
+    version = run_migrations(engine)
+    
+    assert version == MIGRATIONS[-1][0]
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == version
+        title, language, has_epub = connection.exec_driver_sql(
+            "SELECT title, language, has_epub FROM links"
+        ).one()
+        assert title == "Legacy Book [EPUB]"
+        assert language == "English"
+        assert has_epub == 1
+        assert {"ix_links_author_downloaded", "ix_links_book_url"} <= index_names(connection, "links")
+        assert "ix_links_author" not in index_names(connection, "links")
+        assert {"ix_queue_book_url", "ix_queue_status_created_at"} <= index_names(connection, "queue")
+        connection.exec_driver_sql("INSERT INTO queue (book_title, book_url, status) VALUES ('New', 'url', 'pending')")
+        assert connection.exec_driver_sql("SELECT version FROM queue").scalar() == 1
+        assert connection.exec_driver_sql("SELECT next_attempt_at FROM queue").scalar() is None
+        assert connection.exec_driver_sql("SELECT version FROM change_counters WHERE name = 'queue'").scalar() == 1
+        triggers = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        assert not {name for name in triggers if name.startswith("links_version")}
+
+
+def test_migrations_on_fresh_database_are_idempotent():
+    """Test that migrations apply cleanly on top of create_all and only run once"""
+    engine = make_engine()
+    SQLModel.metadata.create_all(engine)
+    
+    first = run_migrations(engine)
+    second = run_migrations(engine)
+    
+    assert first == second
+    with engine.connect() as connection:
+        applied = connection.exec_driver_sql("SELECT COUNT(*) FROM schema_migrations").scalar()
+        assert applied == len(MIGRATIONS)
+
+
+def _start_up_in_process(database_url, migrations_only, barrier, errors):
+    models.engine = build_engine(database_url)
+    barrier.wait()
+    try:
+        if migrations_only:
+            run_migrations(models.engine)
+        else:
+            models.create_db_and_tables()
+    except Exception as e:
+        errors.put(repr(e))
+
+
+def start_up_together(database_url, migrations_only):
+    """Start two processes on one database at the same moment, like `npm run dev`. Returns their errors."""
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    errors = context.Queue()
+    processes = [
+        context.Process(target=_start_up_in_process, args=(database_url, migrations_only, barrier, errors))
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+    
+    failures = []
+    while not errors.empty():
+        failures.append(errors.get())
+    return failures
+
+
+def test_concurrent_start_up_creates_fresh_database_once(tmp_path):
+    """Test that an API server and worker starting together on a new database both succeed"""
+    database_url = f"sqlite:///{tmp_path / 'links.db'}"
+    
+    assert start_up_together(database_url, migrations_only=False) == []
+    with build_engine(database_url).connect() as connection:
+        applied = connection.exec_driver_sql("SELECT COUNT(*) FROM schema_migrations").scalar()
+        assert applied == len(MIGRATIONS)
+
+
+def test_concurrent_migrations_apply_each_version_once(tmp_path):
+    """Test that two processes upgrading a legacy database at once never apply a migration twice"""
+    database_url = f"sqlite:///{tmp_path / 'links.db'}"
+    engine = build_engine(database_url)
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+    engine.dispose()
+    
+    assert start_up_together(database_url, migrations_only=True) == []
+    with build_engine(database_url).connect() as connection:
+        assert get_schema_version(connection) == MIGRATIONS[-1][0]
+        applied = connection.exec_driver_sql("SELECT COUNT(*) FROM schema_migrations").scalar()
+        assert applied == len(MIGRATIONS)
+
+
+def test_hot_queries_use_indexes():
+    """Test that the worker and API lookups are index searches rather than table scans"""
+    engine = make_engine()
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    
+    queries = [
+        "SELECT * FROM links WHERE author = 'a'",
+        "SELECT * FROM links WHERE book_url = 'b'",
+        "SELECT id FROM queue WHERE book_url = 'b' AND status IN ('pending', 'in_progress')",
+        "SELECT id FROM queue WHERE status = 'pending' ORDER BY created_at LIMIT 1",
+    ]
+    with engine.connect() as connection:
+        for query in queries:
+            plan = " ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}"))
+            assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, plan
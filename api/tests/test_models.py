@@ -134,3 +134,68 @@ def test_link_unique_constraint(session: Session):
     
     with pytest.raises(IntegrityError):
         session.commit()
+
+
+def test_queue_writes_bump_change_version(session: Session):
+    """Test that inserts, updates and deletes each get a new queue version, deletes as tombstones"""
+    from models import ChangeCounter, QueueTombstone
+    from utils.bulk_ops import bulk_delete
+    
+    first = QueueItem(book_title="First", book_url="url1")
+    second = QueueItem(book_title="Second", book_url="url2")
+    session.add_all([first, second])
+    session.commit()
+    session.refresh(first)
+    session.refresh(second)
+    assert sorted([first.version, second.version]) == [1, 2]
+    
+    first.status = QueueStatus.IN_PROGRESS.value
+    session.add(first)
+    session.commit()
+    session.refresh(first)
+    assert first.version == 3
+    
+    second_id = second.id
+    assert bulk_delete(session, QueueItem, QueueItem.id == second_id) == 1
+    assert session.exec(select(QueueTombstone.queue_id, QueueTombstone.version)).all() == [(second_id, 4)]
+    assert session.get(ChangeCounter, "queue").version == 4
+
+
+def test_queue_deletes_prune_old_tombstones(session: Session, monkeypatch):
+    """Test that deleting queue items keeps only the tombstones within QUEUE_CHANGE_RETENTION changes"""
+    import models
+    from models import QueueTombstone
+    from utils.bulk_ops import bulk_delete
+    
+    monkeypatch.setattr(models, "QUEUE_CHANGE_RETENTION", 3)
+    session.add_all([QueueItem(book_title=f"Book {n}", book_url=f"url{n}") for n in range(5)])
+    session.commit()
+    
+    # Versions 1-5 are the inserts, 6-10 the deletes; only changes after version 7 are kept
+    assert bulk_delete(session, QueueItem, batch_size=2) == 5
+    
+    versions = session.exec(select(QueueTombstone.version)).all()
+    assert sorted(versions) == [8, 9, 10]
+
+
+def test_link_writes_bump_links_version_once_per_statement(session: Session):
+    """Test that scrape inserts and deletes bump the links version once per statement, not per row"""
+    from models import ChangeCounter
+    from utils.scraper_utils import store_links
+    from utils.bulk_ops import bulk_delete
+    
+    rows = [{'url': f"https://example.com/{n}", 'author': "author"} for n in range(5)]
+    assert store_links(session, rows) == 5
+    assert session.get(ChangeCounter, "links").version == 1
+    
+    # Rows ignored as duplicates are not writes
+    assert store_links(session, rows) == 0
+    session.expire_all()
+    assert session.get(ChangeCounter, "links").version == 1
+    
+    assert bulk_delete(session, Link, Link.url == "https://example.com/0") == 1
+    assert bulk_delete(session, Link, batch_size=2) == 4
+    assert bulk_delete(session, Link) == 0
+    session.expire_all()
+    # One plain delete plus two non-empty batches
+    assert session.get(ChangeCounter, "links").version == 4
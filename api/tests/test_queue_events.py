@@ -0,0 +1,143 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+from sqlmodel import Session, SQLModel, select
+from fastapi.testclient import TestClient
+
+from models import build_engine, QueueItem
+from constants import QueueStatus
+from utils.queue_events import QueueBroadcaster
+
+
+def make_file_engines(tmp_path):
+    """The server's engine and a second one standing in for the worker process"""
+    database_url = f"sqlite:///{tmp_path / 'links.db'}"
+    server_engine = build_engine(database_url)
+    SQLModel.metadata.create_all(server_engine)
+    return server_engine, build_engine(database_url)
+
+
+def write(engine, fn):
+    with Session(engine) as session:
+        fn(session)
+        session.commit()
+
+
+def test_broadcaster_pushes_writes_from_another_process(tmp_path):
+    """Test snapshot, then only the changed and deleted items when the worker writes"""
+    server_engine, worker_engine = make_file_engines(tmp_path)
+    write(worker_engine, lambda session: session.add_all([
+        QueueItem(book_title="A", book_url="url-a", created_at="2026-01-01T00:00:01"),
+        QueueItem(book_title="B", book_url="url-b", created_at="2026-01-01T00:00:02"),
+    ]))
+    
+    def start_download(session):
+        item = session.exec(select(QueueItem).where(QueueItem.book_url == "url-a")).one()
+        item.status = QueueStatus.IN_PROGRESS.value
+        item.bytes_downloaded = 1024
+        item.total_bytes = 4096
+        session.add(item)
+    
+    def delete_b(session):
+        session.delete(session.exec(select(QueueItem).where(QueueItem.book_url == "url-b")).one())
+    
+    async def scenario():
+        broadcaster = QueueBroadcaster(server_engine, interval=0.01)
+        subscription = broadcaster.subscribe()
+        
+        event, snapshot = await asyncio.wait_for(subscription.get(), timeout=5)
+        assert event == "snapshot"
+        assert [item["bookUrl"] for item in snapshot] == ["url-b", "url-a"]
+        
+        await asyncio.to_thread(write, worker_engine, start_download)
+        event, changes = await asyncio.wait_for(subscription.get(), timeout=5)
+        assert event == "changes"
+        assert changes["deleted"] == []
+        assert [(item["bookUrl"], item["status"], item["bytesDownloaded"], item["totalBytes"])
+                for item in changes["items"]] == [("url-a", "in_progress", 1024, 4096)]
+        
+        await asyncio.to_thread(write, worker_engine, delete_b)
+        event, changes = await asyncio.wait_for(subscription.get(), timeout=5)
+        assert changes == {"items": [], "deleted": [snapshot[0]["id"]]}
+        
+        # The watcher stops once nobody is listening
+        broadcaster.unsubscribe(subscription)
+        await asyncio.wait_for(broadcaster._task, timeout=5)
+    
+    asyncio.run(scenario())
+    server_engine.dispose()
+    worker_engine.dispose()
+
+
+def test_broadcaster_close_ends_streams(tmp_path):
+    """Test that close() sends every subscriber the end-of-stream marker"""
+    server_engine, _ = make_file_engines(tmp_path)
+    
+    async def scenario():
+        broadcaster = QueueBroadcaster(server_engine, interval=0.01)
+        subscription = broadcaster.subscribe()
+        await asyncio.wait_for(subscription.get(), timeout=5)
+        broadcaster.close()
+        assert await asyncio.wait_for(subscription.get(), timeout=5) is None
+        await asyncio.wait_for(broadcaster._task, timeout=5)
+    
+    asyncio.run(scenario())
+    server_engine.dispose()
+
+
+def test_queue_stream_starts_with_snapshot(client: TestClient, session: Session, sample_queue_item: QueueItem):
+    """Test that GET /queue/stream opens with a snapshot event in the GET /queue format"""
+    import server
+    
+    session.add(sample_queue_item)
+    session.commit()
+    
+    # TestClient buffers whole responses, so read the endless stream's body directly
+    request = Mock()
+    request.is_disconnected = AsyncMock(return_value=False)
+    
+    async def scenario():
+        response = await server.stream_queue(request)
+        assert response.media_type == "text/event-stream"
+        first = await anext(response.body_iterator)
+        await response.body_iterator.aclose()
+        return first
+    
+    event = asyncio.run(scenario())
+    
+    assert event.startswith("event: snapshot\ndata: ")
+    assert '"bookTitle": "Test Book"' in event
+    assert '"bytesDownloaded": 0' in event
+    assert not server.queue_broadcaster.subscribers
+
+
+def test_queue_stream_ends_when_server_shutdown_begins(client: TestClient, session: Session):
+    """Test that SIGTERM ends open streams before uvicorn waits for connections to close"""
+    import signal
+    import server
+    
+    request = Mock()
+    request.is_disconnected = AsyncMock(return_value=False)
+    received = []
+    
+    async def scenario():
+        previous_int = signal.getsignal(signal.SIGINT)
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+        try:
+            server.close_streams_on_exit()
+            response = await server.stream_queue(request)
+            await anext(response.body_iterator)
+            signal.raise_signal(signal.SIGTERM)
+            rest = await asyncio.wait_for(_drain(response.body_iterator), timeout=5)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            signal.signal(signal.SIGINT, previous_int)
+        return rest
+    
+    assert asyncio.run(scenario()) == []
+    # uvicorn's own handler still runs
+    assert received == [signal.SIGTERM]
+    assert not server.queue_broadcaster.subscribers
+
+
+async def _drain(body_iterator):
+    return [chunk async for chunk in body_iterator]
@@ -0,0 +1,98 @@
+import time
+import multiprocessing
+import pytest
+from unittest.mock import Mock
+from sqlmodel import SQLModel
+
+from models import build_engine
+from utils.rate_limiter import HostRateLimiter, throttle_pause, THROTTLE_PAUSE
+
+
+def make_limiter(tmp_path, **kwargs):
+    engine = build_engine(f"sqlite:///{tmp_path / 'links.db'}")
+    SQLModel.metadata.create_all(engine)
+    return HostRateLimiter(engine, **kwargs)
+
+
+def _acquire_in_process(database_url, count, starts):
+    engine = build_engine(database_url)
+    limiter = HostRateLimiter(engine, initial_rate=20.0, burst=1)
+    for _ in range(count):
+        limiter.acquire("https://example.com/page")
+        starts.put(time.time())
+
+
+def test_host_rate_limiter_spaces_requests_across_processes(tmp_path):
+    """Test that two processes sharing a database draw from one per-host budget"""
+    make_limiter(tmp_path)
+    context = multiprocessing.get_context("fork")
+    starts = context.Queue()
+    processes = [
+        context.Process(target=_acquire_in_process, args=(f"sqlite:///{tmp_path / 'links.db'}", 4, starts))
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+    
+    times = sorted(starts.get(timeout=5) for _ in range(8))
+    # Start times are taken after each sleep, so allow for scheduling jitter
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 1 / 20 / 2
+    assert times[-1] - times[0] >= 7 / 20 - 0.02
+
+
+def test_host_rate_limiter_allows_a_burst_after_idle(tmp_path):
+    """Test that `burst` requests start back to back, and later ones are spaced"""
+    limiter = make_limiter(tmp_path, initial_rate=10.0, burst=3)
+    
+    waits = [limiter.acquire("https://example.com/") for _ in range(4)]
+    
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.02)
+
+
+def test_host_rate_limiter_adapts_to_responses(tmp_path):
+    """Test additive increase on success, multiplicative decrease on errors and throttling"""
+    limiter = make_limiter(tmp_path, initial_rate=1.0, min_rate=0.2, max_rate=1.1)
+    url = "https://example.com/page"
+    other = "https://files.example.net/book.epub"
+    limiter.acquire(url)
+    limiter.acquire(other)
+    
+    limiter.record_success(url)
+    assert limiter.current_rate(url) == pytest.approx(1.05)
+    limiter.record_success(url)
+    limiter.record_success(url)
+    assert limiter.current_rate(url) == pytest.approx(1.1)
+    
+    limiter.record_error(url)
+    assert limiter.current_rate(url) == pytest.approx(0.88)
+    for _ in range(5):
+        limiter.record_throttled(url, pause=0)
+    assert limiter.current_rate(url) == pytest.approx(0.2)
+    assert limiter.current_rate(other) == 1.0
+
+
+def test_throttled_host_pauses_until_retry_after(tmp_path):
+    """Test that a throttled host's next request waits out the pause"""
+    limiter = make_limiter(tmp_path, initial_rate=100.0)
+    limiter.acquire("https://example.com/")
+    limiter.record_throttled("https://example.com/", pause=0.2)
+    
+    assert limiter.acquire("https://example.com/") == pytest.approx(0.2, abs=0.05)
+
+
+def test_throttle_pause_detects_throttling_signals():
+    """Test 429/503, Cloudflare challenges and Retry-After parsing"""
+    def response(status_code, **headers):
+        return Mock(status_code=status_code, headers=headers)
+    
+    assert throttle_pause(response(200)) is None
+    assert throttle_pause(response(404)) is None
+    assert throttle_pause(response(500)) is None
+    assert throttle_pause(response(429, **{'Retry-After': '7'})) == 7
+    assert throttle_pause(response(503)) == THROTTLE_PAUSE
+    assert throttle_pause(response(403, Server='cloudflare')) == THROTTLE_PAUSE
+    assert throttle_pause(response(200, **{'cf-mitigated': 'challenge'})) == THROTTLE_PAUSE
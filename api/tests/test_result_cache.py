@@ -0,0 +1,38 @@
+from utils.result_cache import ResultCache, etag_matches, links_etag
+
+
+def test_result_cache_misses_on_other_versions():
+    """Test that entries are only served for the version they were built from"""
+    cache = ResultCache(max_bytes=1024)
+    cache.put(("links", "author"), 3, b"[1]", {"X-Next-Cursor": "7"})
+    
+    assert cache.get(("links", "author"), 3) == (b"[1]", {"X-Next-Cursor": "7"})
+    assert cache.get(("links", "author"), 4) is None
+    assert cache.get(("links", "other"), 3) is None
+
+
+def test_result_cache_evicts_least_recently_used():
+    """Test that the cache stays within max_bytes by dropping the oldest entries"""
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", 1, b"aaaa")
+    cache.put("b", 1, b"bbbb")
+    assert cache.get("a", 1)
+    cache.put("c", 1, b"cccc")
+    
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) and cache.get("c", 1)
+    assert cache.size == 8
+    
+    cache.put("huge", 1, b"x" * 11)
+    assert cache.get("huge", 1) is None
+
+
+def test_etag_matches():
+    """Test If-None-Match parsing: lists, weak tags and *"""
+    etag = links_etag(5)
+    assert etag_matches(etag, etag)
+    assert etag_matches('"links-5"', etag)
+    assert etag_matches(f'W/"links-4", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"links-4"', etag)
+    assert not etag_matches(None, etag)
@@ -1,4 +1,10 @@
-from utils.scraper_utils import parse_article_html, format_author_name
+import time
+from unittest.mock import Mock, patch
+from sqlmodel import Session, select
+
+from models import Link, AuthorScrapeState
+from utils.scraper_utils import parse_article_html, format_author_name, scrape_author, store_links
+from utils.html_parser import make_soup, resolve_parser
 
 
 def test_format_author_name():
@@ -100,3 +106,262 @@ def test_parse_article_html_data_src_image():
     result = parse_article_html(html)
     
     assert result['image_url'] == 'https://example.com/lazy-image.jpg'
+
+
+def test_parse_article_html_accepts_parsed_element():
+    """Test that parsing an already-parsed article gives the same result as parsing its HTML"""
+    html = """
+    <html><body>
+    <article>
+        <h2 class="entry-title">
+            <a href="https://example.com/book-1">First Book</a>
+        </h2>
+        <time class="entry-time">January 1, 2026</time>
+        <div class="postmetainfo">
+            <strong>Author:</strong> John Doe<br>
+            <strong>Language:</strong> English<br>
+            <strong>Genre:</strong> Fiction
+        </div>
+        <a class="entry-image-link"><img data-src="https://example.com/1.jpg" /></a>
+        <div class="entry-content"><p>Description [EPUB]</p></div>
+    </article>
+    <article>
+        <h2 class="entry-title">
+            <a href="https://example.com/book-2">Second Book [PDF]</a>
+        </h2>
+    </article>
+    </body></html>
+    """
+    
+    articles = make_soup(html).find_all("article")
+    
+    assert len(articles) == 2
+    for article in articles:
+        assert parse_article_html(article) == parse_article_html(str(article))
+    assert parse_article_html(articles[0])['book_author'] == 'John Doe'
+    assert parse_article_html(articles[1])['has_pdf'] is True
+
+
+def test_resolve_parser_falls_back_when_backend_missing():
+    """Test that an unavailable parser backend falls back to the built-in parser"""
+    assert resolve_parser("html.parser") == "html.parser"
+    assert resolve_parser("not-a-real-parser") == "html.parser"
+
+
+def make_listing_page(author, book_ids):
+    """Build a listing page with one article per book id"""
+    articles = "".join(
+        f"""
+        <article>
+            <h2 class="entry-title">
+                <a href="https://oceanofpdf.com/authors/{author}/book-{book_id}/">Book {book_id} [EPUB]</a>
+            </h2>
+        </article>
+        """
+        for book_id in book_ids
+    )
+    return f"<html><body>{articles}</body></html>"
+
+
+def fake_fetcher(pages_by_number, requested_urls=None):
+    """Return a _fetch_page replacement serving listing pages by page number"""
+    def fetch(url, deadline=None):
+        if requested_urls is not None:
+            requested_urls.append(url)
+        parts = url.rstrip('/').split('/')
+        page = int(parts[-1]) if parts[-2] == 'page' else 1
+        return Mock(text=pages_by_number.get(page, "<html><body></body></html>"))
+    return fetch
+
+
+def test_scrape_author_adds_books_from_every_page(session: Session):
+    """Test that scrape_author walks pages until an empty one and stores each book"""
+    pages = {
+        1: make_listing_page("test-author", [1, 2]),
+        2: make_listing_page("test-author", [3]),
+    }
+    requested_urls = []
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages, requested_urls)):
+        result = scrape_author("test-author", session)
+    
+    assert result == {'success': True, 'books_added': 3, 'author': 'test-author'}
+    links = session.exec(select(Link)).all()
+    assert sorted(link.title for link in links) == ["Book 1 [EPUB]", "Book 2 [EPUB]", "Book 3 [EPUB]"]
+    assert all(link.author == "test-author" and link.has_epub == 1 for link in links)
+    assert requested_urls[:3] == [
+        "https://oceanofpdf.com/category/authors/test-author/",
+        "https://oceanofpdf.com/category/authors/test-author/page/2",
+        "https://oceanofpdf.com/category/authors/test-author/page/3",
+    ]
+
+
+def test_scrape_author_skips_existing_books(session: Session):
+    """Test that books already in the database are not counted as added"""
+    session.add(Link(url="https://oceanofpdf.com/authors/test-author/book-1/", author="test-author"))
+    session.commit()
+    pages = {1: make_listing_page("test-author", [1, 2])}
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages)):
+        result = scrape_author("test-author", session)
+    
+    assert result['success'] is True
+    assert result['books_added'] == 1
+
+
+def test_store_links_reports_only_new_rows(session: Session):
+    """Test that a page of rows is inserted once and duplicates are ignored"""
+    rows = [
+        {'url': f"https://example.com/book-{book_id}", 'author': "test-author", 'title': f"Book {book_id}"}
+        for book_id in range(3)
+    ]
+    
+    assert store_links(session, rows[:2]) == 2
+    assert store_links(session, rows) == 1
+    assert store_links(session, rows) == 0
+    assert store_links(session, []) == 0
+    assert len(session.exec(select(Link)).all()) == 3
+
+
+def test_scrape_author_stops_at_other_author(session: Session):
+    """Test that scraping stops when listings switch to a different author"""
+    pages = {
+        1: make_listing_page("test-author", [1]),
+        2: make_listing_page("someone-else", [2]),
+    }
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages)):
+        result = scrape_author("test-author", session)
+    
+    assert result == {'success': True, 'books_added': 1, 'author': 'test-author'}
+
+
+def test_scrape_author_fetch_failure(session: Session):
+    """Test that a page that cannot be fetched reports failure with the books added so far"""
+    pages = {1: make_listing_page("test-author", [1])}
+    fetch = fake_fetcher(pages)
+    
+    def failing_fetch(url, deadline=None):
+        if url.endswith("/page/2"):
+            raise ConnectionError("connection refused")
+        return fetch(url)
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=failing_fetch):
+        result = scrape_author("test-author", session)
+    
+    assert result['success'] is False
+    assert result['books_added'] == 1
+    assert "connection refused" in result['error']
+
+
+def test_scrape_author_page_error_fails_without_recording_state(session: Session):
+    """Test that a page that cannot be parsed fails the scrape and records no scrape state"""
+    pages = {
+        1: make_listing_page("test-author", [1]),
+        2: "<html><body><article><h2>No link</h2></article></body></html>",
+    }
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages)):
+        result = scrape_author("test-author", session)
+    
+    assert result['success'] is False
+    assert result['books_added'] == 1
+    assert session.get(AuthorScrapeState, "test-author") is None
+
+
+def test_scrape_author_incremental_stops_at_known_page(session: Session):
+    """Test that a refresh with nothing new costs a single listing request"""
+    pages = {
+        1: make_listing_page("test-author", [5, 4]),
+        2: make_listing_page("test-author", [3, 2]),
+        3: make_listing_page("test-author", [1]),
+    }
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages)):
+        assert scrape_author("test-author", session)['books_added'] == 5
+    
+    state = session.get(AuthorScrapeState, "test-author")
+    assert state.newest_url == "https://oceanofpdf.com/authors/test-author/book-5/"
+    assert state.last_scraped_at is not None
+    
+    requested_urls = []
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages, requested_urls)):
+        result = scrape_author("test-author", session)
+    
+    assert result['books_added'] == 0
+    assert requested_urls == ["https://oceanofpdf.com/category/authors/test-author/"]
+
+
+def test_scrape_author_incremental_without_state_waits_before_page_two(session: Session):
+    """Test that an incremental scrape with no recorded state does not prefetch page 2 when page 1 has nothing new"""
+    rows = [
+        {'url': f"https://oceanofpdf.com/authors/test-author/book-{book_id}/", 'author': "test-author"}
+        for book_id in (4, 3)
+    ]
+    store_links(session, rows)
+    pages = {
+        1: make_listing_page("test-author", [4, 3]),
+        2: make_listing_page("test-author", [2, 1]),
+    }
+    requested_urls = []
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages, requested_urls)):
+        result = scrape_author("test-author", session)
+    
+    assert result['books_added'] == 0
+    assert requested_urls == ["https://oceanofpdf.com/category/authors/test-author/"]
+
+
+def test_scrape_author_incremental_picks_up_new_books(session: Session):
+    """Test that new books above the high-water mark are added without walking older pages"""
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher({
+        1: make_listing_page("test-author", [2, 1]),
+    })):
+        scrape_author("test-author", session)
+    
+    requested_urls = []
+    pages = {
+        1: make_listing_page("test-author", [3, 2]),
+        2: make_listing_page("test-author", [1]),
+    }
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages, requested_urls)):
+        result = scrape_author("test-author", session)
+    
+    assert result['books_added'] == 1
+    assert len(requested_urls) == 1
+    state = session.get(AuthorScrapeState, "test-author")
+    assert state.newest_url == "https://oceanofpdf.com/authors/test-author/book-3/"
+
+
+def test_scrape_author_full_walks_every_page(session: Session):
+    """Test that a full scrape repairs gaps on older pages"""
+    pages = {
+        1: make_listing_page("test-author", [3]),
+        2: make_listing_page("test-author", [2]),
+        3: make_listing_page("test-author", [1]),
+    }
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher({1: pages[1]})):
+        scrape_author("test-author", session)
+    
+    with patch('utils.scraper_utils._fetch_page', side_effect=fake_fetcher(pages)):
+        assert scrape_author("test-author", session)['books_added'] == 0
+        result = scrape_author("test-author", session, full=True)
+    
+    assert result['books_added'] == 2
+    assert len(session.exec(select(Link)).all()) == 3
+
+
+def test_scrape_author_fails_when_deadline_passes(session: Session):
+    """Test that a stalled listing fetch fails the scrape at its deadline instead of hanging"""
+    from utils.deadline import Deadline
+    
+    def stalled_fetch(url, deadline=None):
+        time.sleep(2)
+    
+    started = time.monotonic()
+    with patch('utils.scraper_utils._fetch_page', side_effect=stalled_fetch):
+        result = scrape_author("test-author", session, deadline=Deadline(0.2, "Scrape of 'test-author'"))
+    
+    assert time.monotonic() - started < 1
+    assert result['success'] is False
+    assert "deadline" in result['error']
+
@@ -0,0 +1,114 @@
+"""
+Stress test: the API server, several worker processes and a scraper share one
+SQLite file through build_engine, the way `npm run dev` runs them.
+"""
+import time
+import multiprocessing
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, select, func
+
+from models import build_engine, Link, QueueItem
+from migrations import run_migrations
+from constants import QueueStatus
+
+WORKER_PROCESSES = 3
+BOOKS = 200
+ENQUEUE_BATCH = 10
+SCRAPE_PAGES = 30
+ARTICLES_PER_PAGE = 20
+
+
+def _run_worker_process(database_url, enqueue_done, claimed_ids):
+    from worker import claim_next_queue_item
+
+    engine = build_engine(database_url)
+    while True:
+        with Session(engine) as session:
+            item = claim_next_queue_item(session)
+            if item:
+                item.status = QueueStatus.COMPLETED.value
+                item.completed_at = datetime.now().isoformat()
+                session.add(item)
+                session.commit()
+                claimed_ids.put(item.id)
+                continue
+
+        if enqueue_done.is_set():
+            with Session(engine) as session:
+                pending = session.exec(
+                    select(func.count()).select_from(QueueItem).where(QueueItem.status == QueueStatus.PENDING.value)
+                ).one()
+            if pending == 0:
+                return
+        time.sleep(0.005)
+
+
+def _run_scraper_process(database_url):
+    from utils.scraper_utils import store_links
+
+    engine = build_engine(database_url)
+    with Session(engine) as session:
+        for page in range(SCRAPE_PAGES):
+            rows = [
+                {'url': f"https://example.com/scraped/{page}/{n}", 'author': "stress-author", 'title': f"Book {n}"}
+                for n in range(ARTICLES_PER_PAGE)
+            ]
+            assert store_links(session, rows) == ARTICLES_PER_PAGE
+            # Re-scraping the same page adds nothing
+            assert store_links(session, rows) == 0
+
+
+def test_server_workers_and_scraper_share_database(client: TestClient, tmp_path, monkeypatch):
+    """Test concurrent enqueues, claims and scrape writes against one file without lock errors"""
+    import server
+
+    database_url = f"sqlite:///{tmp_path / 'links.db'}"
+    engine = build_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    monkeypatch.setattr(server, "engine", engine)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    context = multiprocessing.get_context("fork")
+    enqueue_done = context.Event()
+    claimed_ids = context.Queue()
+    processes = [
+        context.Process(target=_run_worker_process, args=(database_url, enqueue_done, claimed_ids))
+        for _ in range(WORKER_PROCESSES)
+    ]
+    processes.append(context.Process(target=_run_scraper_process, args=(database_url,)))
+    for process in processes:
+        process.start()
+
+    try:
+        for start in range(0, BOOKS, ENQUEUE_BATCH):
+            books = [
+                {"bookUrl": f"https://example.com/download/{n}", "bookTitle": f"Book {n}"}
+                for n in range(start, start + ENQUEUE_BATCH)
+            ]
+            response = client.post("/download", json={"books": books})
+            assert response.status_code == 200, response.text
+            assert response.json()["added"] == ENQUEUE_BATCH
+            assert client.get("/queue").status_code == 200
+    finally:
+        enqueue_done.set()
+        for process in processes:
+            process.join(timeout=60)
+
+    assert [process.exitcode for process in processes] == [0] * len(processes)
+
+    claimed = []
+    while len(claimed) < BOOKS and not claimed_ids.empty():
+        claimed.append(claimed_ids.get(timeout=5))
+    assert len(claimed) == BOOKS
+    assert len(set(claimed)) == BOOKS
+
+    with Session(engine) as session:
+        statuses = session.exec(select(QueueItem.status)).all()
+        assert statuses == [QueueStatus.COMPLETED.value] * BOOKS
+        scraped = session.exec(select(func.count()).select_from(Link)).one()
+        assert scraped == SCRAPE_PAGES * ARTICLES_PER_PAGE
+    engine.dispose()
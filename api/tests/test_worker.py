@@ -1,11 +1,13 @@
+import os
 import pytest
 from unittest.mock import Mock, patch
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlmodel import Session, select
 
 from models import QueueItem, Link
 from constants import QueueStatus, MAX_RETRY_COUNT
-from worker import process_queue_item
+import worker as worker_module
+from worker import process_queue_item, claim_next_queue_item, _progress_recorder, _worker_slot
 
 
 def test_process_queue_item_success(session: Session, sample_link: Link, sample_queue_item: QueueItem):
@@ -69,23 +71,29 @@ def test_process_queue_item_max_retries(session: Session, sample_queue_item: Que
         assert str(MAX_RETRY_COUNT) in sample_queue_item.error_message
 
 
-def test_process_queue_item_updates_status_to_in_progress(session: Session, sample_queue_item: QueueItem):
-    """Test that queue item status is updated to in_progress when processing starts"""
+def test_process_queue_item_keeps_claim_while_downloading(session: Session, sample_queue_item: QueueItem):
+    """Test that the claim marks the item in_progress and processing does not write it again"""
     session.add(sample_queue_item)
     session.commit()
-    session.refresh(sample_queue_item)
+    
+    claimed = claim_next_queue_item(session)
+    claimed_at = claimed.started_at
+    version = claimed.version
     
     with patch('worker.download_book') as mock_download:
         def check_status(*args, **kwargs):
-            item = session.exec(select(QueueItem).where(QueueItem.id == sample_queue_item.id)).first()
-            assert item.status == QueueStatus.IN_PROGRESS.value
-            assert item.started_at is not None
+            session.refresh(claimed)
+            assert claimed.status == QueueStatus.IN_PROGRESS.value
+            assert claimed.started_at == claimed_at
+            assert claimed.version == version
             return {'filename': 'test.epub', 'destination': '/path'}
         
         mock_download.side_effect = check_status
         
-        result = process_queue_item(sample_queue_item, session)
+        result = process_queue_item(claimed, session)
         assert result is True
+    
+    assert claimed.started_at == claimed_at
 
 
 def test_process_queue_item_no_matching_link(session: Session, sample_queue_item: QueueItem):
@@ -104,3 +112,245 @@ def test_process_queue_item_no_matching_link(session: Session, sample_queue_item
         
         assert result is True
         assert sample_queue_item.status == QueueStatus.COMPLETED.value
+
+
+def test_progress_recorder_throttles_writes(session: Session, sample_queue_item: QueueItem, monkeypatch):
+    """Test that download progress is stored at most once per interval, plus the final chunk"""
+    session.add(sample_queue_item)
+    session.commit()
+    clock = iter([100.0, 100.2, 101.5, 101.6])
+    monkeypatch.setattr("worker.time.monotonic", lambda: next(clock))
+    record = _progress_recorder(sample_queue_item, session)
+    
+    stored = []
+    for done in (10, 20, 30, 100):
+        record(done, 100)
+        session.refresh(sample_queue_item)
+        stored.append((sample_queue_item.bytes_downloaded, sample_queue_item.total_bytes))
+    
+    assert stored == [(10, 100), (10, 100), (30, 100), (100, 100)]
+
+
+def test_claim_next_queue_item_marks_in_progress(session: Session):
+    """Test that claiming flips the oldest pending item to in_progress"""
+    older = QueueItem(book_title="Older", book_url="url1", created_at="2026-01-01T00:00:00")
+    newer = QueueItem(book_title="Newer", book_url="url2", created_at="2026-01-02T00:00:00")
+    session.add(newer)
+    session.add(older)
+    session.commit()
+    
+    claimed = claim_next_queue_item(session)
+    
+    assert claimed is not None
+    assert claimed.book_title == "Older"
+    assert claimed.status == QueueStatus.IN_PROGRESS.value
+    assert claimed.started_at is not None
+
+
+def test_claim_next_queue_item_never_returns_same_item_twice(session: Session):
+    """Test that consecutive claims hand out different items"""
+    session.add(QueueItem(book_title="Book 1", book_url="url1", created_at="2026-01-01T00:00:00"))
+    session.add(QueueItem(book_title="Book 2", book_url="url2", created_at="2026-01-02T00:00:00"))
+    session.commit()
+    
+    first = claim_next_queue_item(session)
+    second = claim_next_queue_item(session)
+    third = claim_next_queue_item(session)
+    
+    assert first.id != second.id
+    assert {first.book_title, second.book_title} == {"Book 1", "Book 2"}
+    assert third is None
+
+
+def test_claim_next_queue_item_skips_non_pending(session: Session):
+    """Test that only pending items are claimed"""
+    session.add(QueueItem(book_title="Done", book_url="url1", status=QueueStatus.COMPLETED.value))
+    session.add(QueueItem(book_title="Running", book_url="url2", status=QueueStatus.IN_PROGRESS.value))
+    session.commit()
+    
+    assert claim_next_queue_item(session) is None
+
+
+def test_claim_next_queue_item_reclaims_expired_lease(session: Session):
+    """Test that an item left in_progress past its lease by a crashed worker is claimed again"""
+    now = datetime.now()
+    expired = (now - timedelta(seconds=worker_module.CLAIM_LEASE + 60)).isoformat()
+    recent = (now - timedelta(seconds=60)).isoformat()
+    session.add(QueueItem(book_title="Abandoned", book_url="url1", status=QueueStatus.IN_PROGRESS.value, started_at=expired))
+    session.add(QueueItem(book_title="Running", book_url="url2", status=QueueStatus.IN_PROGRESS.value, started_at=recent))
+    session.commit()
+    
+    claimed = claim_next_queue_item(session)
+    
+    assert claimed.book_title == "Abandoned"
+    assert claimed.status == QueueStatus.IN_PROGRESS.value
+    assert claimed.started_at > expired
+    assert claim_next_queue_item(session) is None
+
+
+def test_worker_slot_backs_off_when_idle_and_wakes_on_notify(session: Session, monkeypatch):
+    """Test that an idle slot doubles its poll wait and claims new work as soon as it is woken"""
+    import threading
+    import worker
+    
+    monkeypatch.setattr(worker, "engine", session.get_bind())
+    stop_event = threading.Event()
+    waits = []
+    wakeup = Mock(generation=0)
+    
+    def wait(generation, timeout):
+        waits.append(timeout)
+        if len(waits) == 3:
+            session.add(QueueItem(book_title="New", book_url="https://example.com/new"))
+            session.commit()
+            return True
+        if len(waits) == 4:
+            stop_event.set()
+        return False
+    
+    wakeup.wait.side_effect = wait
+    with patch('worker.download_book', return_value={'filename': 'new.epub', 'destination': '/tmp/new.epub'}):
+        _worker_slot(1, stop_event, wakeup)
+    
+    assert waits == [worker.WORKER_POLL_MIN, worker.WORKER_POLL_MIN * 2, worker.WORKER_POLL_MIN * 4, worker.WORKER_POLL_MIN]
+    item = session.exec(select(QueueItem)).one()
+    session.refresh(item)
+    assert item.status == QueueStatus.COMPLETED.value
+
+
+def test_process_queue_item_requeues_after_deadline(session: Session, sample_queue_item: QueueItem):
+    """Test that an attempt that runs out of time is requeued with the deadline as its error"""
+    from utils.deadline import DeadlineExceeded
+    
+    session.add(sample_queue_item)
+    session.commit()
+    
+    with patch('worker.download_book', side_effect=DeadlineExceeded("Download exceeded its 1800s deadline during file transfer")) as mock_download:
+        result = process_queue_item(sample_queue_item, session)
+    
+    assert result is False
+    assert mock_download.call_args.kwargs['deadline'].seconds == worker_module.DOWNLOAD_DEADLINE
+    assert sample_queue_item.status == QueueStatus.PENDING.value
+    assert sample_queue_item.retry_count == 1
+    assert "deadline" in sample_queue_item.error_message
+
+
+def test_process_queue_item_schedules_retry_with_backoff(session: Session, sample_queue_item: QueueItem, monkeypatch):
+    """Test that a transient failure schedules the next attempt and claiming skips it until due"""
+    monkeypatch.setattr(worker_module, "RETRY_BASE_DELAY", 60)
+    session.add(sample_queue_item)
+    session.commit()
+    
+    with patch('worker.download_book', side_effect=ConnectionError("Connection reset")):
+        process_queue_item(sample_queue_item, session)
+    
+    next_attempt = datetime.fromisoformat(sample_queue_item.next_attempt_at)
+    assert 25 <= (next_attempt - datetime.now()).total_seconds() <= 60
+    assert claim_next_queue_item(session) is None
+    
+    sample_queue_item.next_attempt_at = "2026-01-01T00:00:00"
+    session.add(sample_queue_item)
+    session.commit()
+    assert claim_next_queue_item(session).id == sample_queue_item.id
+
+
+def test_process_queue_item_permanent_error_skips_retries(session: Session, sample_queue_item: QueueItem):
+    """Test that a page without a download form fails straight away"""
+    session.add(sample_queue_item)
+    session.commit()
+    
+    from utils.download_utils import NoDownloadForm
+    
+    with patch('worker.download_book', side_effect=NoDownloadForm("Could not find download form on page")):
+        process_queue_item(sample_queue_item, session)
+    
+    assert sample_queue_item.status == QueueStatus.FAILED.value
+    assert sample_queue_item.retry_count == 1
+    assert sample_queue_item.next_attempt_at is None
+    assert "without retrying" in sample_queue_item.error_message
+
+
+def test_retry_delay_grows_exponentially_with_jitter(monkeypatch):
+    """Test that retry delays double per attempt, stay within the cap and back off further when throttled"""
+    monkeypatch.setattr(worker_module, "RETRY_BASE_DELAY", 10)
+    monkeypatch.setattr(worker_module, "RETRY_MAX_DELAY", 100)
+    
+    for retry_count, ceiling in [(1, 10), (2, 20), (3, 40), (5, 100), (10, 100)]:
+        delay = worker_module.retry_delay(retry_count)
+        assert ceiling / 2 <= delay <= ceiling
+    assert 20 <= worker_module.retry_delay(0, worker_module.THROTTLED) <= 40
+
+
+def test_process_queue_item_throttling_does_not_use_retries(session: Session, sample_queue_item: QueueItem):
+    """Test that a throttled attempt is rescheduled after the host's pause without counting as a retry"""
+    from utils.rate_limiter import HostThrottled
+    
+    sample_queue_item.retry_count = MAX_RETRY_COUNT - 1
+    session.add(sample_queue_item)
+    session.commit()
+    
+    with patch('worker.download_book', side_effect=HostThrottled("429 from example.com", pause=600)):
+        process_queue_item(sample_queue_item, session)
+    
+    assert sample_queue_item.status == QueueStatus.PENDING.value
+    assert sample_queue_item.retry_count == MAX_RETRY_COUNT - 1
+    next_attempt = datetime.fromisoformat(sample_queue_item.next_attempt_at)
+    assert (next_attempt - datetime.now()).total_seconds() >= 590
+
+
+@pytest.mark.parametrize("retry_count, status, part_kept", [
+    (0, QueueStatus.PENDING.value, True),
+    (MAX_RETRY_COUNT - 1, QueueStatus.FAILED.value, False),
+])
+def test_process_queue_item_discards_part_file_only_when_failed(session: Session, sample_queue_item: QueueItem, tmp_path, retry_count, status, part_kept):
+    """Test that a partial download is kept for a retry but deleted once the item fails"""
+    filepath = str(tmp_path / "book.epub")
+    for path in (filepath + ".part", filepath + ".part.json"):
+        with open(path, "w") as file:
+            file.write("partial")
+    error = ConnectionError("Connection reset")
+    error.partial_path = filepath
+    sample_queue_item.retry_count = retry_count
+    session.add(sample_queue_item)
+    session.commit()
+    
+    with patch('worker.download_book', side_effect=error):
+        process_queue_item(sample_queue_item, session)
+    
+    assert sample_queue_item.status == status
+    assert os.path.exists(filepath + ".part") == part_kept
+    assert os.path.exists(filepath + ".part.json") == part_kept
+
+
+def book_page_client(status_code, body):
+    """HTTP client stand-in whose every request returns the given status and body"""
+    import requests
+    
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body.encode()
+    response.url = "https://example.com/book"
+    client = Mock(timeout=(10, 60))
+    client.request.return_value = response
+    return client
+
+
+@pytest.mark.parametrize("status_code, body, status, retry_count", [
+    (502, "<html><h1>502 Bad Gateway</h1></html>", QueueStatus.PENDING.value, 1),
+    (404, "<html><h1>Not Found</h1></html>", QueueStatus.FAILED.value, 1),
+    (200, "<html><p>This book has no downloads</p></html>", QueueStatus.FAILED.value, 1),
+])
+def test_download_failures_are_classified(session: Session, sample_queue_item: QueueItem, tmp_path, status_code, body, status, retry_count):
+    """Test that error pages are retried while missing books and formless pages fail straight away"""
+    from utils import download_utils
+    
+    session.add(sample_queue_item)
+    session.commit()
+    
+    with patch.object(download_utils, 'http_client', book_page_client(status_code, body)), \
+         patch.object(download_utils, 'RETRY_DELAY', 0):
+        process_queue_item(sample_queue_item, session)
+    
+    assert sample_queue_item.status == status
+    assert sample_queue_item.retry_count == retry_count
+    assert (sample_queue_item.next_attempt_at is not None) == (status == QueueStatus.PENDING.value)
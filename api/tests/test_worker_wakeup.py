@@ -0,0 +1,45 @@
+import time
+import threading
+from sqlmodel import Session, select
+
+from models import WorkerEndpoint
+from utils.worker_wakeup import WakeupListener, notify_workers
+
+
+def test_notify_workers_wakes_a_waiting_listener(session: Session):
+    """Test that a wake-up datagram releases a waiting slot within milliseconds"""
+    listener = WakeupListener(session.get_bind()).start()
+    try:
+        assert session.exec(select(WorkerEndpoint.port)).all() == [listener.port]
+        generation = listener.generation
+        
+        threading.Timer(0.05, notify_workers, args=(session,)).start()
+        started = time.monotonic()
+        assert listener.wait(generation, timeout=5) is True
+        assert time.monotonic() - started < 1
+    finally:
+        listener.close()
+    
+    session.expire_all()
+    assert session.exec(select(WorkerEndpoint)).all() == []
+
+
+def test_wakeup_before_wait_is_not_lost(session: Session):
+    """Test that a wake-up sent after reading the generation still ends the next wait"""
+    listener = WakeupListener(session.get_bind()).start()
+    try:
+        generation = listener.generation
+        notify_workers(session)
+        assert listener.wait(generation, timeout=5) is True
+        
+        assert listener.wait(listener.generation, timeout=0.05) is False
+    finally:
+        listener.close()
+
+
+def test_notify_workers_ignores_stale_endpoints(session: Session):
+    """Test that a row left by a worker that is gone does not break enqueueing"""
+    session.add(WorkerEndpoint(port=9, pid=0))
+    session.commit()
+    
+    notify_workers(session)
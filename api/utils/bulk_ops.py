@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlmodel import Session, select, delete, insert, func
+from sqlalchemy import literal, literal_column
+from models import Link, QueueItem, bump_change_counter, prune_queue_tombstones
+from constants import QueueStatus
+
+# Rows per IN lookup / multi-row INSERT, well under SQLite's bound parameter limit
+ENQUEUE_BATCH_SIZE = 1000
+
+ACTIVE_QUEUE_STATUSES = [QueueStatus.PENDING.value, QueueStatus.IN_PROGRESS.value]
+
+
+def bulk_delete(session: Session, model, *criteria, batch_size: Optional[int] = None) -> int:
+    """
+    Delete every `model` row matching `criteria` with set-based DELETE statements
+    and return the number of rows removed. Rows never pass through Python.
+    
+    With `batch_size`, rows are removed `batch_size` at a time and each batch is
+    committed on its own, so a huge delete never holds the write lock for long and
+    other processes can write between batches.
+    
+    Deleting links bumps the "links" change counter once per statement, and
+    deleting queue items prunes old queue tombstones once per statement.
+    """
+    if not batch_size:
+        # No session synchronisation: otherwise the ORM fetches every deleted key back
+        statement = delete(model).where(*criteria).execution_options(synchronize_session=False)
+        result = session.exec(statement)
+        _after_delete(session, model, result.rowcount)
+        session.commit()
+        return result.rowcount
+    
+    table = model.__table__
+    rowid = literal_column(f"{table.name}.rowid")
+    batch = select(rowid).select_from(table).where(*criteria).limit(batch_size).scalar_subquery().correlate(None)
+    
+    deleted = 0
+    while True:
+        result = session.exec(delete(table).where(rowid.in_(batch)))
+        _after_delete(session, model, result.rowcount)
+        session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def _after_delete(session: Session, model, rowcount: int):
+    if not rowcount:
+        return
+    if model is Link:
+        bump_change_counter(session, "links")
+    elif model is QueueItem:
+        prune_queue_tombstones(session)
+
+
+def fully_downloaded_authors():
+    """
+    Authors whose every book is downloaded, as (slug, display name, book count)
+    rows. Grouped in SQL over the covering ix_links_author_downloaded index.
+    """
+    return (
+        select(Link.author, func.max(Link.book_author), func.count())
+        .where(Link.author.is_not(None))
+        .group_by(Link.author)
+        .having(func.min(Link.downloaded) == 1, func.max(Link.downloaded) == 1)
+    )
+
+
+def enqueue_books(session: Session, books: List[dict]) -> List[dict]:
+    """
+    Add `books` ({bookUrl, bookTitle, bookAuthor}) to the download queue and
+    return one result per book, in request order. Books already pending or in
+    progress (or repeated within the request) are skipped with the existing
+    queue id. Existing entries are found with IN lookups and new rows are
+    inserted with multi-row INSERT ... RETURNING, ENQUEUE_BATCH_SIZE at a time.
+    """
+    urls = list(dict.fromkeys(book.get("bookUrl") for book in books if book.get("bookUrl")))
+    
+    queued = {}
+    for start in range(0, len(urls), ENQUEUE_BATCH_SIZE):
+        rows = session.exec(
+            select(QueueItem.book_url, func.min(QueueItem.id))
+            .where(
+                QueueItem.book_url.in_(urls[start:start + ENQUEUE_BATCH_SIZE]),
+                QueueItem.status.in_(ACTIVE_QUEUE_STATUSES)
+            )
+            .group_by(QueueItem.book_url)
+        ).all()
+        queued.update(rows)
+    
+    # Plain rows rather than QueueItem instances: model construction dominates large batches.
+    # Rows share one created_at; the worker's (status, created_at) index keeps them in id order.
+    created_at = datetime.now().isoformat()
+    new_items = {}
+    for book in books:
+        book_url = book.get("bookUrl")
+        if book_url and book_url not in queued and book_url not in new_items:
+            new_items[book_url] = {
+                "book_title": book.get("bookTitle", "Unknown Book"),
+                "book_url": book_url,
+                "book_author": book.get("bookAuthor"),
+                "created_at": created_at,
+                "retry_count": 0,
+                "status": QueueStatus.PENDING.value,
+            }
+    
+    added = {}
+    if new_items:
+        # executemany with RETURNING: SQLAlchemy sends these as multi-row INSERT statements
+        statement = insert(QueueItem).returning(QueueItem.book_url, QueueItem.id, sort_by_parameter_order=True)
+        added.update(session.exec(statement, params=list(new_items.values())).all())
+    session.commit()
+    
+    results = []
+    reported = set()
+    for book in books:
+        book_url = book.get("bookUrl")
+        result = {"bookUrl": book_url, "bookTitle": book.get("bookTitle", "Unknown Book")}
+        
+        if not book_url:
+            result.update(success=False, error="bookUrl is required")
+        elif book_url in added and book_url not in reported:
+            result.update(success=True, queue_id=added[book_url], message="Book added to download queue")
+        else:
+            queue_id = queued[book_url] if book_url in queued else added[book_url]
+            result.update(success=True, skipped=True, queue_id=queue_id, message="Book already in queue")
+        reported.add(book_url)
+        results.append(result)
+    return results
+
+
+def enqueue_links(session: Session, *criteria) -> tuple:
+    """
+    Queue every Link matching `criteria` with one INSERT ... SELECT, skipping
+    books already pending or in progress, in scrape order. Links never pass
+    through Python. Returns (matching books, books added).
+    """
+    already_queued = select(QueueItem.id).where(
+        QueueItem.book_url == Link.book_url,
+        QueueItem.status.in_(ACTIVE_QUEUE_STATUSES)
+    ).exists()
+    matching = (Link.book_url.is_not(None), *criteria)
+    
+    matched = session.exec(select(func.count(func.distinct(Link.book_url))).where(*matching)).one()
+    
+    source = (
+        select(
+            func.coalesce(func.min(Link.title), "Unknown Book"),
+            Link.book_url,
+            func.min(Link.book_author),
+            literal(datetime.now().isoformat()),
+            literal(0),
+            literal(QueueStatus.PENDING.value),
+        )
+        .where(*matching, ~already_queued)
+        .group_by(Link.book_url)
+        .order_by(func.min(literal_column("links.rowid")))
+    )
+    statement = insert(QueueItem).from_select(
+        ["book_title", "book_url", "book_author", "created_at", "retry_count", "status"], source
+    )
+    added = session.exec(statement).rowcount
+    session.commit()
+    return matched, added
@@ -0,0 +1,79 @@
+"""
+Cookies that outlive a process.
+
+Cloudflare hands out a `cf_clearance` cookie once a client has passed its
+challenge. A fresh cloudscraper session does not have it, so every new process
+(each uvicorn reload, worker restart or scraper_cli run) used to pay for the
+challenge again on its first requests. CookieStore keeps persistent cookies in
+the `http_cookies` table: HttpClient loads them into each session it creates,
+saves them whenever a response changes them, and reloads them into its other
+sessions when the "cookies" change counter shows another session or process
+saved new ones. Session cookies (no expiry) are not stored, and expired cookies
+are neither loaded nor kept.
+"""
+import time
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from requests.cookies import create_cookie
+from models import HttpCookie, ChangeCounter, bump_change_counter
+
+
+def persistent_cookies(jar) -> frozenset:
+    """Snapshot of the unexpired cookies in `jar` that have an expiry date"""
+    now = time.time()
+    return frozenset(
+        (cookie.domain, cookie.path, cookie.name, cookie.value, cookie.expires, bool(cookie.secure))
+        for cookie in jar
+        if cookie.expires is not None and cookie.expires > now
+    )
+
+
+class CookieStore:
+    def __init__(self, engine):
+        self.engine = engine
+    
+    def version(self) -> int:
+        with Session(self.engine) as session:
+            version = session.exec(select(ChangeCounter.version).where(ChangeCounter.name == "cookies")).first()
+        return version or 0
+    
+    def load(self, jar) -> int:
+        """Add every unexpired stored cookie to `jar`. Returns the store version that was read."""
+        with Session(self.engine) as session:
+            version = session.exec(select(ChangeCounter.version).where(ChangeCounter.name == "cookies")).first()
+            cookies = session.exec(select(HttpCookie).where(HttpCookie.expires > time.time())).all()
+        
+        for cookie in cookies:
+            jar.set_cookie(create_cookie(
+                cookie.name,
+                cookie.value,
+                domain=cookie.domain,
+                path=cookie.path,
+                expires=cookie.expires,
+                secure=bool(cookie.secure)
+            ))
+        return version or 0
+    
+    def save(self, cookies: frozenset) -> int:
+        """Upsert a persistent_cookies() snapshot, drop expired rows and return the new store version"""
+        rows = [
+            {'domain': domain, 'path': path, 'name': name, 'value': value, 'expires': int(expires), 'secure': int(secure)}
+            for domain, path, name, value, expires, secure in cookies
+        ]
+        with Session(self.engine) as session:
+            if rows:
+                statement = sqlite_insert(HttpCookie).values(rows)
+                session.exec(statement.on_conflict_do_update(
+                    index_elements=['domain', 'path', 'name'],
+                    set_={
+                        'value': statement.excluded.value,
+                        'expires': statement.excluded.expires,
+                        'secure': statement.excluded.secure
+                    }
+                ))
+            session.exec(delete(HttpCookie).where(HttpCookie.expires <= time.time()))
+            
+            version = bump_change_counter(session, "cookies")
+            session.commit()
+        return version
@@ -0,0 +1,51 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """A queue item or scrape ran out of its total time budget"""
+    pass
+
+
+class Deadline:
+    """
+    Total time budget for a multi-request operation, such as downloading one queue
+    item (book page, form submit, redirect and file) or scraping one author.
+    Each request's connect/read timeouts are capped at the time left, retries
+    stop waiting once it runs out, and check() raises DeadlineExceeded from
+    between stages and chunks. `seconds=None` means no limit.
+    """
+    
+    def __init__(self, seconds: Optional[float] = None, description: str = "operation"):
+        self.seconds = seconds
+        self.description = description
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+    
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    def check(self, stage: str):
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f"{self.description} exceeded its {self.seconds:.0f}s deadline during {stage}")
+    
+    def timeout(self, default):
+        """A requests `timeout` (number or (connect, read) pair) capped at the time left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        # requests rejects a zero timeout
+        remaining = max(remaining, 0.001)
+        if isinstance(default, tuple):
+            return tuple(min(value, remaining) for value in default)
+        return min(default, remaining)
+    
+    def sleep(self, seconds: float, stage: str):
+        """Sleep before a retry, failing straight away if the budget would run out first"""
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            raise DeadlineExceeded(
+                f"{self.description} exceeded its {self.seconds:.0f}s deadline waiting to retry {stage}"
+            )
+        time.sleep(seconds)
@@ -1,18 +1,39 @@
+import os
+import json
 import time
-import cloudscraper
 from os.path import join, expanduser
 from os import makedirs
-from bs4 import BeautifulSoup
-from typing import Optional
-headers = {'Accept-Encoding': 'identity', 'User-Agent': 'Defined'}
-scraper = cloudscraper.create_scraper()
+from typing import Callable, Optional
+import requests
+from utils.http_cache import cached_fetch
+from utils.http_client import http_client
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.html_parser import make_soup
 
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".json"
 
 
+class NoDownloadForm(ValueError):
+    """The book page has no usable epub/pdf download form, so retrying cannot help"""
+    pass
 
-def download_book(book_url: str, book_title: str = "Unknown Book", custom_destination: Optional[str] = None):
+
+def download_book(
+    book_url: str,
+    book_title: str = "Unknown Book",
+    custom_destination: Optional[str] = None,
+    on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    deadline: Optional[Deadline] = None
+):
+    """
+    Download a book: fetch its page, submit the download form, follow the
+    redirect and stream the file. `deadline` bounds all of those stages together.
+    """
+    deadline = deadline or Deadline()
     if custom_destination:
         destination = custom_destination
     else:
@@ -21,20 +42,22 @@ def download_book(book_url: str, book_title: str = "Unknown Book", custom_destin
     makedirs(destination, exist_ok=True)
     print(f"Fetching book page: {book_url}")
     
-    response = _fetch_with_retry(book_url, "book page")
+    response = _fetch_with_retry(book_url, "book page", deadline=deadline)
+    # An error page (e.g. a 502 from a proxy) has no form either; report the status instead
+    response.raise_for_status()
     
-    html = BeautifulSoup(response.text, "html.parser")
+    html = make_soup(response.text)
     forms = html.find_all('form', {'action': lambda x: x and 'Fetching_Resource.php' in x})
     
     if not forms:
         print("No download forms found")
-        raise ValueError("Could not find download form on page")
+        raise NoDownloadForm("Could not find download form on page")
     
     selected_form = _select_download_form(forms)
     
     if not selected_form:
         print("No valid download form found")
-        raise ValueError("Could not find epub or pdf download form")
+        raise NoDownloadForm("Could not find epub or pdf download form")
     
     form_action, server_id, filename = _extract_form_data(selected_form)
     
@@ -45,50 +68,249 @@ def download_book(book_url: str, book_title: str = "Unknown Book", custom_destin
     form_data = {'id': server_id, 'filename': filename}
     print(f"Submitting form to download file...")
     
-    download_response = _submit_form_with_retry(form_action, form_data)
+    download_response = _submit_form_with_retry(form_action, form_data, deadline)
+    download_response.raise_for_status()
     
     actual_download_url = _parse_redirect_url(download_response.text)
     
     print(f"Downloading file from: {actual_download_url}")
     
-    file_response = _fetch_with_retry(actual_download_url, "file")
-    
     filepath = join(destination, filename)
-    with open(filepath, 'wb') as file:
-        file.write(file_response.content)
+    try:
+        bytes_written, elapsed = _stream_to_file(actual_download_url, filepath, on_progress, deadline)
+    except Exception as e:
+        # Lets the caller discard the partial file once it gives up on the book
+        e.partial_path = filepath
+        raise
+    throughput = bytes_written / elapsed if elapsed > 0 else 0.0
     
     print(f"Successfully downloaded to: {filepath}")
+    print(f"Transferred {bytes_written} bytes in {elapsed:.2f}s ({throughput / 1024:.1f} KiB/s)")
     
-    return {"filename": filename, "destination": destination, "filepath": filepath}
+    return {
+        "filename": filename,
+        "destination": destination,
+        "filepath": filepath,
+        "bytes": bytes_written,
+        "elapsed_seconds": elapsed,
+        "throughput_bps": throughput
+    }
 
 
-def _fetch_with_retry(url: str, description: str = "resource"):
+def _stream_to_file(
+    url: str,
+    filepath: str,
+    on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    deadline: Optional[Deadline] = None
+):
+    """
+    Stream a file to disk in CHUNK_SIZE pieces. The body is written to
+    `<filepath>.part` and renamed into place once complete. A small sidecar
+    (`<filepath>.part.json`) records the URL, expected length and validator, so
+    retries here - and later attempts of a requeued item - resume with a Range
+    request instead of starting again from byte zero. `on_progress(bytes_on_disk,
+    expected_length)` is called after every chunk. When `deadline` runs out the
+    partial file is kept, so a requeued item resumes where it stopped; a 4xx for
+    the file deletes it, since no later attempt can resume it.
+    Returns (bytes_transferred, elapsed_seconds).
+    """
+    deadline = deadline or Deadline()
+    start = time.monotonic()
+    part_path = filepath + PART_SUFFIX
+    stats = {'bytes': 0}
+    
     for attempt in range(MAX_RETRIES):
         try:
-            response = scraper.get(url, headers=headers)
+            _transfer_part(url, part_path, stats, on_progress, deadline)
+            break
+        except DeadlineExceeded:
+            raise
+        except OSError as e:
+            # A 4xx for the file itself will not change on retry
+            if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500:
+                discard_partial_download(filepath)
+                raise
+            if attempt < MAX_RETRIES - 1:
+                wait_time = RETRY_DELAY * (attempt + 1)
+                print(f"Transfer interrupted (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                print(f"Resuming in {wait_time} seconds...")
+                deadline.sleep(wait_time, "file transfer")
+            else:
+                print(f"Failed to download file after {MAX_RETRIES} attempts, keeping partial file for resume")
+                raise
+    
+    os.replace(part_path, filepath)
+    _remove_part_state(part_path)
+    
+    return stats['bytes'], time.monotonic() - start
+
+
+def discard_partial_download(filepath: str):
+    """Delete the `.part` file and sidecar left behind by an unfinished download of `filepath`"""
+    part_path = filepath + PART_SUFFIX
+    _remove_part_state(part_path)
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+
+def _transfer_part(url: str, part_path: str, stats: dict, on_progress=None, deadline: Optional[Deadline] = None):
+    """
+    Make one attempt at completing `part_path`, resuming from its current size when
+    the sidecar says it belongs to the same file. Falls back to a full fetch when
+    the server ignores the Range header. Bytes received are added to stats['bytes'].
+    The request is sent once; _stream_to_file's loop does the retrying.
+    """
+    state = _load_part_state(part_path)
+    offset = 0
+    if state and os.path.exists(part_path) and (state.get('url') == url or state.get('validator')):
+        offset = os.path.getsize(part_path)
+    
+    expected_length = state.get('expected_length') if state else None
+    if offset and expected_length and offset >= expected_length:
+        print(f"Partial file already complete ({offset} bytes)")
+        return
+    
+    range_headers = {}
+    if offset:
+        range_headers['Range'] = f"bytes={offset}-"
+        if state.get('validator'):
+            range_headers['If-Range'] = state['validator']
+        print(f"Resuming download at byte {offset}")
+    
+    deadline = deadline or Deadline()
+    response = _fetch_with_retry(url, "file", stream=True, extra_headers=range_headers, deadline=deadline, attempts=1)
+    bytes_received = 0
+    
+    try:
+        if offset and response.status_code == 416:
+            print("Server rejected resume range, restarting download")
+            _remove_part_state(part_path)
+            os.remove(part_path)
+            raise IOError("Requested range not satisfiable")
+        
+        response.raise_for_status()
+        
+        if offset and response.status_code != 206:
+            print("Server ignored Range request, restarting from byte 0")
+            offset = 0
+        
+        expected_length = _expected_length(response, offset)
+        _save_part_state(part_path, {
+            'url': url,
+            'expected_length': expected_length,
+            'validator': _validator(response)
+        })
+        
+        with open(part_path, 'ab' if offset else 'wb') as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    file.write(chunk)
+                    bytes_received += len(chunk)
+                    stats['bytes'] += len(chunk)
+                    if on_progress:
+                        on_progress(offset + bytes_received, expected_length)
+                    deadline.check("file transfer")
+    finally:
+        response.close()
+    
+    size = offset + bytes_received
+    if expected_length is not None and size < expected_length:
+        raise IOError(f"Transfer incomplete: got {size} of {expected_length} bytes")
+
+
+def _expected_length(response, offset: int) -> Optional[int]:
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+
+def _validator(response) -> Optional[str]:
+    """Strong ETag or Last-Modified, usable in an If-Range header"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def _load_part_state(part_path: str) -> Optional[dict]:
+    try:
+        with open(part_path + STATE_SUFFIX) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_part_state(part_path: str, state: dict):
+    temp_path = part_path + STATE_SUFFIX + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp_path, part_path + STATE_SUFFIX)
+
+
+def _remove_part_state(part_path: str):
+    if os.path.exists(part_path + STATE_SUFFIX):
+        os.remove(part_path + STATE_SUFFIX)
+
+
+def _fetch_with_retry(
+    url: str,
+    description: str = "resource",
+    stream: bool = False,
+    extra_headers: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    attempts: int = MAX_RETRIES
+):
+    deadline = deadline or Deadline()
+    for attempt in range(attempts):
+        deadline.check(description)
+        try:
+            response = cached_fetch(
+                http_client, "GET", url,
+                headers=extra_headers,
+                stream=stream,
+                deadline=deadline
+            )
             return response
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            if attempt < MAX_RETRIES - 1:
+            if attempt < attempts - 1:
                 wait_time = RETRY_DELAY * (attempt + 1)
-                print(f"Connection error fetching {description} (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                print(f"Connection error fetching {description} (attempt {attempt + 1}/{attempts}): {e}")
                 print(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
+                deadline.sleep(wait_time, description)
             else:
-                print(f"Failed to fetch {description} after {MAX_RETRIES} attempts")
+                print(f"Failed to fetch {description} after {attempts} attempts")
                 raise
 
 
-def _submit_form_with_retry(form_action: str, form_data: dict):
+def _submit_form_with_retry(form_action: str, form_data: dict, deadline: Optional[Deadline] = None):
+    deadline = deadline or Deadline()
     for attempt in range(MAX_RETRIES):
+        deadline.check("form submit")
         try:
-            response = scraper.post(form_action, data=form_data, headers=headers, allow_redirects=True)
+            response = cached_fetch(
+                http_client, "POST", form_action,
+                data=form_data,
+                allow_redirects=True,
+                deadline=deadline
+            )
             return response
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             if attempt < MAX_RETRIES - 1:
                 wait_time = RETRY_DELAY * (attempt + 1)
                 print(f"Connection error submitting form (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
                 print(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
+                deadline.sleep(wait_time, "form submit")
             else:
                 print(f"Failed to submit form after {MAX_RETRIES} attempts")
                 raise
@@ -121,7 +343,7 @@ def _extract_form_data(form):
     
     if not form_action or not form_id or not form_filename:
         print("Form missing required fields")
-        raise ValueError("Download form is incomplete")
+        raise NoDownloadForm("Download form is incomplete")
     
     server_id = form_id.get('value')
     filename = form_filename.get('value')
@@ -130,7 +352,7 @@ def _extract_form_data(form):
 
 
 def _parse_redirect_url(html_content: str) -> str:
-    redirect_html = BeautifulSoup(html_content, "html.parser")
+    redirect_html = make_soup(html_content)
     meta_refresh = redirect_html.find('meta', attrs={'http-equiv': 'Refresh'})
     
     if not meta_refresh:
@@ -0,0 +1,23 @@
+import os
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+# BeautifulSoup tree builder used for every page we parse: "html.parser" (built in),
+# or "lxml" / "html5lib" when those packages are installed. lxml is several times faster.
+HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser")
+
+
+def resolve_parser(name: str) -> str:
+    """Return `name` if its backend is installed, otherwise fall back to html.parser"""
+    if builder_registry.lookup(name) is None:
+        print(f"HTML parser '{name}' is not available, falling back to html.parser")
+        return "html.parser"
+    return name
+
+
+parser_backend = resolve_parser(HTML_PARSER)
+
+
+def make_soup(markup) -> BeautifulSoup:
+    """Parse markup with the configured backend"""
+    return BeautifulSoup(markup, parser_backend)
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional
+from urllib.parse import urlencode
+from requests.structures import CaseInsensitiveDict
+from models import DB_DIR
+from utils.rate_limiter import host_limiter, throttle_pause, HostThrottled
+from utils.deadline import Deadline
+
+# off:    no caching, every request goes to the network
+# on:     serve fresh cached pages, cache new page responses (file downloads bypass the cache)
+# record: like "on", but also caches streamed file downloads so the whole pipeline can be replayed
+# replay: serve only from the cache (ignoring TTL); a miss raises CacheMiss instead of hitting the network
+HTTP_CACHE_MODE = os.environ.get("HTTP_CACHE_MODE", "off")
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(DB_DIR, "http_cache"))
+HTTP_CACHE_TTL = int(os.environ.get("HTTP_CACHE_TTL", 6 * 60 * 60))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+CACHE_MODES = ("off", "on", "record", "replay")
+
+
+class CacheMiss(Exception):
+    """Raised in replay mode when a request has no cached response"""
+    pass
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scraper and downloader use, served from disk"""
+    
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = True
+    
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get('Content-Type', '')
+        encoding = 'utf-8'
+        if 'charset=' in content_type:
+            encoding = content_type.split('charset=')[1].split(';')[0].strip()
+        return self.content.decode(encoding, errors='replace')
+    
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+    
+    def raise_for_status(self):
+        if not self.ok:
+            raise IOError(f"{self.status_code} error for cached response: {self.url}")
+    
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+    
+    def close(self):
+        pass
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk response cache. Each entry is stored as
+    `<key>.body` plus `<key>.json` metadata, where the key is a hash of the
+    method, URL and form body. Entries expire after `ttl` seconds and the least
+    recently used ones are evicted once the cache grows past `max_bytes`.
+    """
+    
+    def __init__(self, directory: str, ttl: int, max_bytes: int, mode: str = "on"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown HTTP cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+    
+    @staticmethod
+    def key(method: str, url: str, data: Optional[dict] = None) -> str:
+        body = urlencode(sorted(data.items())) if data else ''
+        return hashlib.sha256(f"{method.upper()}\n{url}\n{body}".encode()).hexdigest()
+    
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CachedResponse]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            if not allow_stale and time.time() - meta['stored_at'] > self.ttl:
+                return None
+            with open(body_path, 'rb') as file:
+                content = file.read()
+            # Touch the entry so eviction treats it as recently used
+            os.utime(body_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        return CachedResponse(meta['url'], meta['status_code'], meta['headers'], content)
+    
+    def put(self, key: str, url: str, status_code: int, headers: dict, content: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, body_path = self._paths(key)
+        meta = {
+            'url': url,
+            'status_code': status_code,
+            'headers': dict(headers),
+            'stored_at': time.time()
+        }
+        
+        _write_atomic(body_path, content)
+        _write_atomic(meta_path, json.dumps(meta).encode())
+        self._evict()
+    
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".body"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len(".body")]))
+            total += stat.st_size
+        
+        entries.sort()
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+
+def _write_atomic(path: str, content: bytes):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+response_cache = ResponseCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_MODE)
+
+
+def paced_request(session, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs):
+    """
+    Send a request through the shared per-host rate limiter and report the
+    outcome back to it. Throttling responses raise HostThrottled, so the callers'
+    retry loops try again once the host's pause is over. With a `deadline`, the
+    wait for a request slot counts against it and the request's timeout is
+    capped at whatever is left once the slot arrives.
+    """
+    host_limiter.acquire(url, deadline)
+    if deadline:
+        kwargs['timeout'] = deadline.timeout(kwargs.get('timeout', session.timeout))
+    try:
+        response = session.request(method, url, **kwargs)
+    except Exception:
+        host_limiter.record_error(url)
+        raise
+    
+    pause = throttle_pause(response)
+    if pause is not None:
+        host_limiter.record_throttled(url, pause)
+        response.close()
+        raise HostThrottled(f"{response.status_code} from {host_limiter.host(url)}, backing off for {pause:.0f}s", pause)
+    if response.status_code >= 500:
+        host_limiter.record_error(url)
+    else:
+        host_limiter.record_success(url)
+    return response
+
+
+def cached_fetch(
+    session,
+    method: str,
+    url: str,
+    data: Optional[dict] = None,
+    cache: ResponseCache = None,
+    deadline: Optional[Deadline] = None,
+    **kwargs
+):
+    """
+    Shared fetch path for the scraper and downloader. Sends `method url` through
+    `session`, paced per host, unless the response cache can answer it. Only 200
+    responses are stored. `deadline` is passed on to paced_request.
+    """
+    cache = cache or response_cache
+    stream = kwargs.get('stream', False)
+    
+    if cache.mode == "off" or (stream and cache.mode == "on"):
+        return paced_request(session, method, url, data=data, deadline=deadline, **kwargs)
+    
+    key = cache.key(method, url, data)
+    cached = cache.get(key, allow_stale=cache.mode == "replay")
+    if cached:
+        return cached
+    if cache.mode == "replay":
+        raise CacheMiss(f"No cached response for {method.upper()} {url}")
+    
+    response = paced_request(session, method, url, data=data, deadline=deadline, **kwargs)
+    if response.status_code == 200:
+        cache.put(key, response.url, response.status_code, response.headers, response.content)
+    return response
@@ -0,0 +1,115 @@
+"""
+The HTTP client every scrape and download goes through.
+
+cloudscraper sessions are expensive to create (each one solves its own
+Cloudflare challenge and opens its own keep-alive connections) and are not safe
+to use from two threads at once. HttpClient keeps a pool of them: a request
+borrows an idle session, or creates one if every session is busy, and returns
+it afterwards. Connections and challenge cookies are reused across requests,
+and the number of live sessions follows the number of threads making requests
+(worker slots plus scrape threads), up to HTTP_POOL_SIZE idle ones. A streamed
+response holds its own pooled connection, so its session goes back to the pool
+before the body is read. Persistent cookies are shared with every other
+session and process through utils/cookie_store.py.
+"""
+import os
+import queue
+import threading
+from typing import Optional
+import cloudscraper
+from models import engine
+from utils.cookie_store import CookieStore, persistent_cookies
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 8))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 60))
+
+DEFAULT_HEADERS = {'Accept-Encoding': 'identity', 'User-Agent': 'Defined'}
+
+
+class HttpClient:
+    """Pooled cloudscraper sessions with shared default headers and timeouts"""
+    
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        cookie_store: Optional[CookieStore] = None
+    ):
+        self.timeout = timeout
+        self.cookie_store = cookie_store
+        self.idle = queue.LifoQueue(maxsize=pool_size)
+        self.sessions_created = 0
+        self.requests_sent = 0
+        self._lock = threading.Lock()
+    
+    def request(self, method: str, url: str, **kwargs):
+        """Send a request on a pooled session. Accepts the same arguments as requests.Session.request."""
+        kwargs.setdefault('timeout', self.timeout)
+        session = self._borrow()
+        self._load_cookies(session)
+        try:
+            response = session.request(method, url, **kwargs)
+        finally:
+            self._save_cookies(session)
+            self._return(session)
+        
+        with self._lock:
+            self.requests_sent += 1
+        return response
+    
+    def _borrow(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self._create_session()
+    
+    def _return(self, session):
+        try:
+            self.idle.put_nowait(session)
+        except queue.Full:
+            session.close()
+    
+    def _load_cookies(self, session):
+        """Bring the session up to date with cookies saved by other sessions or processes"""
+        if not self.cookie_store:
+            return
+        try:
+            version = self.cookie_store.version()
+            if version != session.cookie_version:
+                session.cookie_version = self.cookie_store.load(session.cookies)
+                session.saved_cookies = persistent_cookies(session.cookies)
+        except Exception as e:
+            print(f"Could not load stored cookies: {e}")
+    
+    def _save_cookies(self, session):
+        """Store cookies the last response set or changed, e.g. a new Cloudflare clearance"""
+        if not self.cookie_store:
+            return
+        cookies = persistent_cookies(session.cookies)
+        if cookies == session.saved_cookies:
+            return
+        try:
+            session.cookie_version = self.cookie_store.save(cookies - session.saved_cookies)
+            session.saved_cookies = cookies
+        except Exception as e:
+            print(f"Could not store cookies: {e}")
+    
+    def _create_session(self):
+        session = cloudscraper.create_scraper()
+        session.headers.update(DEFAULT_HEADERS)
+        session.cookie_version = None
+        session.saved_cookies = frozenset()
+        with self._lock:
+            self.sessions_created += 1
+        return session
+    
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+http_client = HttpClient(cookie_store=CookieStore(engine))
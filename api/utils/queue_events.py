@@ -0,0 +1,174 @@
+"""
+Push queue changes to API clients (GET /queue/stream).
+
+The worker runs in its own process, so the API server is never told when it
+writes. While at least one client is subscribed, a single watcher reads SQLite's
+`PRAGMA data_version` on a dedicated connection every QUEUE_WATCH_INTERVAL
+seconds. The counter only moves when another connection commits and costs no
+I/O to read. When it moves, the watcher reads the rows and tombstones whose
+change version (see models.QUEUE_VERSION_TRIGGERS) is newer than the last one
+it saw, and broadcasts them. The watcher stops when the last client
+disconnects, so an idle server does no work.
+"""
+import os
+import json
+import asyncio
+from sqlmodel import Session, select
+from models import QueueItem, QueueTombstone, ChangeCounter, QUEUE_CHANGE_RETENTION
+
+QUEUE_WATCH_INTERVAL = float(os.environ.get("QUEUE_WATCH_INTERVAL", 0.2))
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def queue_item_json(item: QueueItem) -> dict:
+    return {
+        "id": item.id,
+        "bookTitle": item.book_title,
+        "bookUrl": item.book_url,
+        "bookAuthor": item.book_author,
+        "status": item.status,
+        "retryCount": item.retry_count,
+        "errorMessage": item.error_message,
+        "nextAttemptAt": item.next_attempt_at,
+        "createdAt": item.created_at,
+        "startedAt": item.started_at,
+        "completedAt": item.completed_at,
+        "bytesDownloaded": item.bytes_downloaded,
+        "totalBytes": item.total_bytes,
+        "version": item.version,
+    }
+
+
+def current_queue_version(session: Session) -> int:
+    version = session.exec(select(ChangeCounter.version).where(ChangeCounter.name == "queue")).first()
+    return version or 0
+
+
+def queue_changes_since(session: Session, since: int):
+    """
+    Queue changes after version `since`, as (version, items, deleted ids). items
+    and deleted are None when `since` is older than the retained tombstones (or
+    newer than the database, e.g. after it was replaced): reload the whole queue.
+    """
+    version = current_queue_version(session)
+    if since > version or since < version - QUEUE_CHANGE_RETENTION:
+        return version, None, None
+    
+    items = session.exec(select(QueueItem).where(QueueItem.version > since).order_by(QueueItem.version)).all()
+    tombstones = session.exec(
+        select(QueueTombstone.queue_id, QueueTombstone.version).where(QueueTombstone.version > since)
+    ).all()
+    
+    # An id can show up in both when it was deleted after the row was read, or when
+    # SQLite reused the id of a deleted row. The newer version wins.
+    by_id = {item.id: item for item in items}
+    deleted = []
+    for queue_id, tombstone_version in tombstones:
+        item = by_id.get(queue_id)
+        if item is None or tombstone_version > item.version:
+            by_id.pop(queue_id, None)
+            if queue_id not in deleted:
+                deleted.append(queue_id)
+    return version, list(by_id.values()), deleted
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class QueueBroadcaster:
+    """
+    Fans queue changes out to subscribers. Each subscriber is an asyncio.Queue
+    that first receives a ("snapshot", [items]) event with the whole queue, then
+    ("changes", {"items": [...], "deleted": [ids]}) events. A None event means
+    the server is shutting down.
+    """
+    
+    def __init__(self, engine, interval: float = QUEUE_WATCH_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self.subscribers = set()
+        self.awaiting_snapshot = set()
+        self.items = {}
+        self.version = None
+        self._task = None
+    
+    def subscribe(self) -> asyncio.Queue:
+        subscription = asyncio.Queue()
+        self.subscribers.add(subscription)
+        self.awaiting_snapshot.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        return subscription
+    
+    def unsubscribe(self, subscription: asyncio.Queue):
+        self.subscribers.discard(subscription)
+        self.awaiting_snapshot.discard(subscription)
+    
+    def close(self):
+        """End every open stream"""
+        for subscription in self.subscribers:
+            subscription.put_nowait(None)
+        self.subscribers.clear()
+        self.awaiting_snapshot.clear()
+    
+    async def _watch(self):
+        connection = await asyncio.to_thread(self.engine.raw_connection)
+        data_version = None
+        try:
+            while self.subscribers:
+                current = await asyncio.to_thread(self._data_version, connection)
+                if current != data_version:
+                    first_read = data_version is None
+                    data_version = current
+                    changed, deleted = await asyncio.to_thread(self._refresh)
+                    if not first_read and (changed or deleted):
+                        self._broadcast("changes", {"items": changed, "deleted": deleted})
+                
+                if self.awaiting_snapshot:
+                    snapshot = sorted(self.items.values(), key=lambda item: item["createdAt"], reverse=True)
+                    for subscription in self.awaiting_snapshot:
+                        subscription.put_nowait(("snapshot", snapshot))
+                    self.awaiting_snapshot.clear()
+                
+                await asyncio.sleep(self.interval)
+        finally:
+            self.items = {}
+            self.version = None
+            connection.close()
+    
+    @staticmethod
+    def _data_version(connection) -> int:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    
+    def _refresh(self):
+        """Return (changed items, deleted ids) since the last read, and apply them to self.items"""
+        with Session(self.engine) as session:
+            items = None
+            if self.version is not None:
+                version, items, deleted = queue_changes_since(session, self.version)
+            
+            if items is None:
+                version = current_queue_version(session)
+                current = {item.id: queue_item_json(item) for item in session.exec(select(QueueItem)).all()}
+                changed = [item for item_id, item in current.items() if self.items.get(item_id) != item]
+                deleted = [item_id for item_id in self.items if item_id not in current]
+                self.items = current
+            else:
+                changed = [queue_item_json(item) for item in items]
+                self.items.update((item["id"], item) for item in changed)
+                for item_id in deleted:
+                    self.items.pop(item_id, None)
+        
+        self.version = version
+        return changed, deleted
+    
+    def _broadcast(self, event: str, data):
+        for subscription in self.subscribers:
+            if subscription not in self.awaiting_snapshot:
+                subscription.put_nowait((event, data))
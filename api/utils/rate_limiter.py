@@ -0,0 +1,150 @@
+import os
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+from sqlalchemy import text
+from models import engine
+from utils.deadline import Deadline, DeadlineExceeded
+
+# Requests per second each remote host starts at, and the range adaptive pacing moves in
+HOST_RATE_LIMIT = float(os.environ.get("HOST_RATE_LIMIT", 1.0))
+HOST_RATE_LIMIT_MIN = float(os.environ.get("HOST_RATE_LIMIT_MIN", 0.05))
+HOST_RATE_LIMIT_MAX = float(os.environ.get("HOST_RATE_LIMIT_MAX", 4.0))
+# Requests a host may receive back to back after being idle
+HOST_RATE_BURST = int(os.environ.get("HOST_RATE_BURST", 2))
+# Added to a host's rate after each successful response
+HOST_RATE_INCREASE = 0.05
+# Multipliers applied after a throttling response and after a connection error
+THROTTLE_DECREASE = 0.5
+ERROR_DECREASE = 0.8
+# Pause after a throttling response that has no Retry-After header
+THROTTLE_PAUSE = 30.0
+MAX_THROTTLE_PAUSE = 15 * 60
+
+
+class HostThrottled(IOError):
+    """The host answered 429/503 or with a Cloudflare challenge; the request should be retried after `pause` seconds"""
+    
+    def __init__(self, message: str, pause: float = 0.0):
+        super().__init__(message)
+        self.pause = pause
+
+
+class HostRateLimiter:
+    """
+    Per-host token bucket shared by every process that uses the database: the
+    API server's scrapes and each worker's downloads draw from the same budget.
+    
+    Each host row holds its current rate and the next free request slot. A
+    request reserves a slot with one atomic upsert, so processes never hand out
+    the same slot, then sleeps until it. Up to `burst` requests may start back to
+    back after the host has been idle (the bucket's capacity).
+    
+    The rate adapts additively up and multiplicatively down: every successful
+    response raises it by HOST_RATE_INCREASE up to `max_rate`, a connection error
+    cuts it by ERROR_DECREASE, and a throttling response halves it and pauses
+    the host for the Retry-After period.
+    """
+    
+    def __init__(
+        self,
+        engine,
+        initial_rate: float = HOST_RATE_LIMIT,
+        min_rate: float = HOST_RATE_LIMIT_MIN,
+        max_rate: float = HOST_RATE_LIMIT_MAX,
+        burst: int = HOST_RATE_BURST
+    ):
+        self.engine = engine
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+    
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+    
+    def acquire(self, url: str, deadline: Optional[Deadline] = None) -> float:
+        """
+        Block until a request to url's host may start. Returns the seconds waited.
+        Raises DeadlineExceeded straight away if the slot is after `deadline`.
+        """
+        now = time.time()
+        with self.engine.begin() as connection:
+            slot = connection.execute(text(
+                """
+                INSERT INTO host_rate_limits (host, rate, next_slot, last_slot, blocked_until)
+                VALUES (:host, :rate, :now + 1.0 / :rate, :now, 0)
+                ON CONFLICT (host) DO UPDATE SET
+                    last_slot = MAX(:now, next_slot - (:burst - 1) / rate, blocked_until),
+                    next_slot = MAX(next_slot, :now, blocked_until) + 1.0 / rate
+                RETURNING last_slot
+                """
+            ), {"host": self.host(url), "rate": self.initial_rate, "now": now, "burst": self.burst}).scalar()
+        
+        delay = slot - now
+        remaining = deadline.remaining() if deadline else None
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded(
+                f"{deadline.description} exceeded its {deadline.seconds:.0f}s deadline: "
+                f"the next request slot for {self.host(url)} is {delay:.0f}s away"
+            )
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+    
+    def record_success(self, url: str):
+        self._update(
+            url,
+            "rate = MIN(:max_rate, rate + :increase)",
+            "rate < :max_rate",
+            max_rate=self.max_rate,
+            increase=HOST_RATE_INCREASE
+        )
+    
+    def record_error(self, url: str):
+        self._update(url, "rate = MAX(:min_rate, rate * :factor)", min_rate=self.min_rate, factor=ERROR_DECREASE)
+    
+    def record_throttled(self, url: str, pause: float):
+        self._update(
+            url,
+            "rate = MAX(:min_rate, rate * :factor), blocked_until = MAX(blocked_until, :until)",
+            min_rate=self.min_rate,
+            factor=THROTTLE_DECREASE,
+            until=time.time() + pause
+        )
+    
+    def current_rate(self, url: str) -> Optional[float]:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                text("SELECT rate FROM host_rate_limits WHERE host = :host"), {"host": self.host(url)}
+            ).scalar()
+    
+    def _update(self, url: str, assignments: str, condition: str = "1", **params):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(f"UPDATE host_rate_limits SET {assignments} WHERE host = :host AND {condition}"),
+                {"host": self.host(url), **params}
+            )
+
+
+def throttle_pause(response) -> Optional[float]:
+    """
+    Seconds to back off if `response` is a throttling signal (429, 503 or a
+    Cloudflare challenge), or None for any other response. Only headers are
+    inspected, so streamed bodies are left unread.
+    """
+    headers = response.headers
+    challenged = headers.get('cf-mitigated', '').lower() == 'challenge' or (
+        response.status_code == 403 and headers.get('Server', '').lower() == 'cloudflare'
+    )
+    if response.status_code not in (429, 503) and not challenged:
+        return None
+    
+    retry_after = headers.get('Retry-After', '')
+    if retry_after.isdigit():
+        return min(float(retry_after), MAX_THROTTLE_PAUSE)
+    return THROTTLE_PAUSE
+
+
+host_limiter = HostRateLimiter(engine)
@@ -0,0 +1,87 @@
+"""
+Conditional GET and result caching for read endpoints over the links table.
+
+Every write path over links (store_links, bulk_delete and the worker marking a
+book downloaded) bumps the "links" change counter once per statement, whichever
+process writes. A response built from links is therefore fully
+described by the request URL plus that version: it is the response's ETag, a
+matching If-None-Match is answered with 304, and encoded response bodies are
+cached in memory until the version moves.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from sqlmodel import Session, select
+from models import ChangeCounter
+
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def current_links_version(session: Session) -> int:
+    version = session.exec(select(ChangeCounter.version).where(ChangeCounter.name == "links")).first()
+    return version or 0
+
+
+def links_etag(version: int) -> str:
+    return f'W/"links-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header lists `etag` (weak comparison) or is *"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(",")}
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+class ResultCache:
+    """
+    In-memory LRU of encoded response bodies, each stored with the data version
+    it was built from. A lookup with any other version is a miss, so entries go
+    stale as soon as a write bumps the version and are replaced on the next read.
+    The least recently used entries are evicted past `max_bytes`.
+    """
+    
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key, version: int):
+        """Return the cached (body, headers) for `key` at `version`, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+    
+    def put(self, key, version: int, body: bytes, headers: Optional[dict] = None):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (version, body, headers or {})
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+    
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+result_cache = ResultCache()
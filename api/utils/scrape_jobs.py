@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from sqlmodel import Session, select
+from models import engine, ScrapeJob, ScrapeJobAuthor
+from constants import QueueStatus
+from utils.scraper_utils import scrape_author
+from utils.deadline import Deadline
+
+# Authors scraped in parallel. They all share the scraper's rate limiter.
+SCRAPE_JOB_CONCURRENCY = int(os.environ.get("SCRAPE_JOB_CONCURRENCY", 3))
+# Total seconds one author's scrape may take before it is failed
+SCRAPE_AUTHOR_DEADLINE = float(os.environ.get("SCRAPE_AUTHOR_DEADLINE", 15 * 60))
+
+executor = ThreadPoolExecutor(max_workers=SCRAPE_JOB_CONCURRENCY, thread_name_prefix="scrape-job")
+
+UNFINISHED = [QueueStatus.PENDING.value, QueueStatus.IN_PROGRESS.value]
+
+
+def submit_scrape_job(authors: List[str], full: bool = False) -> int:
+    """
+    Persist a scrape job for the given author slugs and hand each author to the
+    executor. Returns immediately with the job id. Scrapes are incremental
+    unless `full` is set.
+    """
+    with Session(engine) as session:
+        job = ScrapeJob()
+        session.add(job)
+        session.flush()
+        
+        job_authors = [
+            ScrapeJobAuthor(job_id=job.id, author=author, full_scrape=1 if full else 0)
+            for author in authors
+        ]
+        session.add_all(job_authors)
+        session.commit()
+        
+        job_id = job.id
+        job_author_ids = [job_author.id for job_author in job_authors]
+    
+    for job_author_id in job_author_ids:
+        executor.submit(_run_job_author, job_author_id)
+    
+    print(f"Submitted scrape job {job_id} for {len(authors)} author(s)")
+    return job_id
+
+
+def resume_unfinished_jobs():
+    """Resubmit authors left pending or in progress when the server last stopped"""
+    with Session(engine) as session:
+        job_authors = session.exec(
+            select(ScrapeJobAuthor).where(ScrapeJobAuthor.status.in_(UNFINISHED))
+        ).all()
+        
+        for job_author in job_authors:
+            job_author.status = QueueStatus.PENDING.value
+            session.add(job_author)
+        session.commit()
+        
+        job_author_ids = [job_author.id for job_author in job_authors]
+    
+    for job_author_id in job_author_ids:
+        executor.submit(_run_job_author, job_author_id)
+    
+    if job_author_ids:
+        print(f"Resumed {len(job_author_ids)} unfinished scrape(s)")
+
+
+def get_scrape_job(job_id: int) -> Optional[dict]:
+    """Current state of a scrape job with per-author progress, or None if it does not exist"""
+    with Session(engine) as session:
+        job = session.get(ScrapeJob, job_id)
+        if not job:
+            return None
+        
+        job_authors = session.exec(
+            select(ScrapeJobAuthor).where(ScrapeJobAuthor.job_id == job_id).order_by(ScrapeJobAuthor.id)
+        ).all()
+    
+    statuses = {job_author.status for job_author in job_authors}
+    if job.completed_at:
+        status = QueueStatus.FAILED.value if statuses == {QueueStatus.FAILED.value} else QueueStatus.COMPLETED.value
+    elif statuses == {QueueStatus.PENDING.value}:
+        status = QueueStatus.PENDING.value
+    else:
+        status = QueueStatus.IN_PROGRESS.value
+    
+    return {
+        "id": job.id,
+        "status": status,
+        "createdAt": job.created_at,
+        "completedAt": job.completed_at,
+        "totalBooksAdded": sum(job_author.books_added for job_author in job_authors),
+        "authors": [
+            {
+                "author": job_author.author,
+                "full": bool(job_author.full_scrape),
+                "status": job_author.status,
+                "currentPage": job_author.current_page,
+                "booksAdded": job_author.books_added,
+                "error": job_author.error_message,
+                "startedAt": job_author.started_at,
+                "completedAt": job_author.completed_at,
+            }
+            for job_author in job_authors
+        ]
+    }
+
+
+def _run_job_author(job_author_id: int):
+    """Executor task: scrape one author of a job, recording progress as pages are stored"""
+    try:
+        with Session(engine) as session:
+            job_author = session.get(ScrapeJobAuthor, job_author_id)
+            if not job_author or job_author.status != QueueStatus.PENDING.value:
+                return
+            
+            job_author.status = QueueStatus.IN_PROGRESS.value
+            job_author.started_at = datetime.now().isoformat()
+            session.add(job_author)
+            session.commit()
+            
+            def on_progress(page, books_added):
+                job_author.current_page = page
+                job_author.books_added = books_added
+                session.add(job_author)
+                session.commit()
+            
+            try:
+                result = scrape_author(
+                    job_author.author,
+                    session,
+                    on_progress=on_progress,
+                    full=bool(job_author.full_scrape),
+                    deadline=Deadline(SCRAPE_AUTHOR_DEADLINE, f"Scrape of '{job_author.author}'")
+                )
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'books_added': job_author.books_added}
+            
+            job_author.books_added = result['books_added']
+            job_author.completed_at = datetime.now().isoformat()
+            if result['success']:
+                job_author.status = QueueStatus.COMPLETED.value
+            else:
+                job_author.status = QueueStatus.FAILED.value
+                job_author.error_message = result.get('error', 'Unknown error')
+            session.add(job_author)
+            session.commit()
+            
+            _complete_job_if_finished(session, job_author.job_id)
+    
+    except Exception as e:
+        print(f"Error running scrape for job author {job_author_id}: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+def _complete_job_if_finished(session: Session, job_id: int):
+    remaining = session.exec(
+        select(ScrapeJobAuthor.id).where(
+            ScrapeJobAuthor.job_id == job_id,
+            ScrapeJobAuthor.status.in_(UNFINISHED)
+        )
+    ).first()
+    
+    if remaining is None:
+        job = session.get(ScrapeJob, job_id)
+        job.completed_at = datetime.now().isoformat()
+        session.add(job)
+        session.commit()
+        print(f"Scrape job {job_id} complete")
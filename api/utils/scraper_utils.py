@@ -1,17 +1,26 @@
-import time
-import random
-from sqlalchemy.exc import IntegrityError
-import cloudscraper
-from bs4 import BeautifulSoup
-from models import Link
+import queue
+import threading
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+from models import Link, AuthorScrapeState, bump_change_counter
+from utils.http_cache import cached_fetch
+from utils.http_client import http_client
+from utils.html_parser import make_soup
+from utils.deadline import Deadline, DeadlineExceeded
 
-from constants import QueueStatus, MAX_RETRY_COUNT
-headers = {'Accept-Encoding': 'identity', 'User-Agent': 'Defined'}
-scraper = cloudscraper.create_scraper()
+from constants import MAX_RETRY_COUNT
 
+# How many listing pages may be fetched ahead of the page being parsed
+PREFETCH_PAGES = 2
 
-def parse_article_html(html_string):
-    soup = BeautifulSoup(html_string, 'html.parser')
+
+def parse_article_html(article):
+    """
+    Extract book metadata from a listing article. Accepts either an article
+    element that has already been parsed (the scrape path, so each page is
+    parsed only once) or a raw HTML string.
+    """
+    soup = make_soup(article) if isinstance(article, str) else article
     
     title_elem = soup.select_one('.entry-title a')
     title = title_elem.text.strip() if title_elem else ''
@@ -74,98 +83,203 @@ def format_author_name(author_input):
     return author_input.strip().lower().replace(' ', '-').replace('.','').replace(',','')
 
 
-def scrape_author(author, session):
-    books_added = 0
+def store_links(session, rows):
+    """
+    Insert a page of parsed link rows in one transaction, ignoring URLs that are
+    already stored. Returns how many rows were newly added.
+    """
+    if not rows:
+        return 0
+    
+    statement = sqlite_insert(Link).values(rows).on_conflict_do_nothing(
+        index_elements=['url']
+    ).returning(Link.url)
+    added = session.exec(statement).all()
+    if added:
+        bump_change_counter(session, "links")
+    session.commit()
+    return len(added)
+
+
+def _record_scrape_state(session, author, newest_url):
+    """Remember the newest listing URL seen for an author as its high-water mark"""
+    state = session.get(AuthorScrapeState, author) or AuthorScrapeState(author=author)
+    if newest_url:
+        state.newest_url = newest_url
+    state.last_scraped_at = datetime.now().isoformat()
+    session.add(state)
+    session.commit()
+
+
+def _author_page_url(author, page):
+    if page == 1:
+        return f"https://oceanofpdf.com/category/authors/{author}/"
+    return f"https://oceanofpdf.com/category/authors/{author}/page/{page}"
+
+
+def _fetch_page(url, deadline=None):
+    retry_delay = 2
+    deadline = deadline or Deadline()
+    
+    for attempt in range(MAX_RETRY_COUNT):
+        try:
+            deadline.check("listing page fetch")
+            return cached_fetch(http_client, "GET", url, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if attempt < MAX_RETRY_COUNT - 1:
+                wait_time = retry_delay * (attempt + 1)
+                print(f"Connection error (attempt {attempt + 1}/{MAX_RETRY_COUNT}): {e}")
+                print(f"Retrying in {wait_time} seconds...")
+                deadline.sleep(wait_time, "listing page fetch")
+            else:
+                print(f"Failed after {MAX_RETRY_COUNT} attempts: {e}")
+                raise
+
+
+def _prefetch_pages(author, pages, stop_event, first_page_checked, deadline=None):
+    """
+    Fetcher thread: downloads listing pages in order and hands them to the parser
+    through `pages`, staying at most PREFETCH_PAGES ahead. Puts (page, url, html, error).
+    Page 2 onwards is only fetched once `first_page_checked` is set, so an
+    incremental refresh that stops at page 1 costs a single request.
+    """
     page = 1
+    while not stop_event.is_set():
+        if page == 2:
+            while not first_page_checked.wait(timeout=0.1):
+                if stop_event.is_set():
+                    return
+        
+        url = _author_page_url(author, page)
+        print(f"Scraping {url}")
+        
+        try:
+            item = (page, url, _fetch_page(url, deadline).text, None)
+        except Exception as e:
+            item = (page, url, None, e)
+        
+        while not stop_event.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        
+        if item[3] is not None:
+            return
+        page += 1
+
+
+def scrape_author(author, session, on_progress=None, full=False, deadline=None):
+    """
+    Scrape listing pages for an author into the links table. Pages are fetched on
+    a background thread, so page N+1 is downloading while page N is parsed and
+    written on the caller's thread (which owns the session).
+    
+    By default the scrape is incremental: it stops after the first page that adds
+    no new books or contains the newest URL recorded by the previous scrape.
+    Pass full=True to walk every page (e.g. to repair an interrupted scrape).
+    `on_progress(page, books_added)` is called after each page is stored. When
+    `deadline` runs out the scrape fails, keeping the pages already stored.
+    """
+    deadline = deadline or Deadline()
+    books_added = 0
+    state = session.get(AuthorScrapeState, author)
+    newest_url = None
+    pages = queue.Queue(maxsize=PREFETCH_PAGES)
+    stop_event = threading.Event()
+    first_page_checked = threading.Event()
+    # An incremental scrape may stop at page 1, so page 2 waits until it is checked
+    if full:
+        first_page_checked.set()
+    
+    fetcher = threading.Thread(
+        target=_prefetch_pages,
+        args=(author, pages, stop_event, first_page_checked, deadline),
+        name=f"scrape-{author}",
+        daemon=True
+    )
+    fetcher.start()
     
     try:
         while True:
-            if page == 1:
-                url = f"https://oceanofpdf.com/category/authors/{author}/"
-            else:
-                url = f"https://oceanofpdf.com/category/authors/{author}/page/{page}"
-            
-            print(f"Scraping {url}")
-            
-            retry_delay = 2
-            response = None
-            
-            for attempt in range(MAX_RETRY_COUNT):
-                try:
-                    response = scraper.get(url, headers=headers)
-                    break 
-                except Exception as e:
-                    if attempt < MAX_RETRY_COUNT - 1:
-                        wait_time = retry_delay * (attempt + 1)
-                        print(f"Connection error (attempt {attempt + 1}/{MAX_RETRY_COUNT}): {e}")
-                        print(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Failed after {MAX_RETRY_COUNT} attempts: {e}")
-                        raise
+            try:
+                page, url, page_html, fetch_error = pages.get(timeout=deadline.remaining())
+            except queue.Empty:
+                deadline.check("listing page fetch")
+                continue
+            if fetch_error is not None:
+                raise fetch_error
             
             try:
-                html = BeautifulSoup(response.text, "html.parser")
+                html = make_soup(page_html)
                 
                 articles = html.find_all("article")
                 if not articles:
                     print("No more articles found.")
                     break
                 
+                rows = []
+                reached_other_author = False
                 for article in articles:
                     href = article.find("a")['href']
                     article_html = str(article)
                     
                     if author not in href:
                         print(f"Author not in href, stopping: {href}")
-                        return {
-                            'success': True,
-                            'books_added': books_added,
-                            'author': author
-                        }
+                        reached_other_author = True
+                        break
+                    
+                    parsed = parse_article_html(article)
+                    print(f"Found link: {href}")
+                    print(parsed)
+                    print('\n')
                     
-                    try:
-                        parsed = parse_article_html(article_html)
-                        print(f"Found link: {href}")
-                        print(parsed)
-                        print('\n')
-                        
-                        link = Link(
-                            url=href,
-                            author=author,
-                            article=article_html,
-                            downloaded=0,
-                            title=parsed['title'],
-                            book_author=parsed['book_author'],
-                            date=parsed['date'],
-                            language=parsed['language'],
-                            genre=parsed['genre'],
-                            image_url=parsed['image_url'],
-                            book_url=parsed['book_url'],
-                            description=parsed['description'],
-                            has_epub=1 if parsed['has_epub'] else 0,
-                            has_pdf=1 if parsed['has_pdf'] else 0
-                        )
-                        session.add(link)
-                        session.commit()
-                        
-                        books_added += 1
-                        print(f"Added book: {parsed['title']}")
-                        
-                    except IntegrityError:
-                        session.rollback()
-                        print(f"Book already exists: {href}")
-                        pass
+                    rows.append({
+                        'url': href,
+                        'author': author,
+                        'article': article_html,
+                        'downloaded': 0,
+                        'title': parsed['title'],
+                        'book_author': parsed['book_author'],
+                        'date': parsed['date'],
+                        'language': parsed['language'],
+                        'genre': parsed['genre'],
+                        'image_url': parsed['image_url'],
+                        'book_url': parsed['book_url'],
+                        'description': parsed['description'],
+                        'has_epub': 1 if parsed['has_epub'] else 0,
+                        'has_pdf': 1 if parsed['has_pdf'] else 0
+                    })
                 
+                if page == 1 and rows:
+                    newest_url = rows[0]['url']
+                
+                page_added = store_links(session, rows)
+                books_added += page_added
+                print(f"Page {page}: added {page_added} of {len(rows)} book(s)")
+            
             except Exception as e:
                 print(f"Error on page {page}: {e}")
+                raise
+            
+            if on_progress:
+                on_progress(page, books_added)
+            
+            if reached_other_author:
                 break
             
-            # Random delay to lower hit on site
-            sleep_s = 0.8 + random.random() * 0.7  # ~0.8–1.5s
-            time.sleep(sleep_s)
+            if not full:
+                reached_high_water_mark = state and state.newest_url in (row['url'] for row in rows)
+                if page_added == 0 or reached_high_water_mark:
+                    print(f"Page {page} reaches already stored books, stopping incremental scrape")
+                    break
             
-            page += 1
+            first_page_checked.set()
+        
+        _record_scrape_state(session, author, newest_url)
         
         print(f"Scraping complete. Added {books_added} books for author '{author}'")
         return {
@@ -173,8 +287,11 @@ def scrape_author(author, session):
             'books_added': books_added,
             'author': author
         }
-        
+    
     except Exception as e:
+        # A page that failed part way leaves the scrape incomplete, so the
+        # high-water mark is not recorded and the next scrape retries it
+        session.rollback()
         print(f"Error scraping author: {e}")
         import traceback
         traceback.print_exc()
@@ -184,3 +301,6 @@ def scrape_author(author, session):
             'books_added': books_added,
             'author': author
         }
+    
+    finally:
+        stop_event.set()
@@ -0,0 +1,93 @@
+"""
+Wake idle workers as soon as books are queued.
+
+Each worker process binds a UDP socket on the loopback interface and records
+its port in the `worker_endpoints` table. After the API server commits new queue
+items it sends every registered port a one-byte datagram, and the worker's slots
+claim the work within milliseconds instead of on their next poll.
+
+The datagram only shortens the wait; it is never needed for correctness. Idle
+slots still poll, backing off from WORKER_POLL_MIN to WORKER_POLL_MAX seconds,
+so a lost datagram, a stale endpoint row or a queue written by another tool
+just waits for the next poll.
+"""
+import os
+import socket
+import threading
+from sqlmodel import Session, select, delete
+from models import WorkerEndpoint
+
+WAKEUP_HOST = "127.0.0.1"
+WORKER_POLL_MIN = float(os.environ.get("WORKER_POLL_MIN", 1.0))
+WORKER_POLL_MAX = float(os.environ.get("WORKER_POLL_MAX", 60.0))
+
+
+class WakeupListener:
+    """
+    Receives wake-up datagrams for one worker process. `generation` goes up on
+    every datagram; a slot reads it before looking for work and passes it to
+    `wait`, so a wake-up that lands in between is not lost.
+    """
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((WAKEUP_HOST, 0))
+        self.port = self.socket.getsockname()[1]
+        self.generation = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self._thread = threading.Thread(target=self._receive, name="worker-wakeup", daemon=True)
+    
+    def start(self):
+        with Session(self.engine) as session:
+            # A crashed worker may have left a row for the same port
+            session.exec(delete(WorkerEndpoint).where(WorkerEndpoint.port == self.port))
+            session.add(WorkerEndpoint(port=self.port, pid=os.getpid()))
+            session.commit()
+        self._thread.start()
+        return self
+    
+    def wait(self, generation: int, timeout: float) -> bool:
+        """Block until a wake-up newer than `generation` or close(). False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.generation != generation or self.closed, timeout)
+    
+    def close(self):
+        """Unregister, wake every waiting slot and stop the receiver"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        try:
+            with Session(self.engine) as session:
+                session.exec(delete(WorkerEndpoint).where(WorkerEndpoint.port == self.port))
+                session.commit()
+        finally:
+            # Unblock recv() so the receiver thread sees `closed`
+            self.socket.sendto(b"\0", (WAKEUP_HOST, self.port))
+            self._thread.join(timeout=5)
+            self.socket.close()
+    
+    def _receive(self):
+        while not self.closed:
+            try:
+                self.socket.recv(64)
+            except OSError:
+                return
+            with self.condition:
+                self.generation += 1
+                self.condition.notify_all()
+
+
+def notify_workers(session: Session):
+    """Nudge every registered worker. Best effort: send errors are ignored."""
+    ports = session.exec(select(WorkerEndpoint.port)).all()
+    if not ports:
+        return
+    
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        for port in ports:
+            try:
+                sender.sendto(b"\1", (WAKEUP_HOST, port))
+            except OSError:
+                pass
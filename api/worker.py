@@ -1,97 +1,282 @@
-import time
+import os
 import sys
-from datetime import datetime
-from sqlmodel import Session, select
-from models import engine, QueueItem, Link
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+import requests
+from sqlmodel import Session, select, update, or_
+from models import engine, create_db_and_tables, bump_change_counter, QueueItem, Link
 from constants import QueueStatus, MAX_RETRY_COUNT
-from utils.download_utils import download_book
+from utils.download_utils import download_book, discard_partial_download, NoDownloadForm
+from utils.worker_wakeup import WakeupListener, WORKER_POLL_MIN, WORKER_POLL_MAX
+from utils.deadline import Deadline
+from utils.rate_limiter import HostThrottled
+
+# Minimum seconds between download progress writes for one queue item
+PROGRESS_INTERVAL = 1.0
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", 3))
+# Total seconds one download attempt may take, across every request it makes
+DOWNLOAD_DEADLINE = float(os.environ.get("DOWNLOAD_DEADLINE", 30 * 60))
+# A claim is a lease: an item still IN_PROGRESS this long after it was claimed
+# belongs to a worker that died, and the next claim takes it over
+CLAIM_LEASE = DOWNLOAD_DEADLINE + float(os.environ.get("CLAIM_LEASE_MARGIN", 5 * 60))
+# Retry delays double from RETRY_BASE_DELAY per failed attempt, up to RETRY_MAX_DELAY.
+# Throttled attempts start THROTTLED_DELAY_FACTOR times higher.
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", 30))
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", 60 * 60))
+THROTTLED_DELAY_FACTOR = 4
 
-POLL_INTERVAL = 5
+# Failure kinds, see classify_error
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+PERMANENT = "permanent"
+
+
+def claim_next_queue_item(session: Session) -> Optional[QueueItem]:
+    """
+    Atomically claim the oldest pending queue item that is due (its scheduled
+    retry time, if any, has passed) by flipping it to IN_PROGRESS. The pick and
+    the status change happen in a single conditional UPDATE, so two worker slots
+    (or two worker processes) can never claim the same item.
+    An IN_PROGRESS item whose claim is older than CLAIM_LEASE was abandoned by a
+    crashed worker and is claimed again.
+    Returns the claimed item, or None if nothing is due.
+    """
+    now = datetime.now()
+    claimable = or_(
+        (QueueItem.status == QueueStatus.PENDING.value) & or_(
+            QueueItem.next_attempt_at.is_(None),
+            QueueItem.next_attempt_at <= now.isoformat()
+        ),
+        (QueueItem.status == QueueStatus.IN_PROGRESS.value)
+        & (QueueItem.started_at < (now - timedelta(seconds=CLAIM_LEASE)).isoformat())
+    )
+    next_claimable = select(QueueItem.id).where(
+        claimable
+    ).order_by(QueueItem.created_at).limit(1).scalar_subquery()
+    
+    statement = update(QueueItem).where(
+        QueueItem.id == next_claimable,
+        claimable
+    ).values(
+        status=QueueStatus.IN_PROGRESS.value,
+        started_at=now.isoformat()
+    ).returning(QueueItem.id)
+    
+    claimed_id = session.exec(statement).scalar()
+    session.commit()
+    
+    if claimed_id is None:
+        return None
+    return session.get(QueueItem, claimed_id)
 
 
 def process_queue_item(queue_item: QueueItem, session: Session) -> bool:
     """
-    Process a single queue item. Returns True if successful, False otherwise.
+    Process a queue item already claimed (marked IN_PROGRESS) by
+    claim_next_queue_item. Returns True if successful, False otherwise.
     """
     print(f"Processing queue item {queue_item.id}: {queue_item.book_title}")
     
     try:
-        queue_item.status = QueueStatus.IN_PROGRESS.value
-        queue_item.started_at = datetime.now().isoformat()
-        session.add(queue_item)
-        session.commit()
-        
-        result = download_book(queue_item.book_url, queue_item.book_title, None)
+        result = download_book(
+            queue_item.book_url,
+            queue_item.book_title,
+            None,
+            on_progress=_progress_recorder(queue_item, session),
+            deadline=Deadline(DOWNLOAD_DEADLINE, f"Download of queue item {queue_item.id}")
+        )
         
         link_statement = select(Link).where(Link.book_url == queue_item.book_url)
         link = session.exec(link_statement).first()
-        if link:
+        if link and not link.downloaded:
             link.downloaded = 1
             session.add(link)
+            bump_change_counter(session, "links")
         
         queue_item.status = QueueStatus.COMPLETED.value
         queue_item.completed_at = datetime.now().isoformat()
         queue_item.error_message = None
+        queue_item.next_attempt_at = None
         session.add(queue_item)
         session.commit()
         
-        print(f"Successfully downloaded: {result['filename']} to {result['destination']}")
+        print(f"Successfully downloaded: {result['filename']} to {result['destination']} ({result.get('bytes', 0)} bytes)")
         return True
-        
+    
     except Exception as e:
         error_msg = str(e)
-        print(f"Error processing queue item {queue_item.id}: {error_msg}")
+        kind = classify_error(e)
+        print(f"Error processing queue item {queue_item.id} ({kind}): {error_msg}")
         
-        queue_item.retry_count += 1
+        queue_item.next_attempt_at = None
+        # Host throttling says nothing about this book, so it does not use up its retries
+        if kind != THROTTLED:
+            queue_item.retry_count += 1
         
-        if queue_item.retry_count >= MAX_RETRY_COUNT:
+        if kind == PERMANENT:
+            queue_item.status = QueueStatus.FAILED.value
+            queue_item.error_message = f"Failed without retrying: {error_msg}"
+            print(f"Queue item {queue_item.id} failed permanently, not retrying")
+        elif queue_item.retry_count >= MAX_RETRY_COUNT:
             queue_item.status = QueueStatus.FAILED.value
             queue_item.error_message = f"Failed after {MAX_RETRY_COUNT} retries: {error_msg}"
             print(f"Queue item {queue_item.id} failed permanently after {MAX_RETRY_COUNT} retries")
         else:
+            delay = retry_delay(queue_item.retry_count, kind)
+            if kind == THROTTLED:
+                delay = max(delay, e.pause)
             queue_item.status = QueueStatus.PENDING.value
             queue_item.error_message = error_msg
-            print(f"Queue item {queue_item.id} will retry (attempt {queue_item.retry_count}/{MAX_RETRY_COUNT})")
+            queue_item.next_attempt_at = (datetime.now() + timedelta(seconds=delay)).isoformat()
+            print(
+                f"Queue item {queue_item.id} will retry in {delay:.0f}s "
+                f"(attempt {queue_item.retry_count}/{MAX_RETRY_COUNT})"
+            )
+        
+        # Only a retry resumes a partial file, so a failed item does not leave one behind
+        partial_path = getattr(e, "partial_path", None)
+        if queue_item.status == QueueStatus.FAILED.value and partial_path:
+            discard_partial_download(partial_path)
         
         session.add(queue_item)
         session.commit()
         return False
 
 
-def run_worker():
+def classify_error(error: Exception) -> str:
+    """
+    PERMANENT for failures a retry cannot fix: the book page has no usable
+    download form (NoDownloadForm) or the server says the page is gone
+    (404/410). THROTTLED when the host asked us to slow down. TRANSIENT for
+    everything else: timeouts, dropped connections, deadlines, 5xx, unexpected pages.
+    """
+    if isinstance(error, HostThrottled):
+        return THROTTLED
+    if isinstance(error, NoDownloadForm):
+        return PERMANENT
+    if isinstance(error, requests.HTTPError) and error.response is not None and error.response.status_code in (404, 410):
+        return PERMANENT
+    return TRANSIENT
+
+
+def retry_delay(retry_count: int, kind: str = TRANSIENT) -> float:
+    """
+    Seconds before retry number `retry_count`: exponential from RETRY_BASE_DELAY,
+    capped at RETRY_MAX_DELAY, with jitter so items that failed together (e.g.
+    during an outage) do not all come back at the same moment. Throttled
+    attempts do not count as retries and wait THROTTLED_DELAY_FACTOR times the
+    base delay for the current retry count.
+    """
+    base = RETRY_BASE_DELAY * (THROTTLED_DELAY_FACTOR if kind == THROTTLED else 1)
+    delay = min(base * 2 ** max(retry_count - 1, 0), RETRY_MAX_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def _progress_recorder(queue_item: QueueItem, session: Session):
+    """
+    Download progress callback that stores bytes_downloaded / total_bytes on the
+    queue item, at most once per PROGRESS_INTERVAL (plus the final chunk), so the
+    API server can stream progress without a write per chunk.
+    """
+    last_write = 0.0
+    
+    def record(bytes_downloaded: int, total_bytes: Optional[int]):
+        nonlocal last_write
+        now = time.monotonic()
+        finished = total_bytes is not None and bytes_downloaded >= total_bytes
+        if now - last_write < PROGRESS_INTERVAL and not finished:
+            return
+        last_write = now
+        
+        queue_item.bytes_downloaded = bytes_downloaded
+        queue_item.total_bytes = total_bytes
+        session.add(queue_item)
+        session.commit()
+    
+    return record
+
+
+def _worker_slot(slot: int, stop_event: threading.Event, wakeup: WakeupListener):
     """
-    Main worker loop that continuously polls the queue and processes items.
+    Worker slot loop. Keeps claiming and processing items back to back while the
+    queue has work. Once the queue is empty it sleeps until the API server sends
+    a wake-up, re-checking on its own after an idle wait that doubles from
+    WORKER_POLL_MIN up to WORKER_POLL_MAX seconds.
+    """
+    idle_wait = WORKER_POLL_MIN
+    while not stop_event.is_set():
+        generation = wakeup.generation
+        claimed = False
+        try:
+            with Session(engine) as session:
+                queue_item = claim_next_queue_item(session)
+                
+                if queue_item:
+                    claimed = True
+                    print(f"[slot {slot}] Claimed queue item {queue_item.id}")
+                    process_queue_item(queue_item, session)
+        
+        except Exception as e:
+            print(f"[slot {slot}] Error in worker loop: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        if claimed:
+            idle_wait = WORKER_POLL_MIN
+        elif wakeup.wait(generation, idle_wait):
+            idle_wait = WORKER_POLL_MIN
+        else:
+            idle_wait = min(idle_wait * 2, WORKER_POLL_MAX)
+
+
+def run_worker(concurrency: int = WORKER_CONCURRENCY):
+    """
+    Main worker loop. Runs a pool of `concurrency` slots that each pull items
+    from the queue independently.
     """
     print("Starting queue worker...")
-    print(f"Polling interval: {POLL_INTERVAL} seconds")
+    create_db_and_tables()
+    print(f"Concurrency: {concurrency} slot(s)")
+    print(f"Polling interval when idle: {WORKER_POLL_MIN}-{WORKER_POLL_MAX} seconds")
     print(f"Max retry count: {MAX_RETRY_COUNT}")
     
+    wakeup = WakeupListener(engine).start()
+    print(f"Listening for queue wake-ups on UDP port {wakeup.port}")
+    
+    stop_event = threading.Event()
+    slots = [
+        threading.Thread(target=_worker_slot, args=(slot, stop_event, wakeup), name=f"worker-slot-{slot}")
+        for slot in range(1, concurrency + 1)
+    ]
+    for thread in slots:
+        thread.start()
+    
     try:
-        while True:
-            try:
-                with Session(engine) as session:
-                    statement = select(QueueItem).where(
-                        QueueItem.status == QueueStatus.PENDING.value
-                    ).order_by(QueueItem.created_at).limit(1)
-                    
-                    queue_item = session.exec(statement).first()
-                    
-                    if queue_item:
-                        process_queue_item(queue_item, session)
-                    else:
-                        print("Queue is empty, waiting...")
-                
-            except Exception as e:
-                print(f"Error in worker loop: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            time.sleep(POLL_INTERVAL)
-            
+        while any(thread.is_alive() for thread in slots):
+            for thread in slots:
+                thread.join(timeout=1)
+    
     except KeyboardInterrupt:
-        print("\nWorker stopped by user")
+        print("\nWorker stopping, waiting for in-progress downloads to finish...")
+        stop_event.set()
+        wakeup.close()
+        for thread in slots:
+            thread.join()
+        print("Worker stopped by user")
         sys.exit(0)
 
 
 if __name__ == "__main__":
-    run_worker()
+    parser = argparse.ArgumentParser(description="Download queue worker")
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=WORKER_CONCURRENCY,
+        help=f"number of concurrent downloads (default: {WORKER_CONCURRENCY})"
+    )
+    args = parser.parse_args()
+    run_worker(max(1, args.concurrency))
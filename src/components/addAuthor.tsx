@@ -20,7 +20,7 @@ interface AddAuthorProps {
 export function AddAuthor({ onAuthorAdded }: AddAuthorProps) {
   const [authorName, setAuthorName] = useState("");
   const [reverseNames, setReverseNames] = useState(false);
-  const { addAuthor, adding, error, success } = useAddAuthor();
+  const { addAuthor, adding, error, success, job } = useAddAuthor();
 
   const reverseAuthorName = (name: string): string => {
     const words = name.trim().split(/\s+/);
@@ -91,6 +91,17 @@ export function AddAuthor({ onAuthorAdded }: AddAuthorProps) {
           label="Try reverse name (LASTNAME FIRSTNAME)"
           sx={{ mb: 2 }}
         />
+        {adding && job && (
+          <Alert severity="info" sx={{ mb: 2 }}>
+            {job.authors.map((author) => (
+              <div key={author.author}>
+                {author.author}: {author.status.replace("_", " ")}
+                {author.currentPage > 0 &&
+                  ` (page ${author.currentPage}, ${author.booksAdded} book(s) added)`}
+              </div>
+            ))}
+          </Alert>
+        )}
         {error && (
           <Alert severity="error" sx={{ mb: 2 }}>
             {error}
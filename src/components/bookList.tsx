@@ -1,7 +1,9 @@
-import { useEffect, useMemo } from "react";
-import { useLinks } from "../hooks/useApi";
+import { useEffect } from "react";
+import { useLinkLanguages, useLinks } from "../hooks/useApi";
 import {
   Avatar,
+  Box,
+  Button,
   Checkbox,
   List,
   ListItemAvatar,
@@ -43,37 +45,16 @@ export const BookList = ({
   onFilteredCountUpdate,
   onAvailableLanguagesUpdate,
 }: BookListProps) => {
-  const { links, loading, error } = useLinks(filterByAuthor);
-
-  const filteredLinks = useMemo(() => {
-    let filtered = links;
-
-    if (hideDownloaded) {
-      filtered = filtered.filter((link) => !link.downloaded);
-    }
-
-    if (selectedLanguage !== "All") {
-      filtered = filtered.filter(
-        (link) =>
-          !link.language ||
-          link.language.toLowerCase() === selectedLanguage.toLowerCase(),
-      );
-    }
-
-    if (searchQuery.trim()) {
-      const query = searchQuery.toLowerCase();
-      filtered = filtered.filter(
-        (link) =>
-          link.title?.toLowerCase().includes(query) ||
-          link.bookAuthor?.toLowerCase().includes(query) ||
-          link.author?.toLowerCase().includes(query) ||
-          link.genre?.toLowerCase().includes(query) ||
-          link.description?.toLowerCase().includes(query),
-      );
-    }
-
-    return filtered;
-  }, [links, hideDownloaded, selectedLanguage, searchQuery]);
+  // Filtering happens on the server, so it covers books not loaded yet
+  const { links, total, loading, loadingMore, hasMore, loadMore, error } =
+    useLinks({
+      author: filterByAuthor,
+      downloaded: hideDownloaded ? false : null,
+      language: selectedLanguage !== "All" ? selectedLanguage : undefined,
+      search: searchQuery,
+    });
+  const languages = useLinkLanguages(filterByAuthor);
+  const filteredLinks = links;
 
   // Update book titles map whenever links change
   useEffect(() => {
@@ -85,23 +66,18 @@ export const BookList = ({
   }, [links, onBookTitlesUpdate]);
 
   useEffect(() => {
-    const languagesSet = new Set<string>();
-    links.forEach((link) => {
-      if (link.language && link.language.trim()) {
-        languagesSet.add(link.language);
-      }
-    });
-    const uniqueLanguages = Array.from(languagesSet).sort();
-    onAvailableLanguagesUpdate(uniqueLanguages);
-  }, [links, onAvailableLanguagesUpdate]);
+    onAvailableLanguagesUpdate(languages);
+  }, [languages, onAvailableLanguagesUpdate]);
 
   useEffect(() => {
-    const allBookUrls = filteredLinks.map((l) => l.bookUrl);
+    const loadedBookUrls = filteredLinks.map((l) => l.bookUrl);
+    // Select All fetches books that are not loaded yet, so compare with the total
     const allSelected =
-      allBookUrls.length > 0 &&
-      allBookUrls.every((url) => checked.includes(url));
-    onFilteredCountUpdate(filteredLinks.length, allBookUrls, allSelected);
-  }, [filteredLinks, checked, onFilteredCountUpdate]);
+      total > 0 &&
+      checked.length >= total &&
+      loadedBookUrls.every((url) => checked.includes(url));
+    onFilteredCountUpdate(total, loadedBookUrls, allSelected);
+  }, [filteredLinks, total, checked, onFilteredCountUpdate]);
 
   const handleToggle = (value: string) => () => {
     const currentIndex = checked.indexOf(value);
@@ -119,7 +95,7 @@ export const BookList = ({
   if (error) return <p>Error: {error}</p>;
   if (loading) return <p>Loading...</p>;
 
-  if (!filteredLinks.length) return <p>No books</p>;
+  if (!filteredLinks.length && !hasMore) return <p>No books</p>;
 
   return (
     <>
@@ -169,6 +145,13 @@ export const BookList = ({
           </ListItemButton>
         ))}
       </List>
+      {hasMore && (
+        <Box sx={{ display: "flex", justifyContent: "center", my: 2 }}>
+          <Button variant="outlined" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more books"}
+          </Button>
+        </Box>
+      )}
     </>
   );
 };
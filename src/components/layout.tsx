@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback } from "react";
 import {
   Box,
   CssBaseline,
@@ -35,10 +35,14 @@ import {
   useAuthors,
   useCleanupAuthors,
   useDeleteAllAuthors,
+  useEnqueueAuthor,
+  fetchMatchingBooks,
+  LinkFilters,
 } from "../hooks/useApi";
 import { SearchBar } from "./searchBar";
 
 const drawerWidth = 260;
+const SEARCH_DEBOUNCE_MS = 300;
 
 export function Layout() {
   const [showAuthorDrawer, setShowAuthorDrawer] = useState(false);
@@ -71,6 +75,7 @@ export function Layout() {
   const [bookTitles, setBookTitles] = useState<Map<string, string>>(new Map());
   const { download, downloading, progress, failures } = useDownload();
   const { deleteAuthor, deleting } = useDeleteAuthor();
+  const { enqueueAuthor, enqueueing } = useEnqueueAuthor();
   const { cleanupAuthors, cleaning } = useCleanupAuthors();
   const { deleteAllAuthors, deleting: deletingAll } = useDeleteAllAuthors();
   const { authors } = useAuthors(refreshAuthors > 0);
@@ -78,6 +83,24 @@ export function Layout() {
   const [filteredBookCount, setFilteredBookCount] = useState(0);
   const [allVisibleBookUrls, setAllVisibleBookUrls] = useState<string[]>([]);
   const [allBooksSelected, setAllBooksSelected] = useState(false);
+  const [selectingAll, setSelectingAll] = useState(false);
+  const [debouncedSearch, setDebouncedSearch] = useState(searchQuery);
+
+  // Search runs on the server, so wait for typing to pause before refetching
+  useEffect(() => {
+    const timer = setTimeout(
+      () => setDebouncedSearch(searchQuery),
+      SEARCH_DEBOUNCE_MS,
+    );
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  const bookFilters: LinkFilters = {
+    author: filterByAuthor,
+    downloaded: hideDownloaded ? false : null,
+    language: selectedLanguage !== "All" ? selectedLanguage : undefined,
+    search: debouncedSearch,
+  };
 
   useEffect(() => {
     const params = new URLSearchParams(window.location.search);
@@ -112,8 +135,40 @@ export function Layout() {
     }
   };
 
-  const handleSelectAll = (allBookUrls: string[]) => {
-    setChecked(allBookUrls);
+  const handleQueueAuthor = async () => {
+    if (filterByAuthor) {
+      try {
+        await enqueueAuthor(filterByAuthor, {
+          downloaded: bookFilters.downloaded,
+          language: bookFilters.language,
+          search: bookFilters.search?.trim() || undefined,
+        });
+      } catch (err) {
+        console.error("Failed to queue author", err);
+      }
+    }
+  };
+
+  const handleSelectAll = async (allBookUrls: string[]) => {
+    if (allBookUrls.length >= filteredBookCount) {
+      setChecked(allBookUrls);
+      return;
+    }
+    // Some matching books are not loaded yet, so ask the server for all of them
+    setSelectingAll(true);
+    try {
+      const books = await fetchMatchingBooks(bookFilters);
+      setChecked(books.map((b) => b.bookUrl));
+      setBookTitles((prev) => {
+        const titles = new Map(prev);
+        books.forEach((b) => titles.set(b.bookUrl, b.title || "Unknown Book"));
+        return titles;
+      });
+    } catch (err) {
+      console.error("Failed to select all books", err);
+    } finally {
+      setSelectingAll(false);
+    }
   };
 
   const handleUnselectAll = () => {
@@ -183,23 +238,27 @@ export function Layout() {
     setRefreshAuthors((prev) => prev + 1);
   };
 
-  const handleBookTitlesUpdate = (titles: Map<string, string>) => {
-    setBookTitles(titles);
-  };
+  // Stable callbacks, so BookList's effects only rerun when its data changes
+  const handleBookTitlesUpdate = useCallback(
+    (titles: Map<string, string>) => {
+      // Merge so titles fetched by Select All survive a page load
+      setBookTitles((prev) => new Map([...prev, ...titles]));
+    },
+    [],
+  );
 
-  const handleFilteredCountUpdate = (
-    count: number,
-    allUrls: string[],
-    allSelected: boolean,
-  ) => {
-    setFilteredBookCount(count);
-    setAllVisibleBookUrls(allUrls);
-    setAllBooksSelected(allSelected);
-  };
+  const handleFilteredCountUpdate = useCallback(
+    (count: number, allUrls: string[], allSelected: boolean) => {
+      setFilteredBookCount(count);
+      setAllVisibleBookUrls(allUrls);
+      setAllBooksSelected(allSelected);
+    },
+    [],
+  );
 
-  const handleAvailableLanguagesUpdate = (languages: string[]) => {
+  const handleAvailableLanguagesUpdate = useCallback((languages: string[]) => {
     setAvailableLanguages(languages);
-  };
+  }, []);
 
   useEffect(() => {
     if (
@@ -405,6 +464,7 @@ export function Layout() {
                       : handleSelectAll(allVisibleBookUrls)
                   }
                   size="small"
+                  disabled={selectingAll}
                 >
                   {allBooksSelected ? "Unselect All" : "Select All"}
                 </Button>
@@ -422,6 +482,15 @@ export function Layout() {
                     >
                       Viewing: {authors[filterByAuthor] || filterByAuthor}
                     </Typography>
+                    <Button
+                      variant="outlined"
+                      size="small"
+                      onClick={handleQueueAuthor}
+                      disabled={enqueueing}
+                      sx={{ mr: 2 }}
+                    >
+                      {enqueueing ? "Queueing..." : "Queue Author"}
+                    </Button>
                     <Button
                       variant="outlined"
                       color="error"
@@ -454,7 +523,7 @@ export function Layout() {
                 onSelectAll={handleSelectAll}
                 onUnselectAll={handleUnselectAll}
                 onBookTitlesUpdate={handleBookTitlesUpdate}
-                searchQuery={searchQuery}
+                searchQuery={debouncedSearch}
                 onFilteredCountUpdate={handleFilteredCountUpdate}
                 onAvailableLanguagesUpdate={handleAvailableLanguagesUpdate}
               />
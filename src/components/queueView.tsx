@@ -21,6 +21,7 @@ import {
   Button,
   Tooltip,
   CircularProgress,
+  LinearProgress,
   Dialog,
   DialogTitle,
   DialogContent,
@@ -230,14 +231,31 @@ export const QueueView = () => {
                     </Typography>
                   </TableCell>
                   <TableCell>{item.bookAuthor || "—"}</TableCell>
-                  <TableCell>{getStatusChip(item.status)}</TableCell>
                   <TableCell>
-                    {item.retryCount > 0 ? (
-                      <Chip
-                        label={item.retryCount}
-                        size="small"
-                        color="warning"
+                    {getStatusChip(item.status)}
+                    {item.status === "in_progress" && item.totalBytes ? (
+                      <LinearProgress
+                        variant="determinate"
+                        value={(item.bytesDownloaded / item.totalBytes) * 100}
+                        sx={{ mt: 1 }}
                       />
+                    ) : null}
+                  </TableCell>
+                  <TableCell>
+                    {item.retryCount > 0 ? (
+                      <Tooltip
+                        title={
+                          item.nextAttemptAt
+                            ? `Next attempt ${formatDate(item.nextAttemptAt)}`
+                            : ""
+                        }
+                      >
+                        <Chip
+                          label={item.retryCount}
+                          size="small"
+                          color="warning"
+                        />
+                      </Tooltip>
                     ) : (
                       "0"
                     )}
@@ -1,5 +1,5 @@
-import { useEffect, useState } from "react";
-import { Authors, Link, QueueItem } from "../types";
+import { useCallback, useEffect, useRef, useState } from "react";
+import { Authors, Link, QueueItem, ScrapeJob } from "../types";
 
 const API_BASE = "http://localhost:8000";
 
@@ -142,38 +142,139 @@ export function useAuthors(refresh: boolean = false) {
   return { authors, loading, error } as const;
 }
 
-export function useLinks(filterByAuthor?: string) {
+const LINKS_PAGE_SIZE = 500;
+
+export interface LinkFilters {
+  author?: string;
+  downloaded?: boolean | null;
+  language?: string;
+  search?: string;
+}
+
+function linkFilterParams(filters: LinkFilters) {
+  const params = new URLSearchParams();
+  if (filters.author) params.set("author", filters.author);
+  if (filters.downloaded !== undefined && filters.downloaded !== null) {
+    params.set("downloaded", String(filters.downloaded));
+  }
+  if (filters.language) params.set("language", filters.language);
+  if (filters.search?.trim()) params.set("search", filters.search.trim());
+  return params;
+}
+
+export function useLinks(filters: LinkFilters) {
   const [links, setLinks] = useState<Link[]>([]);
+  const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const controllerRef = useRef<AbortController | null>(null);
+  const { author, downloaded, language, search } = filters;
+
+  const fetchPage = useCallback(
+    async (after: string | null, controller: AbortController) => {
+      const params = linkFilterParams({ author, downloaded, language, search });
+      params.set("limit", String(LINKS_PAGE_SIZE));
+      if (after) params.set("after", after);
+
+      const res = await fetch(`${API_BASE}/links?${params}`, {
+        signal: controller.signal,
+      });
+      if (!res.ok) throw new Error(`Links request failed: ${res.status}`);
+      const page = (await res.json()) as Link[];
+
+      setLinks((previous) => (after ? [...previous, ...page] : page));
+      setCursor(res.headers.get("X-Next-Cursor"));
+      if (!after) {
+        setTotal(Number(res.headers.get("X-Total-Count") ?? page.length));
+      }
+    },
+    [author, downloaded, language, search],
+  );
 
+  // Only the first page is fetched up front (again whenever a filter changes);
+  // later pages wait for loadMore()
   useEffect(() => {
     const controller = new AbortController();
+    controllerRef.current = controller;
     const run = async () => {
       setLoading(true);
+      setLoadingMore(false);
       setError(null);
+      setLinks([]);
+      setCursor(null);
       try {
-        const search = filterByAuthor
-          ? `?author=${encodeURIComponent(filterByAuthor)}`
-          : "";
-        const res = await fetch(`${API_BASE}/links${search}`, {
-          signal: controller.signal,
-        });
-        if (!res.ok) throw new Error(`Links request failed: ${res.status}`);
-        const data = (await res.json()) as Link[];
-        setLinks(data);
+        await fetchPage(null, controller);
       } catch (err: any) {
         if (err.name === "AbortError") return;
         setError(err.message ?? "Failed to fetch links");
       } finally {
-        setLoading(false);
+        if (!controller.signal.aborted) setLoading(false);
       }
     };
     run();
     return () => controller.abort();
-  }, [filterByAuthor]);
+  }, [fetchPage]);
+
+  const loadMore = useCallback(async () => {
+    const controller = controllerRef.current;
+    if (!cursor || loadingMore || !controller) return;
+    setLoadingMore(true);
+    try {
+      await fetchPage(cursor, controller);
+    } catch (err: any) {
+      if (err.name === "AbortError") return;
+      setError(err.message ?? "Failed to fetch links");
+    } finally {
+      if (!controller.signal.aborted) setLoadingMore(false);
+    }
+  }, [cursor, loadingMore, fetchPage]);
+
+  return {
+    links,
+    total,
+    loading,
+    loadingMore,
+    hasMore: cursor !== null,
+    loadMore,
+    error,
+  } as const;
+}
+
+/** Every book matching `filters`, loaded or not, for Select All */
+export async function fetchMatchingBooks(
+  filters: LinkFilters,
+): Promise<Pick<Link, "bookUrl" | "title">[]> {
+  const params = linkFilterParams(filters);
+  params.set("fields", "bookUrl,title");
+  const res = await fetch(`${API_BASE}/links?${params}`);
+  if (!res.ok) throw new Error(`Links request failed: ${res.status}`);
+  return (await res.json()) as Pick<Link, "bookUrl" | "title">[];
+}
+
+export function useLinkLanguages(author?: string) {
+  const [languages, setLanguages] = useState<string[]>([]);
+
+  useEffect(() => {
+    const controller = new AbortController();
+    const params = new URLSearchParams();
+    if (author) params.set("author", author);
+    fetch(`${API_BASE}/links/languages?${params}`, {
+      signal: controller.signal,
+    })
+      .then((res) => {
+        if (!res.ok) throw new Error(`Languages request failed: ${res.status}`);
+        return res.json() as Promise<string[]>;
+      })
+      .then(setLanguages)
+      .catch((err) => {
+        if (err.name !== "AbortError") console.error(err);
+      });
+    return () => controller.abort();
+  }, [author]);
 
-  return { links, loading, error } as const;
+  return languages;
 }
 
 export function useDeleteAuthor() {
@@ -205,15 +306,71 @@ export function useDeleteAuthor() {
   return { deleteAuthor, deleting, error } as const;
 }
 
+export interface EnqueueAuthorFilters {
+  downloaded?: boolean | null;
+  hasEpub?: boolean;
+  language?: string;
+  search?: string;
+}
+
+export function useEnqueueAuthor() {
+  const [enqueueing, setEnqueueing] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const enqueueAuthor = async (
+    authorSlug: string,
+    filters: EnqueueAuthorFilters = {},
+  ) => {
+    setEnqueueing(true);
+    setError(null);
+    try {
+      const res = await fetch(
+        `${API_BASE}/authors/${encodeURIComponent(authorSlug)}/enqueue`,
+        {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(filters),
+        },
+      );
+      if (!res.ok) throw new Error(`Enqueue failed: ${res.status}`);
+      return await res.json();
+    } catch (err: any) {
+      setError(err.message ?? "Failed to queue author");
+      throw err;
+    } finally {
+      setEnqueueing(false);
+    }
+  };
+
+  return { enqueueAuthor, enqueueing, error } as const;
+}
+
+const SCRAPE_JOB_POLL_INTERVAL = 1000;
+
 export function useAddAuthor() {
   const [adding, setAdding] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
+  const [job, setJob] = useState<ScrapeJob | null>(null);
+
+  const waitForJob = async (jobId: number): Promise<ScrapeJob> => {
+    while (true) {
+      const res = await fetch(`${API_BASE}/scrape-jobs/${jobId}`);
+      if (!res.ok) throw new Error(`Scrape job request failed: ${res.status}`);
+      const data = (await res.json()) as ScrapeJob;
+      setJob(data);
+      if (data.completedAt) return data;
+      await new Promise((resolve) =>
+        setTimeout(resolve, SCRAPE_JOB_POLL_INTERVAL),
+      );
+    }
+  };
 
   const addAuthor = async (authorName: string) => {
     setAdding(true);
     setError(null);
     setSuccess(null);
+    setJob(null);
     try {
       const res = await fetch(`${API_BASE}/scrape-authors`, {
         method: "POST",
@@ -227,14 +384,26 @@ export function useAddAuthor() {
         throw new Error(data.error);
       }
 
+      const finishedJob = await waitForJob(data.job_id);
+
       cachedAuthors = null;
       const results: string[] = [];
-      for (const result of data.results) {
-        results.push(`${result.books_added} book(s) for ${result.author}`);
+      const failures: string[] = [];
+      for (const result of finishedJob.authors) {
+        if (result.status === "failed") {
+          failures.push(`${result.author}: ${result.error ?? "Unknown error"}`);
+        } else {
+          results.push(`${result.booksAdded} book(s) for ${result.author}`);
+        }
       }
 
-      setSuccess(`Successfully added ${results.join(", ")}`);
-      return data;
+      if (results.length > 0) {
+        setSuccess(`Successfully added ${results.join(", ")}`);
+      }
+      if (failures.length > 0) {
+        setError(`Failed to scrape ${failures.join(", ")}`);
+      }
+      return { ...data, success: results.length > 0, job: finishedJob };
     } catch (err: any) {
       setError(err.message ?? "Failed to add author");
       throw err;
@@ -243,7 +412,7 @@ export function useAddAuthor() {
     }
   };
 
-  return { addAuthor, adding, error, success } as const;
+  return { addAuthor, adding, error, success, job } as const;
 }
 
 export function useCleanupAuthors() {
@@ -318,17 +487,56 @@ export function useQueue(autoRefresh = false) {
   };
 
   useEffect(() => {
-    fetchQueue();
-
-    if (autoRefresh) {
-      const interval = setInterval(fetchQueue, 5000);
-      return () => clearInterval(interval);
+    if (!autoRefresh) {
+      fetchQueue();
+      return;
     }
+
+    // The server pushes a snapshot on connect, then only changed/deleted items.
+    // EventSource reconnects on its own and each reconnect starts with a snapshot.
+    const source = new EventSource(`${API_BASE}/queue/stream`);
+
+    source.addEventListener("snapshot", (event) => {
+      setQueue(JSON.parse((event as MessageEvent).data));
+      setError(null);
+      setLoading(false);
+    });
+
+    source.addEventListener("changes", (event) => {
+      const { items, deleted } = JSON.parse((event as MessageEvent).data) as {
+        items: QueueItem[];
+        deleted: number[];
+      };
+      setQueue((current) => mergeQueueChanges(current, items, deleted));
+    });
+
+    source.onerror = () => {
+      setError("Lost connection to queue updates, reconnecting...");
+    };
+
+    return () => source.close();
   }, [autoRefresh]);
 
   return { queue, loading, error, refetch: fetchQueue } as const;
 }
 
+function mergeQueueChanges(
+  current: QueueItem[],
+  changed: QueueItem[],
+  deleted: number[],
+): QueueItem[] {
+  const byId = new Map(current.map((item) => [item.id, item]));
+  for (const id of deleted) {
+    byId.delete(id);
+  }
+  for (const item of changed) {
+    byId.set(item.id, item);
+  }
+  return [...byId.values()].sort((a, b) =>
+    b.createdAt.localeCompare(a.createdAt),
+  );
+}
+
 export function useCancelQueueItem() {
   const [cancelling, setCancelling] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -14,7 +14,7 @@ export interface DownloadFailure {
 export type Link = {
   url: string;
   author: string;
-  article: string;
+  article?: string;
   downloaded: boolean;
   title: string;
   bookAuthor: string;
@@ -36,7 +36,29 @@ export type QueueItem = {
   status: string;
   retryCount: number;
   errorMessage?: string;
+  nextAttemptAt?: string | null;
   createdAt: string;
   startedAt?: string;
   completedAt?: string;
+  bytesDownloaded: number;
+  totalBytes?: number | null;
+};
+
+export type ScrapeJobAuthor = {
+  author: string;
+  status: string;
+  currentPage: number;
+  booksAdded: number;
+  error?: string;
+  startedAt?: string;
+  completedAt?: string;
+};
+
+export type ScrapeJob = {
+  id: number;
+  status: string;
+  createdAt: string;
+  completedAt?: string;
+  totalBooksAdded: number;
+  authors: ScrapeJobAuthor[];
 };